@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+准入控制 - 限制渲染密集型路由的并发数，超出等待队列时快速拒绝
+"""
+
+import threading
+import time
+
+
+class AdmissionLimiter:
+    """并发限制器 + 有界等待队列
+
+    同时执行的请求数不超过max_concurrent，其余请求最多排队max_queue个、
+    每个最多等待queue_timeout秒；队列已满或等待超时的请求被拒绝（计入shed）。
+    """
+
+    def __init__(self, max_concurrent=4, max_queue=16, queue_timeout=5.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self.served_stale = 0
+
+    def acquire(self):
+        """申请执行名额，返回是否获准"""
+        with self._cond:
+            if self.active < self.max_concurrent and self.waiting == 0:
+                self.active += 1
+                self.admitted += 1
+                return True
+            if self.waiting >= self.max_queue:
+                self.shed_queue_full += 1
+                return False
+
+            self.waiting += 1
+            deadline = time.monotonic() + self.queue_timeout
+            try:
+                while self.active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.shed_timeout += 1
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            self.admitted += 1
+            return True
+
+    def release(self):
+        """释放执行名额"""
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def record_stale(self):
+        """记录一次以旧页面代替渲染的请求"""
+        with self._cond:
+            self.served_stale += 1
+
+    @property
+    def saturated(self):
+        return self.active >= self.max_concurrent
+
+    def stats(self):
+        """返回当前队列深度与拒绝计数"""
+        with self._cond:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "active": self.active,
+                "queue_depth": self.waiting,
+                "admitted": self.admitted,
+                "shed_queue_full": self.shed_queue_full,
+                "shed_timeout": self.shed_timeout,
+                "served_stale": self.served_stale,
+            }
@@ -5,16 +5,26 @@
 """
 
 import pandas as pd
-from flask import Flask, render_template, url_for, send_file, jsonify
+from flask import Flask, render_template, url_for, send_file, jsonify, request, Response, g, abort
 import os
+import sys
 import glob
+import itertools
+import zlib
+import hashlib
+import time
+import threading
+import atexit
 import requests
-from pyecharts.charts import Line, Pie, Bar, WordCloud, Radar, Map, Scatter, Funnel
+from functools import wraps
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from pyecharts.charts import Line, Pie, Bar, WordCloud, Radar, Map, Scatter, Funnel, HeatMap
 from pyecharts import options as opts
 from pyecharts.globals import ThemeType
 from pyecharts.commons.utils import JsCode
 from pyecharts.globals import CurrentConfig
 import json
+import re
 
 # 配置PyEcharts在云环境中的CDN设置
 try:
@@ -42,9 +52,39 @@ import numpy as np
 import qrcode
 from io import BytesIO
 import base64
+from render_cache import RenderCache, SQLiteBackend, save_snapshot, load_snapshot
+from admission import AdmissionLimiter
+from profiler import RequestProfile, issue as issue_profile_token, verify as verify_profile
+from tracing import Tracer, SPAN_KIND_SERVER
+from minify import minify_html
+from downsample import downsample
+import datasets
+from datasets import COMPETITOR_DATA, price_band_tiers
+from funnel import cached_funnel, funnel_retry_after, normalize_options
+import svg_charts
+import uuid
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
 
 app = Flask(__name__)
 app.config['DEBUG'] = True
+# 静态文件（样式表地址带内容哈希）允许浏览器缓存7天
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 7 * 24 * 3600
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Jinja字节码缓存：模板编译结果写入磁盘，重启后无需重新编译
+JINJA_CACHE_DIR = os.environ.get('JINJA_CACHE_DIR', os.path.join(BASE_DIR, '.cache', 'jinja'))
+os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+app.jinja_options = dict(app.jinja_options, bytecode_cache=FileSystemBytecodeCache(JINJA_CACHE_DIR))
+
+# 请求追踪：TRACE_SAMPLE_RATE>0 时按比例采样，span以OTLP JSON行写入本地滚动文件
+tracer = Tracer(
+    os.environ.get('TRACE_FILE', os.path.join(BASE_DIR, '.cache', 'traces', 'spans.jsonl')),
+    sample_rate=float(os.environ.get('TRACE_SAMPLE_RATE', '0')),
+    max_bytes=int(os.environ.get('TRACE_MAX_BYTES', str(10 * 1024 * 1024))),
+    backup_count=int(os.environ.get('TRACE_BACKUP_COUNT', '5')),
+)
 
 # 添加favicon路由，防止404错误
 @app.route('/favicon.ico')
@@ -63,6 +103,7 @@ REAL_POPMART_DATA = {
     "countries": 20,  # 覆盖国家数量
 }
 
+@tracer.wrap()
 def get_local_media():
     """获取本地媒体文件（图片和视频）"""
     try:
@@ -144,100 +185,196 @@ def get_local_media():
         print(f"❌ 获取本地媒体文件时出错: {e}")
         return {"images": [], "videos": [], "hero_video": None, "hero_image": None}
 
-def generate_real_sales_data():
-    """生成基于真实趋势的销售数据 - 更新到2025年6月"""
-    base_date = datetime(2024, 1, 1)  # 从2024年开始显示最近18个月
-    months = []
-    sales = []
-    growth_rates = []
-    
-    # 真实的月度增长趋势（基于泡泡玛特实际业绩和2025年预测）
-    monthly_multipliers = [
-        # 2024年数据
-        4.5, 4.8, 5.2, 5.0, 6.8, 7.2, 7.8, 8.5, 8.2, 9.5, 10.2, 11.8,
-        # 2025年Q1-Q2数据（持续增长但增速放缓）
-        12.5, 13.2, 14.1, 14.8, 15.5, 16.2
-    ]
-    base_sales = 2000  # 基础销量
-    
-    for i in range(18):  # 显示18个月数据
-        current_date = base_date + timedelta(days=30 * i)
-        months.append(current_date.strftime("%Y-%m"))
-        
-        # LABUBU贡献因子（2024年持续高增长，2025年趋于稳定）
-        if i < 12:  # 2024年
-            labubu_factor = max(1.0, (i - 2) * 0.4) if i >= 2 else 1.0
-        else:  # 2025年
-            labubu_factor = 4.0 + (i - 12) * 0.1  # 稳定增长
-        
-        monthly_sales = int(base_sales * monthly_multipliers[i] * labubu_factor)
-        sales.append(monthly_sales)
-        
-        # 计算同比增长率
-        if i == 0:
-            growth_rates.append(0)
-        else:
-            growth_rate = ((sales[i] - sales[i-1]) / sales[i-1]) * 100
-            growth_rates.append(round(growth_rate, 1))
-    
-    return pd.DataFrame({
-        "month": months,
-        "sales": sales,
-        "growth_rate": growth_rates,
-        "labubu_contribution": [min(55, max(15, 15 + i * 2.5)) for i in range(18)],  # LABUBU贡献占比
-    })
-
-def generate_global_market_data():
-    """生成全球市场数据"""
-    regions = ["中国大陆", "港澳台", "东南亚", "韩国", "日本", "北美", "欧洲", "其他"]
-    sales_data = [4200, 680, 1200, 450, 320, 280, 150, 120]  # 单位：万个
-    growth_rates = [35, 89, 245, 156, 78, 189, 234, 167]  # 增长率%
-    
-    return pd.DataFrame({
-        "region": regions,
-        "sales": sales_data,
-        "growth_rate": growth_rates
-    })
-
-def generate_price_trend_data():
-    """生成价格趋势数据 - 更新到2025年Q2"""
-    quarters = ["2023Q3", "2023Q4", "2024Q1", "2024Q2", "2024Q3", "2024Q4", "2025Q1", "2025Q2"]
-    # 基于真实泡泡玛特产品定价策略（显示近2年趋势）
-    avg_prices = [72, 75, 79, 85, 89, 95, 99, 105]  # 平均售价持续上升
-    premium_prices = [119, 129, 149, 159, 169, 189, 199, 219]  # 限量版价格
-    
-    return pd.DataFrame({
-        "quarter": quarters,
-        "avg_price": avg_prices,
-        "premium_price": premium_prices
-    })
+# 数据生成函数定义在datasets模块（与PPT生成脚本共用），此处包装为追踪span
+generate_real_sales_data = tracer.wrap()(datasets.generate_real_sales_data)
+generate_global_market_data = tracer.wrap()(datasets.generate_global_market_data)
+generate_price_trend_data = tracer.wrap()(datasets.generate_price_trend_data)
+generate_trending_words_data = tracer.wrap()(datasets.generate_trending_words_data)
+generate_funnel_data = tracer.wrap()(datasets.generate_funnel_data)
+generate_user_profile_data = tracer.wrap()(datasets.generate_user_profile_data)
+generate_retention_data = tracer.wrap()(datasets.generate_retention_data)
+generate_unique_buyers_data = tracer.wrap()(datasets.generate_unique_buyers_data)
+
+def popmart_data():
+    """核心指标：有客户表时女性用户占比取自用户画像，导入带买家ID的订单后增加独立买家数（万）"""
+    data = dict(REAL_POPMART_DATA)
+    profile = generate_user_profile_data()
+    female_ratio = profile.loc[profile["category"] == "女性用户", "value"]
+    if not female_ratio.empty:
+        data["female_ratio"] = float(female_ratio.iloc[0])
+    buyers = generate_unique_buyers_data()
+    if buyers is not None:
+        data["unique_buyers"] = round(buyers[0] / 10000, 1)
+    return data
+
+# ----------------- 渲染配置档 -----------------
+
+# 命名渲染配置档，由全部图表构建函数共用：
+#   full  - 完整版（浪漫主题、动画、图例）
+#   lite  - 轻量版（原生产环境象限图的精简配置：轻量主题、无动画、隐藏图例、更小的图形）
+#   print - 打印版（浅色主题、SVG渲染、无动画，便于打印与截图）
+#   static - 静态版（服务端生成SVG，不加载ECharts、不执行JavaScript）
+RENDER_PROFILES = {
+    "full": {
+        "theme": ThemeType.ROMANTIC, "renderer": "canvas", "height": "500px", "animation": True,
+        "show_legend": True, "symbol_scale": 1.0, "show_area": True, "title_top": "5%",
+        "word_size_range": [20, 80], "compact_axes": False, "viewport_width": 1200,
+    },
+    "lite": {
+        "theme": ThemeType.LIGHT, "renderer": "canvas", "height": "420px", "animation": False,
+        "show_legend": False, "symbol_scale": 0.75, "show_area": False, "title_top": "20px",
+        "word_size_range": [14, 56], "compact_axes": True, "viewport_width": 480,
+    },
+    "print": {
+        "theme": ThemeType.LIGHT, "renderer": "svg", "height": "500px", "animation": False,
+        "show_legend": True, "symbol_scale": 1.0, "show_area": True, "title_top": "5%",
+        "word_size_range": [20, 80], "compact_axes": False, "viewport_width": 1600,
+    },
+    "static": {
+        "theme": ThemeType.LIGHT, "renderer": "static", "height": "500px", "animation": False,
+        "show_legend": True, "symbol_scale": 1.0, "show_area": True, "title_top": "5%",
+        "word_size_range": [20, 80], "compact_axes": False, "viewport_width": 800,
+    },
+}
+
+# 默认配置档在启动时确定一次，不再在每次构建图表时读取环境变量
+DEFAULT_RENDER_PROFILE = os.environ.get('RENDER_PROFILE_DEFAULT', 'full')
+if DEFAULT_RENDER_PROFILE not in RENDER_PROFILES:
+    print(f"⚠️ 未知的默认渲染配置档: {DEFAULT_RENDER_PROFILE}，使用full")
+    DEFAULT_RENDER_PROFILE = "full"
+
+def get_render_profile(profile=None):
+    """按名称取渲染配置档，未指定时使用默认配置档"""
+    return RENDER_PROFILES[profile or DEFAULT_RENDER_PROFILE]
+
+# 折线图每像素最多绘制的数据点数：点数预算 = 配置档视口宽度 × POINTS_PER_PIXEL，超出时在服务端降采样
+POINTS_PER_PIXEL = 0.5
+SERIES_DOWNSAMPLE_METHOD = os.environ.get('SERIES_DOWNSAMPLE', 'lttb')  # lttb | minmax
+# 缩放请求单次返回的最大点数
+MAX_SERIES_POINTS = 2000
+
+def point_budget(profile):
+    """配置档对应的折线点数预算"""
+    return max(50, int(profile["viewport_width"] * POINTS_PER_PIXEL))
+
+def series_timestamps(labels):
+    """把月份/日期标签转换为毫秒时间戳"""
+    return pd.to_datetime(pd.Series(labels)).to_numpy().astype("datetime64[ms]").astype("int64")
+
+def downsample_frame(data, x_column, y_column, budget, start=None, end=None):
+    """按点数预算降采样，start/end（毫秒时间戳）限定时间范围，返回保留的行"""
+    x = series_timestamps(data[x_column])
+    mask = np.ones(len(x), dtype=bool)
+    if start is not None:
+        mask &= x >= start
+    if end is not None:
+        mask &= x <= end
+    data, x = data[mask], x[mask]
+    return data.iloc[downsample(x, data[y_column].to_numpy(), budget, SERIES_DOWNSAMPLE_METHOD)]
+
+def series_points(data, x_column, y_column):
+    """转换为ECharts时间轴数据 [[毫秒时间戳, 数值], ...]"""
+    return [[int(x), y.item()] for x, y in zip(series_timestamps(data[x_column]), data[y_column].to_numpy())]
+
+def chart_init_opts(profile, chart_id=None):
+    """根据配置档生成图表初始化参数"""
+    return opts.InitOpts(
+        chart_id=chart_id,
+        theme=profile["theme"],
+        width="100%",
+        height=profile["height"],
+        renderer=profile["renderer"],
+        animation_opts=opts.AnimationOpts(animation=profile["animation"]),
+    )
 
 # ----------------- 简化的图表生成函数 -----------------
 
-def create_sales_trend_chart(data):
-    """创建销售趋势图表"""
+# 缩放后按可见范围请求更高分辨率的数据，替换可见范围内的点（范围外保留降采样后的概览）
+SALES_ZOOM_JS = """
+(function () {
+    var chart = chart_sales_trend, timer = null;
+    chart.on('datazoom', function () {
+        clearTimeout(timer);
+        timer = setTimeout(function () {
+            var zoom = chart.getOption().dataZoom[0];
+            var overview = option_sales_trend.series[0].data;
+            var first = overview[0][0], last = overview[overview.length - 1][0];
+            var start = Math.floor(first + (last - first) * zoom.start / 100);
+            var end = Math.ceil(first + (last - first) * zoom.end / 100);
+            fetch('/api/series/sales?start=' + start + '&end=' + end + '&points=__BUDGET__')
+                .then(function (response) { return response.json(); })
+                .then(function (result) {
+                    var outside = overview.filter(function (p) { return p[0] < start || p[0] > end; });
+                    var points = outside.concat(result.points).sort(function (a, b) { return a[0] - b[0]; });
+                    chart.setOption({series: [{data: points}]});
+                });
+        }, 200);
+    });
+})();
+"""
+
+def create_sales_zoom_chart(data, p, budget):
+    """长序列销售趋势：服务端降采样到点数预算，时间轴可缩放，缩放后按需加载原始分辨率"""
+    points = series_points(downsample_frame(data, "month", "sales", budget), "month", "sales")
+    line = (
+        Line(init_opts=chart_init_opts(p, chart_id="sales_trend"))
+        .add_xaxis([x for x, _ in points])
+        .add_yaxis(
+            "销售量 (万个)",
+            [y for _, y in points],
+            is_symbol_show=False,
+            linestyle_opts=opts.LineStyleOpts(width=2, color="#FF6B9D"),
+            itemstyle_opts=opts.ItemStyleOpts(color="#FF6B9D"),
+            areastyle_opts=opts.AreaStyleOpts(opacity=0.3 if p["show_area"] else 0, color="#FFE4F1")
+        )
+        .set_global_opts(
+            title_opts=opts.TitleOpts(
+                title="📈 全球销售趋势",
+                subtitle=f"共{len(data)}个数据点，缩放查看明细",
+                pos_left="center",
+                pos_top=p["title_top"]
+            ),
+            tooltip_opts=opts.TooltipOpts(trigger="axis"),
+            legend_opts=opts.LegendOpts(is_show=p["show_legend"]),
+            datazoom_opts=[opts.DataZoomOpts(type_="inside"), opts.DataZoomOpts(type_="slider")],
+            xaxis_opts=opts.AxisOpts(type_="time", name="日期"),
+            yaxis_opts=opts.AxisOpts(name="销售量 (万个)")
+        )
+        .add_js_funcs(SALES_ZOOM_JS.replace("__BUDGET__", str(budget)))
+    )
+    # 时间轴从序列数据取值，不需要重复输出类目数据
+    line.options["xAxis"][0].pop("data", None)
+    return line.render_embed()
+
+@tracer.wrap()
+def create_sales_trend_chart(data, profile=None):
+    """创建销售趋势图表（数据点超过配置档的点数预算时降采样并支持缩放）"""
+    p = get_render_profile(profile)
     try:
+        if len(data) > point_budget(p):
+            return create_sales_zoom_chart(data, p, point_budget(p))
         line = (
-            Line(init_opts=opts.InitOpts(theme=ThemeType.ROMANTIC, width="100%", height="500px"))
+            Line(init_opts=chart_init_opts(p))
             .add_xaxis(data["month"].tolist())
             .add_yaxis(
                 "销售量 (万个)", 
                 data["sales"].tolist(),
                 is_smooth=True,
                 symbol="circle",
-                symbol_size=8,
+                symbol_size=round(8 * p["symbol_scale"]),
                 linestyle_opts=opts.LineStyleOpts(width=3, color="#FF6B9D"),
                 itemstyle_opts=opts.ItemStyleOpts(color="#FF6B9D", border_color="#FF6B9D", border_width=2),
-                areastyle_opts=opts.AreaStyleOpts(opacity=0.3, color="#FFE4F1")
+                areastyle_opts=opts.AreaStyleOpts(opacity=0.3 if p["show_area"] else 0, color="#FFE4F1")
             )
             .set_global_opts(
                 title_opts=opts.TitleOpts(
                     title="📈 全球销售趋势",
                     subtitle="数据来源：泡泡玛特官方财报",
                     pos_left="center",
-                    pos_top="5%"
+                    pos_top=p["title_top"]
                 ),
                 tooltip_opts=opts.TooltipOpts(trigger="axis"),
+                legend_opts=opts.LegendOpts(is_show=p["show_legend"]),
                 xaxis_opts=opts.AxisOpts(name="月份"),
                 yaxis_opts=opts.AxisOpts(name="销售量 (万个)")
             )
@@ -247,11 +384,13 @@ def create_sales_trend_chart(data):
         print(f"❌ 销售趋势图生成失败: {e}")
         return "<div>销售趋势图加载中...</div>"
 
-def create_global_distribution_chart(data):
+@tracer.wrap()
+def create_global_distribution_chart(data, profile=None):
     """创建全球销售分布图表"""
+    p = get_render_profile(profile)
     try:
         pie = (
-            Pie(init_opts=opts.InitOpts(theme=ThemeType.ROMANTIC, width="100%", height="500px"))
+            Pie(init_opts=chart_init_opts(p))
             .add(
                 "销售分布",
                 [list(z) for z in zip(data["region"], data["sales"])],
@@ -263,9 +402,9 @@ def create_global_distribution_chart(data):
                     title="🌐 全球市场销售分布",
                     subtitle="基于2025年最新数据",
                     pos_left="center",
-                    pos_top="5%"
+                    pos_top=p["title_top"]
                 ),
-                legend_opts=opts.LegendOpts(pos_left="0%", pos_top="20%", orient="vertical"),
+                legend_opts=opts.LegendOpts(is_show=p["show_legend"], pos_left="0%", pos_top="20%", orient="vertical"),
                 tooltip_opts=opts.TooltipOpts(trigger="item", formatter="{a} <br/>{b}: {c}万个 ({d}%)")
             )
         )
@@ -274,11 +413,35 @@ def create_global_distribution_chart(data):
         print(f"❌ 全球分布图生成失败: {e}")
         return "<div>全球分布图加载中...</div>"
 
-def create_price_analysis_chart(data):
-    """创建价格分析图表"""
+# 价格分布带颜色（按档次轮换）
+PRICE_BAND_COLORS = ["#FF9F43", "#2ECC71", "#9B59B6", "#E74C3C"]
+
+def price_band_lines(data):
+    """各档次成交价 p10/p50/p90 折线（p50实线，p10、p90虚线），数据中没有分位数列时返回None"""
+    tiers = price_band_tiers(data)
+    if not tiers:
+        return None
+    line = Line().add_xaxis(data["quarter"].tolist())
+    for tier, color in zip(tiers, itertools.cycle(PRICE_BAND_COLORS)):
+        for band in ("p10", "p50", "p90"):
+            line.add_yaxis(
+                f"{tier} {band.upper()}",
+                data[f"{tier}|{band}"].tolist(),
+                is_symbol_show=band == "p50",
+                label_opts=opts.LabelOpts(is_show=False),
+                linestyle_opts=opts.LineStyleOpts(color=color, width=2 if band == "p50" else 1,
+                                                  type_="solid" if band == "p50" else "dashed"),
+                itemstyle_opts=opts.ItemStyleOpts(color=color)
+            )
+    return line
+
+@tracer.wrap()
+def create_price_analysis_chart(data, profile=None):
+    """创建价格分析图表（已导入订单明细时叠加各档次成交价分布带）"""
+    p = get_render_profile(profile)
     try:
         bar = (
-            Bar(init_opts=opts.InitOpts(theme=ThemeType.ROMANTIC, width="100%", height="500px"))
+            Bar(init_opts=chart_init_opts(p))
             .add_xaxis(data["quarter"].tolist())
             .add_yaxis("平均售价", data["avg_price"].tolist(), itemstyle_opts=opts.ItemStyleOpts(color="#FF6B9D"))
             .add_yaxis("限量版售价", data["premium_price"].tolist(), itemstyle_opts=opts.ItemStyleOpts(color="#4A90E2"))
@@ -288,33 +451,33 @@ def create_price_analysis_chart(data):
                     subtitle="平均价格持续上升，体现品牌价值提升",
                     pos_left="center"
                 ),
+                legend_opts=opts.LegendOpts(is_show=p["show_legend"]),
                 yaxis_opts=opts.AxisOpts(name="价格 (元)"),
                 tooltip_opts=opts.TooltipOpts(trigger="axis")
             )
         )
+        bands = price_band_lines(data)
+        if bands is not None:
+            bar.overlap(bands)
         return bar.render_embed()
     except Exception as e:
         print(f"❌ 价格分析图生成失败: {e}")
         return "<div>价格分析图加载中...</div>"
 
-def create_trending_wordcloud():
+@tracer.wrap()
+def create_trending_wordcloud(data, profile=None):
     """创建热门词云"""
+    p = get_render_profile(profile)
     try:
-        trending_words = [
-            ("Labubu", 1000), ("拉布布", 950), ("泡泡玛特", 800), ("盲盒", 700),
-            ("POPMART", 650), ("潮玩", 600), ("限量版", 550), ("隐藏款", 500),
-            ("蕾哈娜", 450), ("Lisa", 420), ("收藏", 400), ("可爱", 380)
-        ]
-        
         wc = (
-            WordCloud(init_opts=opts.InitOpts(theme=ThemeType.ROMANTIC, width="100%", height="500px"))
-            .add("", trending_words, word_size_range=[20, 80], shape="circle")
+            WordCloud(init_opts=chart_init_opts(p))
+            .add("", list(zip(data["word"].tolist(), data["weight"].tolist())), word_size_range=p["word_size_range"], shape="circle")
             .set_global_opts(
                 title_opts=opts.TitleOpts(
                     title="🔥 社媒热度词云分析",
                     subtitle="基于微博、小红书、抖音等平台数据",
                     pos_left="center",
-                    pos_top="5%"
+                    pos_top=p["title_top"]
                 )
             )
         )
@@ -323,22 +486,22 @@ def create_trending_wordcloud():
         print(f"❌ 词云图生成失败: {e}")
         return "<div>词云图加载中...</div>"
 
-def create_user_profile_chart():
+@tracer.wrap()
+def create_user_profile_chart(data, profile=None):
     """创建用户画像雷达图"""
+    p = get_render_profile(profile)
     try:
-        categories = ["女性用户", "15-25岁", "收入中高", "社交活跃", "品牌忠诚", "冲动消费"]
-        values = [75, 68, 72, 85, 63, 78]  # 百分比数据
-        
         radar = (
-            Radar(init_opts=opts.InitOpts(theme=ThemeType.ROMANTIC, width="100%", height="500px"))
-            .add_schema(schema=[opts.RadarIndicatorItem(name=cat, max_=100) for cat in categories])
-            .add("用户特征", [values], color="#FF6B9D")
+            Radar(init_opts=chart_init_opts(p))
+            .add_schema(schema=[opts.RadarIndicatorItem(name=cat, max_=100) for cat in data["category"].tolist()])
+            .add("用户特征", [data["value"].tolist()], color="#FF6B9D")
             .set_global_opts(
                 title_opts=opts.TitleOpts(
                     title="👥 用户画像分析",
                     subtitle="核心用户群体特征",
                     pos_left="center"
-                )
+                ),
+                legend_opts=opts.LegendOpts(is_show=p["show_legend"])
             )
         )
         return radar.render_embed()
@@ -346,20 +509,21 @@ def create_user_profile_chart():
         print(f"❌ 用户画像图生成失败: {e}")
         return "<div>用户画像图加载中...</div>"
 
-def create_revenue_funnel():
+@tracer.wrap()
+def create_revenue_funnel(data, profile=None):
     """创建收入漏斗图"""
+    p = get_render_profile(profile)
     try:
-        funnel_data = [("潜在用户", 10000), ("关注用户", 6500), ("首次购买", 3200), ("复购用户", 1800), ("忠实粉丝", 800)]
-        
         funnel = (
-            Funnel(init_opts=opts.InitOpts(theme=ThemeType.ROMANTIC, width="100%", height="500px"))
-            .add("用户转化", funnel_data, sort_="descending")
+            Funnel(init_opts=chart_init_opts(p))
+            .add("用户转化", list(zip(data["stage"].tolist(), data["users"].tolist())), sort_="descending")
             .set_global_opts(
                 title_opts=opts.TitleOpts(
                     title="📊 用户转化漏斗",
                     subtitle="从潜在到忠实粉丝的转化路径",
                     pos_left="center"
-                )
+                ),
+                legend_opts=opts.LegendOpts(is_show=p["show_legend"])
             )
         )
         return funnel.render_embed()
@@ -367,93 +531,90 @@ def create_revenue_funnel():
         print(f"❌ 漏斗图生成失败: {e}")
         return "<div>漏斗图加载中...</div>"
 
-def create_competitor_analysis():
-    """创建竞品对比象限图 - 云端优化版"""
+# 留存热力图最多显示最近N个同期群、首购后N个月
+RETENTION_MAX_COHORTS = 12
+RETENTION_MAX_PERIODS = 12
+
+def retention_grid(data):
+    """留存数据 -> (同期群列表, 月份标签列表, [(月份序号, 同期群序号, 留存率%)])"""
+    cohorts = sorted(data["cohort"].unique())[-RETENTION_MAX_COHORTS:]
+    data = data[data["cohort"].isin(cohorts) & (data["period"] < RETENTION_MAX_PERIODS)]
+    periods = list(range(int(data["period"].max()) + 1)) if len(data) else []
+    index = {cohort: i for i, cohort in enumerate(cohorts)}
+    cells = [(int(period), index[cohort], float(rate))
+             for cohort, period, rate in zip(data["cohort"], data["period"], data["retention"])]
+    return cohorts, [f"第{period}月" for period in periods], cells
+
+@tracer.wrap()
+def create_retention_heatmap(data, profile=None):
+    """创建首购同期群留存热力图"""
+    p = get_render_profile(profile)
     try:
-        scatter_data = [
-            ["泡泡玛特", 3100, 85],
-            ["52TOYS", 120, 72],
-            ["TopToy", 50, 68],  
-            ["酷乐潮玩", 30, 65],
-            ["IP小站", 25, 62],
-            ["万代", 800, 78],
-            ["MINISO名创", 180, 70]
-        ]
-        
-        # 检测是否为生产环境，使用不同的配置策略
-        is_production = os.environ.get('RENDER') or os.environ.get('DYNO') or os.environ.get('PORT')
-        
-        if is_production:
-            # 生产环境：使用更简化但稳定的配置
-            scatter = (
-                Scatter(init_opts=opts.InitOpts(
-                    theme=ThemeType.LIGHT,  # 使用轻量主题
-                    width="100%", 
-                    height="500px",
-                    renderer="canvas"  # 强制使用canvas渲染
-                ))
-                .add_xaxis([])
-                .add_yaxis(
-                    "竞品分析",
-                    [{"value": [item[1], item[2]], "name": item[0]} for item in scatter_data],
-                    symbol_size=15,
-                    itemstyle_opts=opts.ItemStyleOpts(color="#FF6B9D", opacity=0.8)
-                )
-                .set_global_opts(
-                    title_opts=opts.TitleOpts(
-                        title="🏆 潮玩行业竞品分析",
-                        subtitle="市值vs品牌力象限图",
-                        pos_left="center",
-                        pos_top="20px"
-                    ),
-                    xaxis_opts=opts.AxisOpts(
-                        name="市值 (亿港元)", 
-                        type_="log", 
-                        min_=10, 
-                        max_=5000,
-                        name_location="middle",
-                        name_gap=30
-                    ),
-                    yaxis_opts=opts.AxisOpts(
-                        name="品牌力指数", 
-                        min_=55, 
-                        max_=90,
-                        name_location="middle",
-                        name_gap=50
-                    ),
-                    tooltip_opts=opts.TooltipOpts(
-                        trigger="item",
-                        formatter="{b}<br/>市值: {c[0]}亿港元<br/>品牌力: {c[1]}分"
-                    ),
-                    legend_opts=opts.LegendOpts(is_show=False)  # 隐藏图例减少加载
-                )
+        cohorts, periods, cells = retention_grid(data)
+        heatmap = (
+            HeatMap(init_opts=chart_init_opts(p))
+            .add_xaxis(periods)
+            .add_yaxis("留存率 (%)", cohorts, [list(cell) for cell in cells],
+                       label_opts=opts.LabelOpts(is_show=not p["compact_axes"], position="inside"))
+            .set_global_opts(
+                title_opts=opts.TitleOpts(
+                    title="🔁 首购同期群留存",
+                    subtitle="各月首购用户在之后每个月的复购比例",
+                    pos_left="center",
+                    pos_top=p["title_top"]
+                ),
+                legend_opts=opts.LegendOpts(is_show=False),
+                visualmap_opts=opts.VisualMapOpts(min_=0, max_=100, is_show=p["show_legend"], orient="horizontal",
+                                                  pos_left="center", pos_bottom="0",
+                                                  range_color=["#FFF0F5", "#FF6B9D"]),
+                xaxis_opts=opts.AxisOpts(name="首购后"),
+                yaxis_opts=opts.AxisOpts(name="首购月份", is_inverse=True),
+                tooltip_opts=opts.TooltipOpts(formatter="{c}%")
             )
-        else:
-            # 本地环境：使用完整功能
-            scatter = (
-                Scatter(init_opts=opts.InitOpts(theme=ThemeType.ROMANTIC, width="100%", height="500px"))
-                .add_xaxis([])
-                .add_yaxis(
-                    "竞品分析",
-                    [{"value": [item[1], item[2]], "name": item[0]} for item in scatter_data],
-                    symbol_size=20,
-                    itemstyle_opts=opts.ItemStyleOpts(color="#FF6B9D", opacity=0.8)
-                )
-                .set_global_opts(
-                    title_opts=opts.TitleOpts(
-                        title="🏆 潮玩行业竞品分析",
-                        subtitle="市值vs品牌力象限图",
-                        pos_left="center",
-                        pos_top="5%"
-                    ),
-                    xaxis_opts=opts.AxisOpts(name="市值 (亿港元)", type_="log", min_=10, max_=5000),
-                    yaxis_opts=opts.AxisOpts(name="品牌力指数", min_=55, max_=90),
-                    tooltip_opts=opts.TooltipOpts(
-                        trigger="item",
-                        formatter="{b}<br/>市值: {c[0]}亿港元<br/>品牌力: {c[1]}分"
-                    )
-                )
+        )
+        return heatmap.render_embed()
+    except Exception as e:
+        print(f"❌ 留存热力图生成失败: {e}")
+        return "<div>留存热力图加载中...</div>"
+
+@tracer.wrap()
+def create_competitor_analysis(profile=None):
+    """创建竞品对比象限图 - 按渲染配置档生成"""
+    p = get_render_profile(profile)
+    try:
+        # 精简配置（lite）将坐标轴名称放在轴中部，避免与标题重叠
+        axis_name_opts = {"name_location": "middle"} if p["compact_axes"] else {}
+        scatter = (
+            Scatter(init_opts=chart_init_opts(p))
+            .add_xaxis([])
+            .add_yaxis(
+                "竞品分析",
+                [{"value": [item[1], item[2]], "name": item[0]} for item in COMPETITOR_DATA],
+                symbol_size=round(20 * p["symbol_scale"]),
+                itemstyle_opts=opts.ItemStyleOpts(color="#FF6B9D", opacity=0.8)
+            )
+            .set_global_opts(
+                title_opts=opts.TitleOpts(
+                    title="🏆 潮玩行业竞品分析",
+                    subtitle="市值vs品牌力象限图",
+                    pos_left="center",
+                    pos_top=p["title_top"]
+                ),
+                xaxis_opts=opts.AxisOpts(
+                    name="市值 (亿港元)", type_="log", min_=10, max_=5000,
+                    **axis_name_opts, **({"name_gap": 30} if p["compact_axes"] else {})
+                ),
+                yaxis_opts=opts.AxisOpts(
+                    name="品牌力指数", min_=55, max_=90,
+                    **axis_name_opts, **({"name_gap": 50} if p["compact_axes"] else {})
+                ),
+                tooltip_opts=opts.TooltipOpts(
+                    trigger="item",
+                    formatter="{b}<br/>市值: {c[0]}亿港元<br/>品牌力: {c[1]}分"
+                ),
+                legend_opts=opts.LegendOpts(is_show=p["show_legend"])
             )
+        )
         
         # 尝试渲染图表
         chart_html = scatter.render_embed()
@@ -569,194 +730,703 @@ def create_fallback_competitor_chart():
     </div>
     """
 
+# ----------------- 静态SVG图表 -----------------
+
+# 与上面的ECharts图表使用相同数据，服务端计算布局，不依赖JavaScript
+
+def create_sales_trend_svg(data, profile=None):
+    """销售趋势图（SVG）"""
+    p = get_render_profile(profile)
+    if len(data) > point_budget(p):
+        data = downsample_frame(data, "month", "sales", point_budget(p))
+    return svg_charts.line_chart("📈 全球销售趋势", "数据来源：泡泡玛特官方财报", data["month"].tolist(),
+                                 data["sales"].tolist(), y_name="销售量 (万个)", area=p["show_area"])
+
+def create_global_distribution_svg(data, profile=None):
+    """全球销售分布图（SVG）"""
+    return svg_charts.pie_chart("🌐 全球市场销售分布", "基于2025年最新数据",
+                                list(zip(data["region"].tolist(), data["sales"].tolist())))
+
+def create_price_analysis_svg(data, profile=None):
+    """价格分析图（SVG），与交互版一样叠加各档次 p10/p50/p90 价格带"""
+    bands = [(f"{tier} {band.upper()}", data[f"{tier}|{band}"].tolist(), color, band != "p50")
+             for tier, color in zip(price_band_tiers(data), itertools.cycle(PRICE_BAND_COLORS))
+             for band in ("p10", "p50", "p90")]
+    return svg_charts.bar_chart("💰 产品定价策略分析", "平均价格持续上升，体现品牌价值提升", data["quarter"].tolist(),
+                                [("平均售价", data["avg_price"].tolist()), ("限量版售价", data["premium_price"].tolist())],
+                                y_name="价格 (元)", lines=bands)
+
+def create_trending_wordcloud_svg(data, profile=None):
+    """热门词云（SVG）"""
+    p = get_render_profile(profile)
+    return svg_charts.word_cloud("🔥 社媒热度词云分析", "基于微博、小红书、抖音等平台数据",
+                                 list(zip(data["word"].tolist(), data["weight"].tolist())),
+                                 size_range=p["word_size_range"])
+
+def create_user_profile_svg(data, profile=None):
+    """用户画像雷达图（SVG）"""
+    return svg_charts.radar_chart("👥 用户画像分析", "核心用户群体特征", data["category"].tolist(), data["value"].tolist())
+
+def create_revenue_funnel_svg(data, profile=None):
+    """收入漏斗图（SVG）"""
+    return svg_charts.funnel_chart("📊 用户转化漏斗", "从潜在到忠实粉丝的转化路径",
+                                   list(zip(data["stage"].tolist(), data["users"].tolist())))
+
+def create_retention_heatmap_svg(data, profile=None):
+    """首购同期群留存热力图（SVG）"""
+    cohorts, periods, cells = retention_grid(data)
+    return svg_charts.heatmap("🔁 首购同期群留存", "各月首购用户在之后每个月的复购比例", periods, cohorts, cells,
+                              x_name="首购后", y_name="首购月份")
+
+def create_competitor_analysis_svg(profile=None):
+    """竞品对比象限图（SVG）"""
+    p = get_render_profile(profile)
+    return svg_charts.scatter_chart("🏆 潮玩行业竞品分析", "市值vs品牌力象限图", COMPETITOR_DATA,
+                                    x_range=(10, 5000), y_range=(55, 90), x_name="市值 (亿港元)", y_name="品牌力指数",
+                                    log_x=True, symbol_size=round(20 * p["symbol_scale"]))
+
+# ----------------- 渲染缓存 -----------------
+
+SNAPSHOT_ENABLED = os.environ.get('CACHE_SNAPSHOT', '1') != '0'
+SNAPSHOT_PATH = os.environ.get('CACHE_SNAPSHOT_PATH', os.path.join(BASE_DIR, '.cache', 'warm_snapshot.pkl'))
+# 缓存变化后等待该秒数再在后台写入快照，期间的多次变化合并为一次写入
+SNAPSHOT_DEBOUNCE = float(os.environ.get('CACHE_SNAPSHOT_DEBOUNCE', '5'))
+# RENDER_CACHE_BACKEND=sqlite 时多个gunicorn worker共享同一份渲染缓存
+RENDER_CACHE_BACKEND = os.environ.get('RENDER_CACHE_BACKEND', 'memory')
+RENDER_CACHE_DB = os.environ.get('RENDER_CACHE_DB', os.path.join(BASE_DIR, '.cache', 'render_cache.db'))
+# 渲染结果写入缓存前压缩HTML/CSS/内联JS，MINIFY_HTML=0 关闭（便于调试）
+MINIFY_ENABLED = os.environ.get('MINIFY_HTML', '1') != '0'
+# 单个图表的渲染截止时间（秒），超时先返回备用内容，后台继续渲染
+CHART_RENDER_DEADLINE = float(os.environ.get('CHART_RENDER_DEADLINE', '1.5'))
+
+# 图表注册表：图表名 -> (数据生成函数, 图表构建函数)
+CHART_REGISTRY = {
+    "sales": (generate_real_sales_data, create_sales_trend_chart),
+    "distribution": (generate_global_market_data, create_global_distribution_chart),
+    "price": (generate_price_trend_data, create_price_analysis_chart),
+    "wordcloud": (generate_trending_words_data, create_trending_wordcloud),
+    "user": (generate_user_profile_data, create_user_profile_chart),
+    "funnel": (generate_funnel_data, create_revenue_funnel),
+    "retention": (generate_retention_data, create_retention_heatmap),
+    "competitor": (None, create_competitor_analysis),
+}
+
+# 静态SVG图表：图表名 -> SVG构建函数（参数与CHART_REGISTRY中的构建函数一致）
+SVG_CHART_BUILDERS = {
+    "sales": create_sales_trend_svg,
+    "distribution": create_global_distribution_svg,
+    "price": create_price_analysis_svg,
+    "wordcloud": create_trending_wordcloud_svg,
+    "user": create_user_profile_svg,
+    "funnel": create_revenue_funnel_svg,
+    "retention": create_retention_heatmap_svg,
+    "competitor": create_competitor_analysis_svg,
+}
+
+# 图表备用内容：SVG也无法生成时使用
+CHART_FALLBACKS = {
+    "sales": lambda: "<div>销售趋势图加载中...</div>",
+    "distribution": lambda: "<div>全球分布图加载中...</div>",
+    "price": lambda: "<div>价格分析图加载中...</div>",
+    "wordcloud": lambda: "<div>词云图加载中...</div>",
+    "user": lambda: "<div>用户画像图加载中...</div>",
+    "funnel": lambda: "<div>漏斗图加载中...</div>",
+    "retention": lambda: "<div>留存热力图加载中...</div>",
+    "competitor": create_fallback_competitor_chart,
+}
+
+def create_render_cache():
+    """按配置创建渲染缓存，共享后端不可用时退回进程内缓存"""
+    if RENDER_CACHE_BACKEND == 'sqlite':
+        try:
+            return RenderCache(backend=SQLiteBackend(RENDER_CACHE_DB))
+        except Exception as e:
+            print(f"⚠️ SQLite共享缓存初始化失败，使用进程内缓存: {e}")
+    return RenderCache()
+
+render_cache = create_render_cache()
+
+def compute_code_version():
+    """根据源码内容计算代码版本"""
+    digest = hashlib.sha1()
+    sources = ["app.py", "datasets.py", "downsample.py", "render_cache.py", "minify.py", "svg_charts.py", "sales_store.py", "quantile_sketch.py", "hyperloglog.py", "funnel.py", "user_profile.py", os.path.join("static", "css", "dashboard.css")]
+    sources += [os.path.join("templates", name) for name in ("dashboard.html", "chart.html", "_stat_cards.html")]
+    for name in sources:
+        with open(os.path.join(BASE_DIR, name), "rb") as f:
+            digest.update(f.read())
+    digest.update(f"minify={MINIFY_ENABLED}".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+CODE_VERSION = compute_code_version()
+
+def data_fingerprint(data):
+    """计算DataFrame的内容指纹"""
+    if data is None:
+        return ""
+    return hashlib.sha1(pd.util.hash_pandas_object(data, index=True).values.tobytes()).hexdigest()[:12]
+
+def compute_data_version():
+    """根据全部图表数据与核心指标计算数据版本
+
+    与全部图表都已渲染时的主页版本相同，主页请求写入快照时可直接复用，不必再次调用各数据函数。
+    """
+    return index_page_version([chart_data_version(loader() if loader else None)
+                               for loader, _ in CHART_REGISTRY.values()])
+
+def chart_data_version(data):
+    """图表缓存版本：代码版本 + 数据指纹"""
+    return f"{CODE_VERSION}:{data_fingerprint(data)}"
+
+PLACEHOLDER_SUFFIX = "加载中...</div>".encode("utf-8")
+
+def is_chart_placeholder(chart_html):
+    """判断是否为构建失败时的占位内容（UTF-8字节）"""
+    return chart_html.endswith(PLACEHOLDER_SUFFIX)
+
+def minify_output(html):
+    """压缩渲染结果（每个缓存版本只执行一次）"""
+    return minify_html(html) if MINIFY_ENABLED else html
+
+def noscript_link(name):
+    """交互图表的<noscript>备用：引用导出的SVG图片并链接到静态版图表页，不内联SVG（避免页面体积翻倍）"""
+    return (f'<noscript><a href="/chart/{name}?profile=static">'
+            f'<img class="svg-chart" src="/chart/{name}.svg" alt="静态图表" loading="lazy"></a></noscript>')
+
+def encoded_builder(builder, data=None, has_data=False, profile=None, noscript=None):
+    """包装图表构建函数，输出压缩并预编码的UTF-8字节，缓存后无需每次请求重新处理
+
+    noscript为HTML片段时附加在图表之后（浏览器禁用JavaScript时显示）。
+    """
+    def render():
+        chart_html = builder(data, profile=profile) if has_data else builder(profile=profile)
+        if noscript is not None and not chart_html.endswith("加载中...</div>"):
+            chart_html += noscript
+        return minify_output(chart_html).encode("utf-8")
+    return render
+
+def is_static_profile(profile):
+    """静态配置档只输出服务端SVG，不加载ECharts"""
+    return get_render_profile(profile)["renderer"] == "static"
+
+def static_chart_fallback(name, data=None):
+    """渲染超时时使用的静态SVG图表（按static配置档缓存），SVG也生成失败时返回占位内容"""
+    loader, _ = CHART_REGISTRY[name]
+    key = profile_key(f"chart:{name}", "static")
+    try:
+        return render_cache.get_or_render(key, chart_data_version(data), encoded_builder(
+            SVG_CHART_BUILDERS[name], data, has_data=loader is not None, profile="static"))
+    except Exception as e:
+        print(f"❌ SVG图表生成失败: {name} {e}")
+        return CHART_FALLBACKS[name]().encode("utf-8")
+
+def profile_key(key, profile):
+    """按渲染配置档区分的缓存key，各配置档的渲染结果分别缓存"""
+    return f"{key}@{profile}"
+
+def render_charts(names, profile=None, deadline_seconds=CHART_RENDER_DEADLINE):
+    """在截止时间内按配置档渲染多个图表，返回 {name: (html字节, version)}
+
+    未命中缓存的图表交给后台线程渲染；截止时间内未完成的图表先使用备用内容，
+    version记为None（页面不缓存），后台渲染完成后写入缓存供下次请求使用。
+    deadline_seconds为None时一直等待渲染完成。
+    """
+    profile = profile or DEFAULT_RENDER_PROFILE
+    deadline = None if deadline_seconds is None else time.monotonic() + deadline_seconds
+    static = is_static_profile(profile)
+    results = {}
+    pending = {}
+    for name in names:
+        loader, builder = CHART_REGISTRY[name]
+        if static:
+            builder = SVG_CHART_BUILDERS[name]
+        data = loader() if loader else None
+        version = chart_data_version(data)
+        key = profile_key(f"chart:{name}", profile)
+
+        chart_html = render_cache.get(key, version)
+        if chart_html is not None:
+            results[name] = (chart_html, version)
+            continue
+        # 构建失败时的占位内容不写入缓存，下次请求重试
+        render = tracer.bind(encoded_builder(builder, data, has_data=loader is not None, profile=profile,
+                                             noscript=None if static else noscript_link(name)))
+        future = render_cache.submit(key, version, render,
+                                     should_cache=lambda html: not is_chart_placeholder(html))
+        pending[name] = (future, version, data)
+
+    for name, (future, version, data) in pending.items():
+        try:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            chart_html = future.result(timeout=timeout)
+        except FutureTimeout:
+            print(f"⏱️ 图表渲染超时，先使用静态SVG图表: {name}")
+            results[name] = (static_chart_fallback(name, data), None)
+            continue
+        except Exception as e:
+            print(f"❌ 图表渲染失败: {name} {e}")
+            results[name] = (static_chart_fallback(name, data), None)
+            continue
+        results[name] = (chart_html, None if is_chart_placeholder(chart_html) else version)
+    return results
+
+def render_chart(name, profile=None):
+    """渲染单个图表，返回 (html字节, version)"""
+    return render_charts([name], profile)[name]
+
+def media_signature():
+    """媒体目录签名：目录内文件增删改名时变化"""
+    try:
+        return os.stat(os.path.join(BASE_DIR, "static", "images")).st_mtime_ns
+    except OSError:
+        return None
+
+def get_cached_media():
+    """获取媒体清单，目录未变化时复用缓存结果"""
+    return render_cache.get_or_render("media:manifest", media_signature(), get_local_media)
+
+def cached_page(key, version, build_html):
+    """读取或构建页面（字节片段列表）"""
+    return render_cache.get_or_render(key, version, build_html)
+
+def gzip_fragments(fragments):
+    """逐片段流式压缩为gzip，不先拼接整页"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    chunks = [compressor.compress(fragment) for fragment in fragments]
+    chunks.append(compressor.flush())
+    return b"".join(chunks)
+
+def compressed_variant(key, version, fragments):
+    """读取或生成页面的gzip压缩变体"""
+    return render_cache.get_or_render(f"{key}:gzip", version, lambda: gzip_fragments(fragments))
+
+def fragments_response(fragments):
+    """以字节片段序列作为响应体，WSGI服务器逐段写出，不拼接整页"""
+    if isinstance(fragments, bytes):
+        fragments = [fragments]
+    response = Response(fragments, mimetype="text/html")
+    response.headers["Content-Length"] = str(sum(len(fragment) for fragment in fragments))
+    return response
+
+def page_response(key, version, fragments, data_version=None):
+    """根据Accept-Encoding返回原始或压缩页面；version为None时不缓存
+
+    data_version为本次请求已算出的数据版本（主页即页面版本），写入快照时复用。
+    """
+    if version is None:
+        return fragments_response(fragments)
+    if "gzip" in request.accept_encodings:
+        response = fragments_response(compressed_variant(key, version, fragments))
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = fragments_response(fragments)
+    response.headers["Vary"] = PAGE_VARY
+    persist_render_cache(data_version)
+    return response
+
+_snapshot_lock = threading.Lock()
+_snapshot_timer = None
+_snapshot_data_version = None
+
+def persist_render_cache(data_version=None):
+    """缓存有新内容时安排写入磁盘快照
+
+    SNAPSHOT_DEBOUNCE秒内的多次写入合并为一次，在后台线程执行，不占用请求线程；
+    共享SQLite后端本身即持久化，不再另存快照。
+    """
+    global _snapshot_timer, _snapshot_data_version
+    if not SNAPSHOT_ENABLED or render_cache.backend is not None or not render_cache.dirty:
+        return
+    with _snapshot_lock:
+        if data_version is not None:
+            _snapshot_data_version = data_version
+        if _snapshot_timer is None:
+            _snapshot_timer = threading.Timer(SNAPSHOT_DEBOUNCE, flush_render_cache)
+            _snapshot_timer.daemon = True
+            _snapshot_timer.start()
+
+def flush_render_cache():
+    """立即写入待保存的快照（防抖定时器到期、预热完成与进程退出时调用）"""
+    global _snapshot_timer, _snapshot_data_version
+    with _snapshot_lock:
+        if _snapshot_timer is not None:
+            _snapshot_timer.cancel()
+        data_version = _snapshot_data_version
+        _snapshot_timer, _snapshot_data_version = None, None
+    if not SNAPSHOT_ENABLED or render_cache.backend is not None or not render_cache.dirty:
+        return
+    try:
+        save_snapshot(render_cache, SNAPSHOT_PATH, CODE_VERSION, data_version or compute_data_version())
+    except Exception as e:
+        print(f"⚠️ 缓存快照保存失败: {e}")
+
+atexit.register(flush_render_cache)
+
+def warm_render_cache():
+    """按全部配置档预先渲染图表、页面及其压缩变体，并写入快照"""
+    get_cached_media()
+    for profile in RENDER_PROFILES:
+        render_charts(CHART_REGISTRY, profile, deadline_seconds=None)
+        html, version = build_index_page(profile)
+        if version:
+            compressed_variant(profile_key("page:index", profile), version, html)
+        for name in CHART_REGISTRY:
+            html, version = build_chart_page(name, profile)
+            if version:
+                compressed_variant(profile_key(f"page:chart:{name}", profile), version, html)
+    flush_render_cache()
+    print(f"🔥 缓存预热完成: {len(render_cache)} 个条目")
+
+# 订单明细汇总表 -> 读取该汇总表的图表
+ROLLUP_CHARTS = {
+    "month_region": ("sales", "distribution"),
+    "quarter_sku": ("price",),
+    "price_sketch": ("price",),
+    "retention": ("retention",),
+}
+
+def invalidate_rollup_charts(changed):
+    """汇总表更新后只删除受影响图表的缓存（各配置档图表、图表页、导出图片）及主页"""
+    names = sorted({name for rollup in changed for name in ROLLUP_CHARTS.get(rollup, ())})
+    if not names:
+        return
+    for name in names:
+        for prefix in (f"chart:{name}@", f"page:chart:{name}@", f"export:{name}."):
+            render_cache.invalidate(prefix)
+    render_cache.invalidate("page:index@")
+    print(f"🔁 汇总表已更新 {sorted(changed)}，失效图表缓存: {', '.join(names)}")
+
+datasets.sales_store.subscribe(invalidate_rollup_charts)
+
+# ----------------- 页面模板 -----------------
+
+# 首页图表插槽：(图表名, 标题)
+DASHBOARD_CHART_SLOTS = [
+    ("sales", "📈 全球销售趋势分析"),
+    ("distribution", "🌐 销售渠道分布"),
+    ("price", "💰 产品价格走势"),
+    ("wordcloud", "🔥 社媒热度词云"),
+    ("user", "👥 用户画像分析"),
+    ("funnel", "📊 用户转化漏斗"),
+    ("retention", "🔁 首购同期群留存"),
+    ("competitor", "🏆 竞品对比分析"),
+]
+
+# 首页数据卡片：(popmart_data字段, 单位, 说明)，字段不存在时不显示
+STAT_CARDS = [
+    ("market_cap", "亿", "市值 (港元)"),
+    ("overseas_growth", "%", "海外增长率"),
+    ("labubu_revenue", "亿", "拉布布营收 (元)"),
+    ("unique_buyers", "万", f"独立买家 (近{datasets.REGION_WINDOW_MONTHS}个月)"),
+]
+
+PAGE_TEMPLATES = ("dashboard.html", "chart.html", "_stat_cards.html")
+PAGE_STYLESHEET = "css/dashboard.css"
+SLOT_PATTERN = re.compile(r"<!--slot:([\w:]+)-->")
+
+def static_url(filename):
+    """带内容哈希的静态文件地址，文件内容变化后浏览器缓存自动失效"""
+    with open(os.path.join(app.static_folder, filename), "rb") as f:
+        digest = hashlib.sha1(f.read()).hexdigest()[:10]
+    return f"{app.static_url_path}/{filename}?v={digest}"
+
+def page_shell(template_name):
+    """渲染页面外壳并按插槽切分，返回 [静态片段字节, 插槽名, 静态片段字节, ...]
+
+    外壳不含任何随数据变化的内容，按代码版本缓存，每次构建页面只需填充插槽。
+    """
+    def build():
+        template = app.jinja_env.get_template(template_name)
+        html = minify_output(template.render(
+            stylesheet=static_url(PAGE_STYLESHEET),
+            charts=[{"name": name, "title": title} for name, title in DASHBOARD_CHART_SLOTS],
+            slot=lambda name: Markup(f"<!--slot:{name}-->"),
+        ))
+        parts = SLOT_PATTERN.split(html)
+        return [part.encode("utf-8") if i % 2 == 0 else part for i, part in enumerate(parts)]
+
+    return render_cache.get_or_render(f"shell:{template_name}", CODE_VERSION, build)
+
+def assemble_page(shell, slots):
+    """将插槽内容填入页面外壳，返回字节片段列表
+
+    片段直接引用缓存中的字节对象，不做拼接和复制。
+    """
+    return [part if i % 2 == 0 else slots[part] for i, part in enumerate(shell)]
+
+def render_stat_cards():
+    """渲染首页数据卡片"""
+    data = popmart_data()
+    cards = [{"value": data[field], "unit": unit, "label": label}
+             for field, unit, label in STAT_CARDS if field in data]
+    return minify_output(app.jinja_env.get_template("_stat_cards.html").render(cards=cards)).encode("utf-8")
+
+# 启动时预编译模板（编译结果同时写入字节码缓存）
+for _template_name in PAGE_TEMPLATES:
+    app.jinja_env.get_template(_template_name)
+
+# ----------------- 页面构建 -----------------
+
+def page_version(*parts):
+    """根据代码版本与页面依赖计算页面版本"""
+    raw = "|".join([CODE_VERSION] + [str(part) for part in parts])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+def index_page_version(chart_versions):
+    """主页版本，chart_versions按CHART_REGISTRY顺序；含备用内容（None）时返回None"""
+    if None in chart_versions:
+        return None
+    return page_version(json.dumps(popmart_data(), sort_keys=True), *chart_versions)
+
+def build_index_page(profile=None):
+    """按配置档构建主页（命中缓存时直接返回），返回 (字节片段列表, version)"""
+    profile = profile or DEFAULT_RENDER_PROFILE
+    # 获取本地媒体文件
+    media_data = get_cached_media()
+
+    # 生成图表
+    rendered = render_charts(CHART_REGISTRY, profile)
+    version = index_page_version([rendered[name][1] for name in CHART_REGISTRY])
+
+    def build_html():
+        with tracer.span("index.build_html"):
+            slots = {f"chart:{name}": chart_html for name, (chart_html, _) in rendered.items()}
+            slots["stats"] = render_stat_cards()
+            return assemble_page(page_shell("dashboard.html"), slots)
+
+    # 含备用内容的页面不缓存
+    if version is None:
+        return build_html(), None
+    return cached_page(profile_key("page:index", profile), version, build_html), version
+
+def build_chart_page(chart_name, profile=None):
+    """按配置档构建单图表页面，返回 (字节片段列表, version)；图表不存在或使用备用内容时version为None"""
+    profile = profile or DEFAULT_RENDER_PROFILE
+    if chart_name in CHART_REGISTRY:
+        chart_html, chart_version = render_chart(chart_name, profile)
+        version = None if chart_version is None else page_version(chart_version)
+    else:
+        chart_html, version = "<h2>图表不存在</h2>".encode("utf-8"), None
+
+    def build_html():
+        return assemble_page(page_shell("chart.html"), {"chart": chart_html})
+
+    if version is None:
+        return build_html(), None
+    return cached_page(profile_key(f"page:chart:{chart_name}", profile), version, build_html), version
+
+# 启动时从快照预热（数据版本依赖上方的页面版本函数）
+if SNAPSHOT_ENABLED:
+    load_snapshot(render_cache, SNAPSHOT_PATH, CODE_VERSION, compute_data_version())
+
+# ----------------- 准入控制 -----------------
+
+ADMISSION_ENABLED = os.environ.get('ADMISSION_CONTROL', '1') != '0'
+ADMISSION_RETRY_AFTER = int(os.environ.get('ADMISSION_RETRY_AFTER', '5'))
+# 过载时优先返回最近一次缓存的页面，而不是排队或503
+ADMISSION_SERVE_STALE = os.environ.get('ADMISSION_SERVE_STALE', '1') != '0'
+
+# 每个worker进程一个限流器：gunicorn的 --threads 必须大于 并发上限 + 队列长度（见Procfile），
+# 否则请求在到达Flask之前就在gunicorn内部排队，排队超时与503永远不会触发
+render_limiter = AdmissionLimiter(
+    max_concurrent=int(os.environ.get('ADMISSION_MAX_CONCURRENT', '4')),
+    max_queue=int(os.environ.get('ADMISSION_MAX_QUEUE', '16')),
+    queue_timeout=float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', '5')),
+)
+
+def stale_page_response(key):
+    """返回最近一次缓存的页面，不存在时返回None"""
+    if "gzip" in request.accept_encodings:
+        body = render_cache.get_stale(f"{key}:gzip")
+        if body is not None:
+            response = fragments_response(body)
+            response.headers["Content-Encoding"] = "gzip"
+            response.headers["Vary"] = PAGE_VARY
+            response.headers["X-Served-Stale"] = "1"
+            return response
+    fragments = render_cache.get_stale(key)
+    if fragments is None:
+        return None
+    response = fragments_response(fragments)
+    response.headers["X-Served-Stale"] = "1"
+    return response
+
+def admission_controlled(page_key):
+    """渲染密集型路由的准入控制装饰器，page_key根据路由参数返回页面缓存key"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not ADMISSION_ENABLED:
+                return view(*args, **kwargs)
+
+            key = page_key(**kwargs)
+            if ADMISSION_SERVE_STALE and render_limiter.saturated:
+                stale = stale_page_response(key)
+                if stale is not None:
+                    render_limiter.record_stale()
+                    return stale
+
+            if not render_limiter.acquire():
+                stale = stale_page_response(key) if ADMISSION_SERVE_STALE else None
+                if stale is not None:
+                    render_limiter.record_stale()
+                    return stale
+                print(f"🚦 请求过多，已拒绝: {request.path}")
+                response = Response("<h1>访问人数过多，请稍后刷新</h1>", status=503, mimetype="text/html")
+                response.headers["Retry-After"] = str(ADMISSION_RETRY_AFTER)
+                return response
+            try:
+                return view(*args, **kwargs)
+            finally:
+                render_limiter.release()
+        return wrapper
+    return decorator
+
+# ----------------- 请求分析 -----------------
+
+# 设置PROFILER_SECRET后启用；未设置时不注册任何钩子，请求无额外开销
+PROFILER_SECRET = os.environ.get('PROFILER_SECRET')
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(BASE_DIR, '.cache', 'profiles'))
+# 报告下载地址的有效期（秒），以及最多保留的报告数
+PROFILER_TOKEN_TTL = int(os.environ.get('PROFILER_TOKEN_TTL', '3600'))
+PROFILE_MAX_REPORTS = int(os.environ.get('PROFILE_MAX_REPORTS', '50'))
+
+if PROFILER_SECRET:
+    @app.before_request
+    def start_request_profile():
+        """携带有效且未过期的令牌（?__profile= 或 X-Profile-Token）的请求开始采集"""
+        token = request.args.get('__profile') or request.headers.get('X-Profile-Token')
+        if not token or not verify_profile(PROFILER_SECRET, request.path, token):
+            return
+        # 图表在当前线程同步渲染，才能计入本次分析；__profile_cold=1 时忽略缓存
+        g.profile_render_mode = render_cache.inline_mode(bypass=request.args.get('__profile_cold') == '1')
+        g.profile_render_mode.__enter__()
+        g.request_profile = RequestProfile(request.full_path, PROFILE_DIR, max_reports=PROFILE_MAX_REPORTS)
+        g.request_profile.start()
+
+    @app.after_request
+    def finish_request_profile(response):
+        """停止采集，在响应头中返回报告下载地址"""
+        session = g.pop('request_profile', None)
+        if session is None:
+            return response
+        report_id = session.stop()
+        g.pop('profile_render_mode').__exit__(None, None, None)
+        token = issue_profile_token(PROFILER_SECRET, report_id, PROFILER_TOKEN_TTL)
+        response.headers['X-Profile-Report'] = f"/__profile/{report_id}?token={token}"
+        response.headers['X-Profile-Collapsed'] = f"/__profile/{report_id}.collapsed?token={token}"
+        print(f"🔬 请求分析报告已生成: {report_id}")
+        return response
+
+    @app.teardown_request
+    def abandon_request_profile(error=None):
+        """请求异常中断时清理未结束的分析"""
+        session = g.pop('request_profile', None)
+        if session is not None:
+            session.stop()
+            g.pop('profile_render_mode').__exit__(None, None, None)
+
+    @app.route('/__profile/<report_name>')
+    def download_profile(report_name):
+        """下载分析报告（.txt）或折叠栈（.collapsed）"""
+        report_id, _, ext = report_name.partition('.')
+        if not verify_profile(PROFILER_SECRET, report_id, request.args.get('token')):
+            abort(403)
+        if ext == 'collapsed':
+            path = RequestProfile.collapsed_path(PROFILE_DIR, report_id)
+        elif ext in ('', 'txt'):
+            path = RequestProfile.report_path(PROFILE_DIR, report_id)
+        else:
+            abort(404)
+        if not os.path.exists(path):
+            abort(404)
+        return send_file(path, mimetype='text/plain', as_attachment=ext == 'collapsed')
+
+# ----------------- 请求追踪 -----------------
+
+def trace_id_for(request_id):
+    """由请求ID得到32位十六进制traceId"""
+    if re.fullmatch(r"[0-9a-f]{32}", request_id):
+        return request_id
+    return hashlib.sha256(request_id.encode("utf-8")).hexdigest()[:32]
+
+@app.before_request
+def start_request_trace():
+    """分配请求ID，被采样的请求开始追踪"""
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+    if tracer.should_sample():
+        tracer.start_trace(trace_id_for(g.request_id))
+        g.trace_span = tracer.span(f"{request.method} {request.path}", kind=SPAN_KIND_SERVER, **{
+            "http.method": request.method,
+            "http.target": request.full_path,
+            "http.request_id": g.request_id,
+        })
+        g.trace_span_data = g.trace_span.__enter__()
+
+@app.after_request
+def finish_request_trace(response):
+    """结束追踪并在响应头中返回请求ID"""
+    response.headers['X-Request-ID'] = g.get('request_id', '')
+    span = g.pop('trace_span', None)
+    if span is not None:
+        g.pop('trace_span_data')['attributes']['http.status_code'] = response.status_code
+        span.__exit__(None, None, None)
+        tracer.end_trace()
+    return response
+
+@app.teardown_request
+def abandon_request_trace(error=None):
+    """请求异常中断时写出已记录的span"""
+    span = g.pop('trace_span', None)
+    if span is not None:
+        span.__exit__(None, None, None)
+        tracer.end_trace()
+
+# ----------------- 渲染配置档选择 -----------------
+
+# 网络较慢时使用轻量配置档的ECT取值
+SLOW_CONNECTION_TYPES = {"slow-2g", "2g", "3g"}
+# 页面响应随以下请求头变化（配置档由客户端提示决定）
+PAGE_VARY = "Accept-Encoding, Save-Data, ECT, Device-Memory"
+# 请求浏览器在后续请求中携带的客户端提示
+PAGE_ACCEPT_CH = "ECT, Device-Memory"
+
+def select_render_profile():
+    """为当前请求选择渲染配置档
+
+    优先级：?profile= 参数 > Save-Data > 网络类型(ECT)/设备内存 > 默认配置档。
+    """
+    profile = request.args.get('profile')
+    if profile in RENDER_PROFILES:
+        return profile
+    if request.headers.get('Save-Data', '').lower() == 'on':
+        return "lite"
+    if request.headers.get('ECT', '').lower() in SLOW_CONNECTION_TYPES:
+        return "lite"
+    try:
+        if float(request.headers.get('Device-Memory', '')) <= 1:
+            return "lite"
+    except ValueError:
+        pass
+    return DEFAULT_RENDER_PROFILE
+
+@app.after_request
+def advertise_client_hints(response):
+    """HTML页面声明所需的客户端提示，供下次请求选择配置档"""
+    if response.mimetype == "text/html":
+        response.headers['Accept-CH'] = PAGE_ACCEPT_CH
+    return response
+
 # ----------------- 路由函数 -----------------
 
 @app.route("/")
+@admission_controlled(lambda: profile_key("page:index", select_render_profile()))
 def index():
     """主页路由 - 使用直接HTML渲染而非模板"""
     try:
-        # 生成真实数据
-        sales_data = generate_real_sales_data()
-        global_data = generate_global_market_data()
-        price_data = generate_price_trend_data()
-        
-        # 获取本地媒体文件
-        media_data = get_local_media()
-        
-        # 生成图表
-        charts = {
-            "sales_trend": create_sales_trend_chart(sales_data),
-            "channel_distribution": create_global_distribution_chart(global_data),
-            "price_bar": create_price_analysis_chart(price_data),
-            "wordcloud": create_trending_wordcloud(),
-            "user_profile": create_user_profile_chart(),
-            "revenue_funnel": create_revenue_funnel(),
-            "competitor_analysis": create_competitor_analysis(),
-        }
-        
-        # 直接返回HTML，避免模板渲染问题
-        html_content = f"""
-<!DOCTYPE html>
-<html lang="zh-CN">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>娃改坊 | LABUBU潮玩改装配件专家</title>
-    <style>
-        body {{
-            font-family: 'Microsoft YaHei', sans-serif;
-            background: linear-gradient(135deg, #FFE4F1 0%, #E8F4FD 100%);
-            margin: 0;
-            padding: 0;
-            min-height: 100vh;
-        }}
-        .header {{
-            background: linear-gradient(135deg, #FF6B9D 0%, #4A90E2 100%);
-            color: white;
-            padding: 60px 20px;
-            text-align: center;
-        }}
-        .header h1 {{
-            font-size: 3rem;
-            margin-bottom: 10px;
-            font-weight: 800;
-        }}
-        .container {{
-            max-width: 1200px;
-            margin: 0 auto;
-            padding: 20px;
-        }}
-        .stats-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
-            gap: 20px;
-            margin: 30px 0;
-        }}
-        .stat-card {{
-            background: rgba(255, 255, 255, 0.95);
-            padding: 30px;
-            border-radius: 16px;
-            text-align: center;
-            box-shadow: 0 8px 32px rgba(0, 0, 0, 0.06);
-            border: 2px solid #FF6B9D20;
-        }}
-        .stat-number {{
-            font-size: 2.5rem;
-            font-weight: bold;
-            color: #FF6B9D;
-            margin-bottom: 10px;
-        }}
-        .chart-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(500px, 1fr));
-            gap: 30px;
-            margin: 40px 0;
-        }}
-        .chart {{
-            background: rgba(255, 255, 255, 0.95);
-            border-radius: 16px;
-            padding: 20px;
-            box-shadow: 0 8px 32px rgba(0, 0, 0, 0.06);
-            position: relative;
-        }}
-        .chart h3 {{
-            color: #2D3748;
-            margin-bottom: 20px;
-            font-size: 1.2rem;
-            font-weight: 600;
-        }}
-        iframe {{
-            width: 100%;
-            height: 520px;
-            border: none;
-            border-radius: 8px;
-        }}
-        .nav-links {{
-            text-align: center;
-            margin: 40px 0;
-        }}
-        .nav-links a {{
-            margin: 0 15px;
-            color: #FF6B9D;
-            text-decoration: none;
-            font-weight: bold;
-            padding: 12px 24px;
-            border: 2px solid #FF6B9D;
-            border-radius: 25px;
-            transition: all 0.3s ease;
-            display: inline-block;
-        }}
-        .nav-links a:hover {{
-            background: #FF6B9D;
-            color: white;
-        }}
-    </style>
-</head>
-<body>
-    <div class="header">
-        <h1>娃改坊数据洞察平台</h1>
-        <p>泡泡玛特 Labubu 全球数据分析</p>
-    </div>
-    
-    <div class="container">
-        <div class="stats-grid">
-            <div class="stat-card">
-                <div class="stat-number">{REAL_POPMART_DATA['market_cap']}亿</div>
-                <div>市值 (港元)</div>
-            </div>
-            <div class="stat-card">
-                <div class="stat-number">{REAL_POPMART_DATA['overseas_growth']}%</div>
-                <div>海外增长率</div>
-            </div>
-            <div class="stat-card">
-                <div class="stat-number">{REAL_POPMART_DATA['labubu_revenue']}亿</div>
-                <div>拉布布营收 (元)</div>
-            </div>
-        </div>
-        
-        <div class="chart-grid">
-            <div class="chart">
-                <h3>📈 全球销售趋势分析</h3>
-                {charts['sales_trend']}
-            </div>
-            <div class="chart">
-                <h3>🌐 销售渠道分布</h3>
-                {charts['channel_distribution']}
-            </div>
-            <div class="chart">
-                <h3>💰 产品价格走势</h3>
-                {charts['price_bar']}
-            </div>
-            <div class="chart">
-                <h3>🔥 社媒热度词云</h3>
-                {charts['wordcloud']}
-            </div>
-            <div class="chart">
-                <h3>👥 用户画像分析</h3>
-                {charts['user_profile']}
-            </div>
-            <div class="chart">
-                <h3>📊 用户转化漏斗</h3>
-                {charts['revenue_funnel']}
-            </div>
-            <div class="chart">
-                <h3>🏆 竞品对比分析</h3>
-                {charts['competitor_analysis']}
-            </div>
-        </div>
-        
-        <div class="nav-links">
-            <a href="/ppt">PPT版本</a>
-            <a href="/chart/competitor">象限图</a>
-            <a href="/business">商业计划</a>
-        </div>
-    </div>
-</body>
-</html>
-        """
-        
-        return html_content
-        
+        profile = select_render_profile()
+        fragments, version = build_index_page(profile)
+        return page_response(profile_key("page:index", profile), version, fragments, data_version=version)
+
     except Exception as e:
         print(f"❌ 主页生成失败: {e}")
         import traceback
@@ -764,72 +1434,311 @@ def index():
         return f"<h1>页面加载错误</h1><pre>{traceback.format_exc()}</pre>"
 
 @app.route("/chart/<chart_name>")
+@admission_controlled(lambda chart_name: profile_key(f"page:chart:{chart_name}", select_render_profile()))
 def single_chart(chart_name):
     """单独图表页面"""
     try:
-        sales_data = generate_real_sales_data()
-        global_data = generate_global_market_data()
-        price_data = generate_price_trend_data()
-
-        charts = {
-            "sales": create_sales_trend_chart(sales_data),
-            "distribution": create_global_distribution_chart(global_data),
-            "price": create_price_analysis_chart(price_data),
-            "wordcloud": create_trending_wordcloud(),
-            "user": create_user_profile_chart(),
-            "funnel": create_revenue_funnel(),
-            "competitor": create_competitor_analysis(),
-        }
-        
-        chart_html = charts.get(chart_name, "<h2>图表不存在</h2>")
-        
-        return f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>泡泡玛特数据图表</title>
-            <style>
-                body {{ 
-                    margin: 0; 
-                    padding: 20px; 
-                    background: linear-gradient(135deg, #FFE4F1 0%, #E8F4FD 100%);
-                    font-family: 'Microsoft YaHei', sans-serif;
-                    min-height: 100vh;
-                }}
-                .chart-container {{
-                    width: 100%;
-                    min-height: 550px;
-                    height: auto;
-                    background: rgba(255, 255, 255, 0.95);
-                    border-radius: 16px;
-                    box-shadow: 0 8px 32px rgba(0, 0, 0, 0.06);
-                    padding: 30px;
-                    box-sizing: border-box;
-                }}
-                iframe {{
-                    width: 100%;
-                    height: 500px;
-                    border: none;
-                    border-radius: 8px;
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="chart-container">
-                {chart_html}
-            </div>
-            <div style="text-align: center; margin-top: 20px;">
-                <a href="/" style="color: #FF6B9D;">← 返回首页</a>
-            </div>
-        </body>
-        </html>
-        """
+        profile = select_render_profile()
+        fragments, version = build_chart_page(chart_name, profile)
+        return page_response(profile_key(f"page:chart:{chart_name}", profile), version, fragments)
     except Exception as e:
         return f"<h1>图表加载错误</h1><pre>{str(e)}</pre>"
 
+@app.route("/ready")
+def ready():
+    """就绪检查：图表、页面与媒体缓存全部预热后返回200，否则返回503"""
+    warmth = cache_warmth()
+    is_ready = (all(warmth["charts"].values()) and all(warmth["pages"].values()) and warmth["media"])
+    payload = dict(warmth, ready=is_ready, warmup=warmup_state)
+    return jsonify(payload), 200 if is_ready else 503
+
+@app.route("/status/admission")
+def admission_status():
+    """准入控制状态：并发数、队列深度与拒绝计数"""
+    return jsonify(render_limiter.stats())
+
+# ----------------- 序列缩放 -----------------
+
+# 支持缩放加载的序列：图表名 -> (时间列, 数值列)
+ZOOMABLE_SERIES = {
+    "sales": ("month", "sales"),
+}
+
+@app.route("/api/series/<chart_name>")
+def series_zoom(chart_name):
+    """缩放范围内的序列数据（start/end为毫秒时间戳），点数超过points时降采样，范围足够小时即为原始分辨率"""
+    if chart_name not in ZOOMABLE_SERIES:
+        abort(404)
+    x_column, y_column = ZOOMABLE_SERIES[chart_name]
+    loader, _ = CHART_REGISTRY[chart_name]
+    budget = min(request.args.get("points", type=int) or point_budget(get_render_profile()), MAX_SERIES_POINTS)
+    start, end = request.args.get("start", type=int), request.args.get("end", type=int)
+    data = downsample_frame(loader(), x_column, y_column, max(budget, 3), start, end)
+    return jsonify({"start": start, "end": end, "points": series_points(data, x_column, y_column)})
+
+# ----------------- 转化漏斗 -----------------
+
+@app.route("/api/funnel")
+def funnel_stages():
+    """按时间窗口（start/end日期）、同期群（cohort=年-月）与转化时限（days）计算漏斗各阶段人数"""
+    if not os.path.exists(datasets.FUNNEL_EVENT_LOG):
+        abort(404)
+    try:
+        options = normalize_options(request.args.get("start"), request.args.get("end"), request.args.get("cohort"),
+                                    request.args.get("days"))
+    except ValueError:
+        abort(400)
+    # 未缓存的参数组合在后台计算，不占用请求线程；计算完成前返回202，客户端按Retry-After重试
+    stages = cached_funnel(datasets.FUNNEL_EVENT_LOG, wait=False, **options)
+    if stages is None:
+        # 最近计算失败的参数组合在FUNNEL_FAILURE_TTL内不重新计算，返回503而不是继续让客户端轮询
+        retry_after = funnel_retry_after(datasets.FUNNEL_EVENT_LOG, **options)
+        if retry_after is not None:
+            response = jsonify({"status": "failed", **options})
+            response.status_code = 503
+            response.headers["Retry-After"] = str(int(retry_after) + 1)
+            return response
+        response = jsonify({"status": "computing", **options})
+        response.status_code = 202
+        response.headers["Retry-After"] = "5"
+        return response
+    return jsonify({"stages": [{"stage": stage, "users": users} for stage, users in stages], **options})
+
+# ----------------- 独立买家 -----------------
+
+@app.route("/api/unique-buyers")
+def unique_buyers():
+    """按日期范围（start/end，含两端）与地区（regions=中国,美国）估计独立买家数，未指定范围时为最近REGION_WINDOW_MONTHS个月
+
+    返回实际使用的日期范围。
+    """
+    regions = request.args.get("regions")
+    regions = [region.strip() for region in regions.split(",") if region.strip()] if regions else None
+    try:
+        result = generate_unique_buyers_data(start=request.args.get("start"), end=request.args.get("end"), regions=regions)
+    except ValueError:
+        abort(400)
+    if result is None:
+        abort(404)
+    total, by_region, start, end = result
+    return jsonify({"start": start, "end": end, "regions": regions,
+                    "buyers": total, "by_region": by_region.to_dict(orient="records")})
+
+# ----------------- 用户画像 -----------------
+
+@app.route("/api/user-profile")
+def user_profile_segment():
+    """按细分维度（查询参数，如 ?city_tier=一线&channel=线上）返回画像指标，无参数时为全部客户"""
+    if not os.path.exists(datasets.CUSTOMER_TABLE):
+        abort(404)
+    # "__"开头的保留参数（如请求分析的 __profile）不是细分条件
+    segment = {name: value for name, value in request.args.items() if not name.startswith("__")}
+    # 客户表尚未聚合时在后台聚合，不占用请求线程；完成前返回202，客户端按Retry-After重试
+    if not datasets.profile_aggregator.ready():
+        response = jsonify({"status": "computing"})
+        response.status_code = 202
+        response.headers["Retry-After"] = "5"
+        return response
+    try:
+        segment = datasets.profile_aggregator.normalize_filters(segment)
+        data = generate_user_profile_data(**segment)
+    except ValueError:
+        abort(400)
+    return jsonify({"segment": segment, "indicators": data.to_dict(orient="records")})
+
+# ----------------- 图表导出 -----------------
+
+# 导出尺寸与PPT页面一致（16:9）
+EXPORT_WIDTH = int(os.environ.get('EXPORT_WIDTH', '1920'))
+EXPORT_HEIGHT = int(os.environ.get('EXPORT_HEIGHT', '1080'))
+# PNG按SVG内容哈希缓存在此目录，内容不变时不重复栅格化
+EXPORT_CACHE_DIR = os.environ.get('EXPORT_CACHE_DIR', os.path.join(BASE_DIR, '.cache', 'exports'))
+EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', '2'))
+EXPORT_MIMETYPES = {"svg": "image/svg+xml", "png": "image/png"}
+
+_export_pool = None
+_export_pool_lock = threading.Lock()
+
+def export_pool():
+    """PNG栅格化进程池（首次导出时创建）"""
+    global _export_pool
+    with _export_pool_lock:
+        if _export_pool is None:
+            _export_pool = ProcessPoolExecutor(max_workers=EXPORT_WORKERS)
+    return _export_pool
+
+def content_hash(content):
+    """导出文件的内容哈希"""
+    return hashlib.sha1(content).hexdigest()[:16]
+
+def chart_svg_document(name):
+    """幻灯片尺寸的独立SVG文档（UTF-8字节），按图表数据版本与导出尺寸缓存"""
+    loader, _ = CHART_REGISTRY[name]
+    data = loader() if loader else None
+    version = f"{chart_data_version(data)}:{EXPORT_WIDTH}x{EXPORT_HEIGHT}"
+
+    def build():
+        builder = SVG_CHART_BUILDERS[name]
+        svg = builder(data, profile="static") if loader else builder(profile="static")
+        return svg_charts.slide_document(svg, EXPORT_WIDTH, EXPORT_HEIGHT).encode("utf-8")
+
+    return render_cache.get_or_render(f"export:{name}.svg", version, build)
+
+def submit_png_export(svg_bytes):
+    """提交PNG栅格化，返回结果路径的Future；同内容的PNG已存在时直接返回"""
+    path = os.path.join(EXPORT_CACHE_DIR, f"{content_hash(svg_bytes)}.png")
+    if os.path.exists(path):
+        future = Future()
+        future.set_result(path)
+        return future
+    os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+    return export_pool().submit(svg_charts.rasterize_png, svg_bytes, path)
+
+def export_png(svg_bytes):
+    """栅格化为PNG并返回文件路径，同一内容的并发请求合并为一次"""
+    return render_cache.flights.do(("export:png", content_hash(svg_bytes)),
+                                   lambda: submit_png_export(svg_bytes).result())
+
+def export_all_charts(output_dir):
+    """批量导出全部图表的SVG与PNG，PNG在进程池中并行栅格化"""
+    start = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    futures = {}
+    for name in CHART_REGISTRY:
+        svg = chart_svg_document(name)
+        with open(os.path.join(output_dir, f"{name}.svg"), "wb") as f:
+            f.write(svg)
+        futures[name] = submit_png_export(svg)
+    for name, future in futures.items():
+        with open(future.result(), "rb") as src, open(os.path.join(output_dir, f"{name}.png"), "wb") as dst:
+            dst.write(src.read())
+        print(f"  🖼️ {name}.svg / {name}.png")
+    print(f"📦 已导出 {len(futures)} 个图表到 {output_dir}，用时 {time.perf_counter() - start:.2f}s")
+
+@app.route("/chart/<chart_name>.<any(svg, png):image_format>")
+def chart_image(chart_name, image_format):
+    """图表图片（幻灯片尺寸），可直接插入PPT"""
+    if chart_name not in CHART_REGISTRY:
+        abort(404)
+    try:
+        body = chart_svg_document(chart_name)
+        if image_format == "png":
+            with open(export_png(body), "rb") as f:
+                body = f.read()
+    except Exception as e:
+        print(f"❌ 图表导出失败: {chart_name}.{image_format} {e}")
+        return f"<h1>图表导出错误</h1><pre>{str(e)}</pre>", 500
+
+    response = Response(body, mimetype=EXPORT_MIMETYPES[image_format])
+    response.set_etag(content_hash(body))
+    response.headers["Content-Disposition"] = f'inline; filename="{chart_name}.{image_format}"'
+    return response.make_conditional(request)
+
+# ----------------- 启动预热 -----------------
+
+# 预热爬虫跳过的端点（静态文件、状态检查、分析报告下载、图片导出等）
+WARMUP_SKIP_ENDPOINTS = {"static", "favicon", "ready", "admission_status", "download_profile", "chart_image",
+                         "series_zoom", "funnel_stages", "unique_buyers",
+                         "user_profile_segment"}
+
+# 带参数路由的取值来源：参数名 -> 返回全部取值的函数
+WARMUP_ROUTE_ARGUMENTS = {
+    "chart_name": lambda: list(CHART_REGISTRY),
+}
+
+warmup_state = {"status": "pending", "urls": 0, "failed": [], "seconds": None}
+
+def cache_warmth():
+    """检查当前版本、全部配置档的图表、页面与媒体缓存是否已存在"""
+    chart_versions = {}
+    for name, (loader, _) in CHART_REGISTRY.items():
+        chart_versions[name] = chart_data_version(loader() if loader else None)
+
+    charts, pages = {}, {}
+    for profile in RENDER_PROFILES:
+        index_key = profile_key("page:index", profile)
+        pages[f"index@{profile}"] = render_cache.get(
+            index_key, index_page_version(list(chart_versions.values()))) is not None
+        for name, version in chart_versions.items():
+            charts[f"{name}@{profile}"] = render_cache.get(profile_key(f"chart:{name}", profile), version) is not None
+            pages[f"chart:{name}@{profile}"] = render_cache.get(
+                profile_key(f"page:chart:{name}", profile), page_version(version)) is not None
+    media = render_cache.get("media:manifest", media_signature()) is not None
+    return {"charts": charts, "pages": pages, "media": media}
+
+def warmup_urls():
+    """根据路由表生成需要预热的URL，带参数的路由按WARMUP_ROUTE_ARGUMENTS展开"""
+    urls = []
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint in WARMUP_SKIP_ENDPOINTS or "GET" not in rule.methods:
+            continue
+        if any(arg not in WARMUP_ROUTE_ARGUMENTS for arg in rule.arguments):
+            continue
+        combos = [{}]
+        for arg in sorted(rule.arguments):
+            combos = [dict(combo, **{arg: value}) for combo in combos for value in WARMUP_ROUTE_ARGUMENTS[arg]()]
+        with app.test_request_context():
+            urls.extend(url_for(rule.endpoint, **combo) for combo in combos)
+    return urls
+
+def crawl_warmup():
+    """依次请求全部路由（每个配置档gzip与非压缩各一次），填充缓存"""
+    start = time.perf_counter()
+    warmup_state["status"] = "running"
+    client = app.test_client()
+    urls = warmup_urls()
+    for url in urls:
+        for profile, headers in [(p, h) for p in RENDER_PROFILES for h in ({"Accept-Encoding": "gzip"}, {})]:
+            try:
+                response = client.get(url, query_string={"profile": profile},
+                                      headers=dict(headers, **{"X-Request-ID": f"warmup-{uuid.uuid4().hex[:8]}"}))
+                if response.status_code >= 500:
+                    warmup_state["failed"].append(url)
+            except Exception as e:
+                print(f"❌ 预热请求失败: {url} {e}")
+                warmup_state["failed"].append(url)
+    warmup_state.update(status="done", urls=len(urls), seconds=round(time.perf_counter() - start, 3))
+    print(f"🔥 启动预热完成: {len(urls)} 个路由，用时 {warmup_state['seconds']}s")
+
+# 共享缓存下预热锁的有效期（秒）：期间其他worker不再重复预热
+WARMUP_LOCK_TTL = int(os.environ.get('WARMUP_LOCK_TTL', '600'))
+
+def warmup_enabled():
+    """是否在启动时预热：WARMUP_ON_BOOT 显式设置时按设置
+
+    未设置时，gunicorn worker使用进程内缓存则不预热（每个worker各自渲染全部配置档与压缩变体代价过高，
+    改用 --warm-snapshot 生成的快照）；使用共享SQLite缓存时由抢到预热锁的一个worker预热。
+    """
+    setting = os.environ.get('WARMUP_ON_BOOT')
+    if setting:
+        return setting != '0'
+    return "gunicorn" not in sys.modules or render_cache.backend is not None
+
+def start_warmup():
+    """在后台线程预热；共享缓存时同一代码版本只由一个worker执行"""
+    if render_cache.backend is not None and not render_cache.backend.acquire_lock(f"warmup:{CODE_VERSION}",
+                                                                                 ttl=WARMUP_LOCK_TTL):
+        warmup_state["status"] = "skipped"
+        print("🔥 其他worker正在或已经完成预热，本进程跳过")
+        return
+    threading.Thread(target=crawl_warmup, name="warmup-crawler", daemon=True).start()
+
+# 启动后立即在后台预热，WARMUP_ON_BOOT=0 关闭
+if warmup_enabled() and not {"--warm-snapshot", "--export-charts"} & set(sys.argv):
+    start_warmup()
+
 if __name__ == "__main__":
+    # 部署构建阶段执行 python app.py --warm-snapshot，启动后即可直接命中缓存
+    if "--warm-snapshot" in sys.argv:
+        warm_render_cache()
+        sys.exit(0)
+
+    # 批量导出图表图片供PPT使用：python app.py --export-charts [输出目录]
+    if "--export-charts" in sys.argv:
+        args = sys.argv[sys.argv.index("--export-charts") + 1:]
+        export_all_charts(args[0] if args else os.path.join(BASE_DIR, "chart_exports"))
+        sys.exit(0)
+
     print("🚀 启动娃改坊数据洞察平台...")
     print(f"📊 当前市值: {REAL_POPMART_DATA['market_cap']}亿港元")
     print(f"🌍 海外增长率: {REAL_POPMART_DATA['overseas_growth']}%")
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据集 - 网站图表与PPT共用的数据表和静态数据，不依赖Flask
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from funnel import cached_funnel
+from sales_store import SalesStore
+from user_profile import ProfileAggregator
+
+# 订单明细存储目录（python sales_store.py ingest 导入），为空时图表使用内置数据
+SALES_STORE_DIR = os.environ.get('SALES_STORE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'sales_store'))
+sales_store = SalesStore(SALES_STORE_DIR)
+# 社媒热词统计结果（python trending_terms.py 生成），不存在时词云使用内置热词
+TRENDING_WORDS_PATH = os.environ.get('TRENDING_WORDS_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'trending_words.json'))
+# 用户行为事件日志（user_id, event, timestamp），不存在时漏斗图使用内置数据
+FUNNEL_EVENT_LOG = os.environ.get('FUNNEL_EVENT_LOG', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'events.csv'))
+# 漏斗图默认统计的时间范围与转化时限（天），为空时不限
+FUNNEL_START = os.environ.get('FUNNEL_START') or None
+FUNNEL_END = os.environ.get('FUNNEL_END') or None
+FUNNEL_CONVERSION_DAYS = float(os.environ['FUNNEL_CONVERSION_DAYS']) if os.environ.get('FUNNEL_CONVERSION_DAYS') else None
+# 客户表（性别、年龄、收入、分享、订单等），不存在时用户画像使用内置数据
+CUSTOMER_TABLE = os.environ.get('CUSTOMER_TABLE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'customers.csv'))
+profile_aggregator = ProfileAggregator(CUSTOMER_TABLE)
+# 全球市场分布统计最近N个月，增长率与再往前N个月比较
+REGION_WINDOW_MONTHS = 12
+# 价格分析图的成交价分布带（按季度×档次，由分位数草图估计）
+PRICE_BAND_QUANTILES = (0.1, 0.5, 0.9)
+
+
+def generate_real_sales_data():
+    """生成基于真实趋势的销售数据 - 更新到2025年6月（已导入订单明细时读取月度汇总）"""
+    if sales_store.has_data():
+        return sales_trend_from_store(sales_store)
+    base_date = datetime(2024, 1, 1)  # 从2024年开始显示最近18个月
+    months = []
+    sales = []
+    growth_rates = []
+    
+    # 真实的月度增长趋势（基于泡泡玛特实际业绩和2025年预测）
+    monthly_multipliers = [
+        # 2024年数据
+        4.5, 4.8, 5.2, 5.0, 6.8, 7.2, 7.8, 8.5, 8.2, 9.5, 10.2, 11.8,
+        # 2025年Q1-Q2数据（持续增长但增速放缓）
+        12.5, 13.2, 14.1, 14.8, 15.5, 16.2
+    ]
+    base_sales = 2000  # 基础销量
+    
+    for i in range(18):  # 显示18个月数据
+        current_date = base_date + timedelta(days=30 * i)
+        months.append(current_date.strftime("%Y-%m"))
+        
+        # LABUBU贡献因子（2024年持续高增长，2025年趋于稳定）
+        if i < 12:  # 2024年
+            labubu_factor = max(1.0, (i - 2) * 0.4) if i >= 2 else 1.0
+        else:  # 2025年
+            labubu_factor = 4.0 + (i - 12) * 0.1  # 稳定增长
+        
+        monthly_sales = int(base_sales * monthly_multipliers[i] * labubu_factor)
+        sales.append(monthly_sales)
+        
+        # 计算同比增长率
+        if i == 0:
+            growth_rates.append(0)
+        else:
+            growth_rate = ((sales[i] - sales[i-1]) / sales[i-1]) * 100
+            growth_rates.append(round(growth_rate, 1))
+    
+    return pd.DataFrame({
+        "month": months,
+        "sales": sales,
+        "growth_rate": growth_rates,
+        "labubu_contribution": [min(55, max(15, 15 + i * 2.5)) for i in range(18)],  # LABUBU贡献占比
+    })
+
+
+def generate_global_market_data():
+    """生成全球市场数据（已导入订单明细时读取地区汇总）"""
+    if sales_store.has_data():
+        return global_market_from_store(sales_store)
+    regions = ["中国大陆", "港澳台", "东南亚", "韩国", "日本", "北美", "欧洲", "其他"]
+    sales_data = [4200, 680, 1200, 450, 320, 280, 150, 120]  # 单位：万个
+    growth_rates = [35, 89, 245, 156, 78, 189, 234, 167]  # 增长率%
+    
+    return pd.DataFrame({
+        "region": regions,
+        "sales": sales_data,
+        "growth_rate": growth_rates
+    })
+
+
+def generate_price_trend_data():
+    """生成价格趋势数据 - 更新到2025年Q2（已导入订单明细时读取季度×SKU汇总）"""
+    if sales_store.has_data():
+        return price_trend_from_store(sales_store)
+    quarters = ["2023Q3", "2023Q4", "2024Q1", "2024Q2", "2024Q3", "2024Q4", "2025Q1", "2025Q2"]
+    # 基于真实泡泡玛特产品定价策略（显示近2年趋势）
+    avg_prices = [72, 75, 79, 85, 89, 95, 99, 105]  # 平均售价持续上升
+    premium_prices = [119, 129, 149, 159, 169, 189, 199, 219]  # 限量版价格
+    
+    return pd.DataFrame({
+        "quarter": quarters,
+        "avg_price": avg_prices,
+        "premium_price": premium_prices
+    })
+
+
+# 解析后的热词统计结果：((修改时间, 大小), 热词列表)，文件不变时不重复读取
+_trending_cache = (None, None)
+
+
+def generate_trending_words_data():
+    """社媒热词（word, weight）：读取热词统计结果（按文件修改时间与大小缓存），未生成时使用内置热词"""
+    global _trending_cache
+    try:
+        stat = os.stat(TRENDING_WORDS_PATH)
+    except FileNotFoundError:
+        return pd.DataFrame(TRENDING_WORDS, columns=["word", "weight"])
+    signature, words = _trending_cache
+    if signature != (stat.st_mtime_ns, stat.st_size):
+        with open(TRENDING_WORDS_PATH, "r", encoding="utf-8") as f:
+            words = [tuple(item) for item in json.load(f)] or TRENDING_WORDS
+        _trending_cache = ((stat.st_mtime_ns, stat.st_size), words)
+    return pd.DataFrame(words, columns=["word", "weight"])
+
+
+def generate_funnel_data(start=FUNNEL_START, end=FUNNEL_END, cohort=None, conversion_days=FUNNEL_CONVERSION_DAYS,
+                         wait=False):
+    """用户转化漏斗（stage, users）：由事件日志计算（按时间窗口与同期群缓存），日志不存在时使用内置数据
+
+    默认不等待：结果未计算完成时在后台计算，先返回内置数据；wait=True 时阻塞直到算完（PPT生成）。
+    参数不合法时抛出ValueError。
+    """
+    stages = None
+    if os.path.exists(FUNNEL_EVENT_LOG):
+        stages = cached_funnel(FUNNEL_EVENT_LOG, start=start, end=end, cohort=cohort, conversion_days=conversion_days,
+                               wait=wait)
+    return pd.DataFrame(stages or FUNNEL_STAGES, columns=["stage", "users"])
+
+
+def generate_user_profile_data(wait=False, **segment):
+    """用户画像（category, value%）：由客户表按细分计算（如 city_tier="一线"），客户表不存在时使用内置数据
+
+    默认不等待：客户表尚未聚合时在后台聚合，先返回内置数据；wait=True 时阻塞直到聚合完成（PPT生成）。
+    """
+    if os.path.exists(CUSTOMER_TABLE) and (wait or profile_aggregator.ready()):
+        return pd.DataFrame(profile_aggregator.segment(**segment), columns=["category", "value"])
+    return pd.DataFrame({"category": USER_PROFILE_CATEGORIES, "value": USER_PROFILE_VALUES})
+
+
+def generate_retention_data():
+    """首购同期群留存（cohort, period, customers, retention%）：已导入带买家ID的订单时读取留存矩阵，否则使用内置数据"""
+    if sales_store.has_data() and not sales_store.rollups["retention"].empty:
+        return sales_store.retention_matrix()
+    rows = [(cohort, period, round(size * rate / 100), rate)
+            for cohort, size, rates in RETENTION_COHORTS for period, rate in enumerate(rates)]
+    return pd.DataFrame(rows, columns=["cohort", "period", "customers", "retention"])
+
+
+def generate_unique_buyers_data(start=None, end=None, regions=None):
+    """独立买家估计（HyperLogLog）：(合计, 各地区表 region, buyers, 实际开始日期, 实际结束日期)
+
+    未指定日期范围时为最近REGION_WINDOW_MONTHS个月，只指定一端时另一端取数据的首/末日；
+    日期不合法或开始日期晚于结束日期时抛出ValueError；未导入带买家ID的订单时返回None。
+    """
+    if not sales_store.has_data():
+        return None
+    keys, _ = sales_store.buyer_sketches()
+    if len(keys) == 0:
+        return None
+    first = pd.Timestamp(int(keys.min() // 65536), unit="D")
+    last = pd.Timestamp(int(keys.max() // 65536), unit="D")
+    if start is None and end is None:
+        start = (last.to_period("M") - (REGION_WINDOW_MONTHS - 1)).start_time
+    start = (first if start is None else pd.Timestamp(start)).strftime("%Y-%m-%d")
+    end = (last if end is None else pd.Timestamp(end)).strftime("%Y-%m-%d")
+    if start > end:
+        raise ValueError(f"日期范围为空: {start} ~ {end}")
+    total, by_region = sales_store.unique_buyers(start, end, regions)
+    return total, by_region, start, end
+
+
+# ---- 订单明细汇总 -> 图表数据表（单位与内置数据一致） ----
+
+def _growth(current, previous):
+    return [round((c - p) / p * 100, 1) if p else 0 for c, p in zip(current, previous)]
+
+
+def sales_trend_from_store(store):
+    monthly = store.monthly_sales()
+    sales = (monthly["quantity"] / 10000).round(2).tolist()  # 单位：万个
+    return pd.DataFrame({
+        "month": monthly["month"],
+        "sales": sales,
+        "growth_rate": [0] + _growth(sales[1:], sales[:-1]),
+    })
+
+
+def global_market_from_store(store, months=REGION_WINDOW_MONTHS):
+    regions = store.region_sales(months).sort_values("quantity", ascending=False)
+    return pd.DataFrame({
+        "region": regions["region"].tolist(),
+        "sales": (regions["quantity"] / 10000).round(2).tolist(),  # 单位：万个
+        "growth_rate": _growth(regions["quantity"].tolist(), regions["previous_quantity"].tolist()),
+    })
+
+
+def price_trend_from_store(store):
+    """季度均价与限量版均价，另附各档次成交价分位数列，列名为 "档次|p50" 形式"""
+    prices = store.quarterly_prices()
+    frame = pd.DataFrame({
+        "quarter": prices["quarter"],
+        "avg_price": prices["avg_price"].round(1),
+        "premium_price": prices["premium_price"].round(1),
+    })
+    bands = store.price_quantiles(PRICE_BAND_QUANTILES)
+    if not bands.empty:
+        wide = bands.pivot(index="quarter", columns="tier").reindex(frame["quarter"])
+        for tier in bands["tier"].unique():
+            for column in bands.columns[2:]:
+                frame[f"{tier}|{column}"] = wide[(column, tier)].round(1).to_numpy()
+    return frame
+
+
+def price_band_tiers(data):
+    """价格数据中带分位数分布的档次列表"""
+    return [column.split("|")[0] for column in data.columns if column.endswith("|p50")]
+
+
+# ---- 图表静态数据 ----
+
+# 社媒热词：(词, 热度)
+TRENDING_WORDS = [
+    ("Labubu", 1000), ("拉布布", 950), ("泡泡玛特", 800), ("盲盒", 700),
+    ("POPMART", 650), ("潮玩", 600), ("限量版", 550), ("隐藏款", 500),
+    ("蕾哈娜", 450), ("Lisa", 420), ("收藏", 400), ("可爱", 380)
+]
+
+# 用户画像维度与占比（百分比）
+USER_PROFILE_CATEGORIES = ["女性用户", "15-25岁", "收入中高", "社交活跃", "品牌忠诚", "冲动消费"]
+USER_PROFILE_VALUES = [75, 68, 72, 85, 63, 78]
+
+# 用户转化漏斗：(阶段, 人数)
+FUNNEL_STAGES = [("潜在用户", 10000), ("关注用户", 6500), ("首次购买", 3200), ("复购用户", 1800), ("忠实粉丝", 800)]
+
+# 首购同期群：(首购月份, 首购人数, 首购后第0..N个月的复购留存率%)
+RETENTION_COHORTS = [
+    ("2025-01", 3200, [100, 38, 29, 25, 22, 20]),
+    ("2025-02", 2900, [100, 41, 31, 27, 24]),
+    ("2025-03", 3500, [100, 44, 34, 29]),
+    ("2025-04", 3800, [100, 46, 35]),
+    ("2025-05", 4100, [100, 47]),
+    ("2025-06", 4600, [100]),
+]
+
+# 竞品：[公司, 市值(亿港元), 品牌力指数]
+COMPETITOR_DATA = [
+    ["泡泡玛特", 3100, 85],
+    ["52TOYS", 120, 72],
+    ["TopToy", 50, 68],
+    ["酷乐潮玩", 30, 65],
+    ["IP小站", 25, 62],
+    ["万代", 800, 78],
+    ["MINISO名创", 180, 70]
+]
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+时间序列降采样 - 把长序列压缩到固定点数，保留曲线形状（LTTB / 最小最大值分桶）
+"""
+
+import numpy as np
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets 降采样，返回保留点的下标
+
+    首尾点固定保留，其余点均分为 threshold-2 个桶，每个桶选出与
+    上一个保留点、下一个桶均值构成三角形面积最大的点。
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    indices = np.empty(threshold, dtype=int)
+    indices[0], indices[-1] = 0, n - 1
+    selected = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        # 三角形面积的两倍（省略常数因子，只用于比较大小）
+        areas = np.abs((x[selected] - avg_x) * (y[start:end] - y[selected])
+                       - (x[selected] - x[start:end]) * (avg_y - y[selected]))
+        selected = start + int(areas.argmax())
+        indices[i + 1] = selected
+    return indices
+
+
+def minmax(x, y, threshold):
+    """最小最大值分桶降采样，返回保留点的下标（按原顺序）
+
+    每个桶保留最小值和最大值两个点，尖峰不会被平滑掉，适合波动剧烈的数据。
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if threshold >= n or threshold < 4:
+        return np.arange(n)
+
+    buckets = (threshold - 2) // 2
+    edges = np.linspace(1, n - 1, buckets + 1).astype(int)
+    keep = [0, n - 1]
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end > start:
+            keep.append(start + int(y[start:end].argmin()))
+            keep.append(start + int(y[start:end].argmax()))
+    return np.unique(keep)
+
+
+METHODS = {"lttb": lttb, "minmax": minmax}
+
+
+def downsample(x, y, threshold, method="lttb"):
+    """按指定方法降采样，返回保留点的下标；点数不超过threshold时原样返回全部下标"""
+    return METHODS[method](x, y, threshold)
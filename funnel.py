@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+转化漏斗 - 从事件日志（user_id, event, timestamp）分块计算各阶段人数，按时间窗口与同期群缓存结果
+"""
+
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from render_cache import SingleFlight
+
+EVENT_COLUMNS = ["user_id", "event", "timestamp"]
+CHUNK_ROWS = int(os.environ.get('FUNNEL_CHUNK_ROWS', '2000000'))
+FUNNEL_CACHE_DIR = os.environ.get('FUNNEL_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'funnel'))
+# 最多保留的结果缓存文件数（不同日志与参数组合），超出时删除最早写入的
+FUNNEL_CACHE_MAX_ENTRIES = int(os.environ.get('FUNNEL_CACHE_MAX_ENTRIES', '64'))
+# 后台计算队列长度上限，队列满时新的参数组合暂不计算
+FUNNEL_MAX_PENDING = int(os.environ.get('FUNNEL_MAX_PENDING', '4'))
+# 后台计算失败的参数组合在此秒数内不再重新提交，避免每次轮询都重新扫描日志
+FUNNEL_FAILURE_TTL = float(os.environ.get('FUNNEL_FAILURE_TTL', '60'))
+# 转化时限的取值范围（天）
+MAX_CONVERSION_DAYS = 365
+COHORT_PATTERN = re.compile(r"^\d{4}-\d{2}$")
+
+# 漏斗阶段：(阶段名, 事件, 次数) —— 上一阶段完成之后再发生"次数"次该事件即进入本阶段
+FUNNEL_STEPS = [
+    ("潜在用户", "visit", 1),
+    ("关注用户", "follow", 1),
+    ("首次购买", "purchase", 1),
+    ("复购用户", "purchase", 1),
+    ("忠实粉丝", "purchase", 3),
+]
+
+
+class FunnelState:
+    """逐块推进的用户漏斗状态（按用户编码索引的数组）
+
+    stage：已完成的阶段数；step_time：完成最近一个阶段的时间；progress：当前阶段已累计的事件次数；
+    entry_time：进入漏斗（完成第一阶段）的时间，用于同期群与转化时限。
+    """
+
+    def __init__(self, steps):
+        self.steps = steps
+        self.users = pd.Index([], dtype=object)
+        self.stage = np.zeros(0, dtype=np.int8)
+        self.step_time = np.zeros(0, dtype=np.int64)
+        self.entry_time = np.zeros(0, dtype=np.int64)
+        self.progress = np.zeros(0, dtype=np.int32)
+
+    def encode_users(self, user_ids):
+        """用户ID转换为编码，新用户追加到末尾并扩展状态数组"""
+        uniques = pd.unique(user_ids)
+        new_users = uniques[self.users.get_indexer(uniques) < 0]
+        if len(new_users):
+            self.users = self.users.append(pd.Index(new_users, dtype=object))
+            grow = len(new_users)
+            self.stage = np.concatenate([self.stage, np.zeros(grow, dtype=np.int8)])
+            self.step_time = np.concatenate([self.step_time, np.zeros(grow, dtype=np.int64)])
+            self.entry_time = np.concatenate([self.entry_time, np.zeros(grow, dtype=np.int64)])
+            self.progress = np.concatenate([self.progress, np.zeros(grow, dtype=np.int32)])
+        return self.users.get_indexer(user_ids)
+
+    def advance(self, users, events, times, conversion_seconds=None):
+        """用一块事件推进状态（块内按时间排序，跨块要求日志按时间追加）
+
+        逐阶段向量化匹配：只取当前处于上一阶段、且晚于上一阶段完成时间的该类事件，
+        每个用户按时间取第 (次数-已累计) 个事件作为完成时间；事件不足时累计次数留给下一块。
+        """
+        order = np.lexsort((times, users))
+        users, events, times = users[order], events[order], times[order]
+        for index, (_, event, count) in enumerate(self.steps):
+            mask = (events == event) & (self.stage[users] == index)
+            if index > 0:
+                mask &= times > self.step_time[users]
+                if conversion_seconds is not None:
+                    mask &= times <= self.entry_time[users] + conversion_seconds
+            step_users, step_times = users[mask], times[mask]
+            if len(step_users) == 0:
+                continue
+            # 已按(用户, 时间)排序：计算每个事件在该用户内的序号
+            starts = np.r_[0, np.flatnonzero(step_users[1:] != step_users[:-1]) + 1]
+            lengths = np.diff(np.r_[starts, len(step_users)])
+            rank = np.arange(len(step_users)) - np.repeat(starts, lengths)
+            need = count - self.progress[step_users]
+            hit = rank == need - 1
+            done_users = step_users[hit]
+            self.stage[done_users] = index + 1
+            self.step_time[done_users] = step_times[hit]
+            self.progress[done_users] = 0
+            if index == 0:
+                self.entry_time[done_users] = step_times[hit]
+            # 事件不足的用户累计次数
+            group_users = step_users[starts]
+            short = lengths < need[starts]
+            self.progress[group_users[short]] += lengths[short].astype(np.int32)
+
+    def counts(self, cohort=None):
+        """各阶段人数；cohort为 "2025-03" 形式时只统计该月进入漏斗的用户"""
+        stage = self.stage
+        if cohort is not None:
+            months = self.entry_time.astype("datetime64[s]").astype("datetime64[M]")
+            stage = stage[(stage > 0) & (months == np.datetime64(cohort, "M"))]
+        return [(name, int((stage > index).sum())) for index, (name, _, _) in enumerate(self.steps)]
+
+
+def parse_time(value):
+    """时间（字符串或datetime）转换为秒级时间戳，None原样返回"""
+    return None if value is None else int(pd.Timestamp(value).timestamp())
+
+
+def compute_funnel(path, start=None, end=None, cohort=None, conversion_days=None, steps=FUNNEL_STEPS,
+                   chunk_rows=CHUNK_ROWS):
+    """分块读取事件日志CSV计算漏斗：[(阶段名, 人数)]
+
+    start/end 限定事件时间范围 [start, end)；cohort 只统计该月进入漏斗的用户；
+    conversion_days 要求各阶段在进入漏斗后N天内完成。
+    """
+    state = FunnelState(steps)
+    start, end = parse_time(start), parse_time(end)
+    conversion_seconds = None if conversion_days is None else int(conversion_days * 86400)
+    event_names = sorted({event for _, event, _ in steps})
+    reader = pd.read_csv(path, usecols=EVENT_COLUMNS, chunksize=chunk_rows,
+                         dtype={"user_id": "string", "event": "category"})
+    for chunk in reader:
+        chunk = chunk[chunk["event"].isin(event_names)]
+        times = pd.to_datetime(chunk["timestamp"]).to_numpy().astype("datetime64[s]").astype(np.int64)
+        mask = np.ones(len(chunk), dtype=bool)
+        if start is not None:
+            mask &= times >= start
+        if end is not None:
+            mask &= times < end
+        if not mask.any():
+            continue
+        users = state.encode_users(chunk["user_id"].to_numpy(dtype=object)[mask])
+        events = chunk["event"].astype(str).to_numpy(dtype=object)[mask]
+        state.advance(users, events, times[mask], conversion_seconds)
+    return state.counts(cohort)
+
+
+def funnel_cache_path(path, **options):
+    """结果缓存文件：按日志文件（路径、大小、修改时间）与计算参数区分"""
+    stat = os.stat(path)
+    key = json.dumps([os.path.abspath(path), stat.st_size, stat.st_mtime_ns, FUNNEL_STEPS, options],
+                     sort_keys=True, ensure_ascii=False, default=str)
+    return os.path.join(FUNNEL_CACHE_DIR, hashlib.sha1(key.encode("utf-8")).hexdigest()[:16] + ".json")
+
+
+def normalize_options(start=None, end=None, cohort=None, conversion_days=None):
+    """校验并规整查询参数，不合法时抛出ValueError
+
+    时间统一到日期（同一天内的不同写法共用一个缓存），转化时限取整并限制在 1~365 天，
+    同期群必须为 "年-月"，从而限制不同参数组合的数量。
+    """
+    start = None if start in (None, "") else pd.Timestamp(start).strftime("%Y-%m-%d")
+    end = None if end in (None, "") else pd.Timestamp(end).strftime("%Y-%m-%d")
+    if start is not None and end is not None and start >= end:
+        raise ValueError(f"时间窗口为空: {start} ~ {end}")
+    if cohort in (None, ""):
+        cohort = None
+    elif not COHORT_PATTERN.match(str(cohort)):
+        raise ValueError(f"同期群应为 年-月: {cohort}")
+    else:
+        # 格式正确但月份不存在（如 2025-13、2025-00）同样视为不合法
+        try:
+            pd.Period(cohort, "M")
+        except (ValueError, OverflowError):
+            raise ValueError(f"同期群月份不存在: {cohort}") from None
+    if conversion_days is not None:
+        conversion_days = float(conversion_days)
+        if not math.isfinite(conversion_days):
+            raise ValueError(f"转化时限必须为有限数值: {conversion_days}")
+        conversion_days = min(max(int(round(conversion_days)), 1), MAX_CONVERSION_DAYS)
+    return {"start": start, "end": end, "cohort": cohort, "conversion_days": conversion_days}
+
+
+_flights = SingleFlight()
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="funnel")
+_pending = set()
+_pending_lock = threading.Lock()
+# 缓存文件 -> 最近一次后台计算失败的时间（time.monotonic）
+_failures = {}
+
+
+def _read_cache(cache_path):
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return [tuple(item) for item in json.load(f)]
+    except FileNotFoundError:
+        return None
+
+
+def _prune_cache(max_entries=FUNNEL_CACHE_MAX_ENTRIES):
+    """只保留最近写入的max_entries个结果文件"""
+    try:
+        names = [name for name in os.listdir(FUNNEL_CACHE_DIR) if name.endswith(".json")]
+    except OSError:
+        return
+    paths = sorted((os.path.join(FUNNEL_CACHE_DIR, name) for name in names), key=os.path.getmtime, reverse=True)
+    for stale in paths[max_entries:]:
+        try:
+            os.remove(stale)
+        except OSError:
+            pass
+
+
+def _compute_and_store(path, cache_path, options):
+    stages = _read_cache(cache_path)
+    if stages is not None:
+        return stages
+    stages = compute_funnel(path, **options)
+    os.makedirs(FUNNEL_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(stages, f, ensure_ascii=False)
+    os.replace(tmp_path, cache_path)
+    _prune_cache()
+    return stages
+
+
+def cached_funnel(path, start=None, end=None, cohort=None, conversion_days=None, wait=True):
+    """带磁盘缓存的 compute_funnel：同一日志与参数只计算一次，日志变化后自动重新计算
+
+    同一缓存文件的并发计算合并为一次（SingleFlight）。wait=False 时不在调用线程扫描日志：
+    结果未就绪则交给后台线程计算并返回None（队列已满时暂不提交），调用方先使用备用数据。
+    """
+    options = normalize_options(start, end, cohort, conversion_days)
+    cache_path = funnel_cache_path(path, **options)
+    stages = _read_cache(cache_path)
+    if stages is not None:
+        return stages
+    if wait:
+        return _flights.do(cache_path, lambda: _compute_and_store(path, cache_path, options), timeout=3600)
+    with _pending_lock:
+        if cache_path in _pending or len(_pending) >= FUNNEL_MAX_PENDING or _failure_age(cache_path) is not None:
+            return None
+        _pending.add(cache_path)
+
+    def run():
+        try:
+            _flights.do(cache_path, lambda: _compute_and_store(path, cache_path, options), timeout=3600)
+        except Exception as e:
+            print(f"❌ 漏斗计算失败: {e}")
+            with _pending_lock:
+                _failures[cache_path] = time.monotonic()
+        finally:
+            with _pending_lock:
+                _pending.discard(cache_path)
+
+    _executor.submit(run)
+    return None
+
+
+def _failure_age(cache_path):
+    """最近一次失败距今的秒数，未失败或已超过FUNNEL_FAILURE_TTL时返回None（调用方持有_pending_lock）"""
+    now = time.monotonic()
+    for key in [key for key, failed_at in _failures.items() if now - failed_at >= FUNNEL_FAILURE_TTL]:
+        del _failures[key]
+    failed_at = _failures.get(cache_path)
+    return None if failed_at is None else now - failed_at
+
+
+def funnel_retry_after(path, **options):
+    """参数组合最近后台计算失败时返回距可重新提交的秒数，否则返回None"""
+    cache_path = funnel_cache_path(path, **normalize_options(**options))
+    with _pending_lock:
+        age = _failure_age(cache_path)
+    return None if age is None else FUNNEL_FAILURE_TTL - age
+
+
+def funnel_pending():
+    """后台正在计算或排队的参数组合数"""
+    with _pending_lock:
+        return len(_pending)
+
+
+if __name__ == "__main__":
+    # 用法：python funnel.py events.csv [--start 2025-01-01] [--end 2025-07-01] [--cohort 2025-03] [--days 30]
+    args = sys.argv[1:]
+    options = {}
+    for flag, name, cast in (("--start", "start", str), ("--end", "end", str), ("--cohort", "cohort", str),
+                             ("--days", "conversion_days", float)):
+        if flag in args:
+            i = args.index(flag)
+            options[name] = cast(args[i + 1])
+            del args[i:i + 2]
+    if len(args) != 1:
+        print("用法: python funnel.py <events.csv> [--start 日期] [--end 日期] [--cohort 年-月] [--days 天数]")
+        sys.exit(1)
+    begin = time.perf_counter()
+    # 结果写入缓存，网站漏斗图使用相同参数时直接读取
+    for name, users in cached_funnel(args[0], **options):
+        print(f"  {name}: {users}")
+    print(f"📊 用时 {time.perf_counter() - begin:.1f}s")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基数草图 - HyperLogLog可合并去重计数，用固定内存估计海量订单中的独立买家数
+"""
+
+import numpy as np
+
+# 默认精度：2^12 个寄存器（每个草图4KB），标准误差约 1.04/√4096 ≈ 1.6%
+DEFAULT_PRECISION = 12
+
+
+def register_values(hashes, precision=DEFAULT_PRECISION):
+    """64位哈希 -> (寄存器序号, 秩)：高precision位选寄存器，秩为其余位中第一个1的位置"""
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    index = (hashes >> np.uint64(64 - precision)).astype(np.intp)
+    rest = hashes & np.uint64((1 << (64 - precision)) - 1)
+    # 其余位不超过53位时可精确转为浮点，frexp的指数即二进制位数（0的位数为0）
+    _, bits = np.frexp(rest.astype(np.float64))
+    return index, (64 - precision - bits + 1).astype(np.uint8)
+
+
+def group_registers(hashes, groups, n_groups, precision=DEFAULT_PRECISION):
+    """按组（0..n_groups-1）一次构建多个草图的寄存器矩阵（n_groups × 2^precision）"""
+    registers = np.zeros((n_groups, 1 << precision), dtype=np.uint8)
+    if len(hashes):
+        index, rank = register_values(hashes, precision)
+        np.maximum.at(registers, (np.asarray(groups, dtype=np.intp), index), rank)
+    return registers
+
+
+def estimate(registers):
+    """由寄存器估计基数（小基数时使用线性计数修正）"""
+    registers = np.asarray(registers)
+    m = registers.shape[-1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int32)))
+    zeros = int(np.count_nonzero(registers == 0))
+    if raw <= 2.5 * m and zeros:
+        return m * np.log(m / zeros)
+    return float(raw)
+
+
+class HyperLogLog:
+    """HyperLogLog基数草图
+
+    每个寄存器记录落入该桶的哈希中"第一个1"出现的最大位置；两个草图逐寄存器取最大值即完成合并，
+    因此可以按 地区×日 分别构建、查询任意日期范围与地区组合时再合并，结果与一次性统计相同。
+    """
+
+    def __init__(self, precision=DEFAULT_PRECISION, registers=None):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8) if registers is None else np.asarray(registers, dtype=np.uint8)
+
+    def update(self, hashes):
+        """批量加入64位哈希值"""
+        index, rank = register_values(hashes, self.precision)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def merge(self, other):
+        """合并另一个草图（原地修改并返回自身）"""
+        if other.precision != self.precision:
+            raise ValueError(f"精度不同的草图不能合并: {self.precision} != {other.precision}")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        """估计的不同元素个数"""
+        return estimate(self.registers)
+
+    def __len__(self):
+        return int(round(self.estimate()))
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTML/CSS/内联JS压缩 - 去除缩进、注释与多余空白，渲染结果缓存前执行一次
+"""
+
+import re
+
+# 需要单独处理内容的标签，以及HTML注释
+_BLOCK_PATTERN = re.compile(
+    r"(<script\b[^>]*>.*?</script\s*>|<style\b[^>]*>.*?</style\s*>|<pre\b[^>]*>.*?</pre\s*>"
+    r"|<textarea\b[^>]*>.*?</textarea\s*>|<!--.*?-->)",
+    re.IGNORECASE | re.DOTALL,
+)
+_OPEN_TAG_PATTERN = re.compile(r"^(<(script|style)\b[^>]*>)(.*)(</\2\s*>)$", re.IGNORECASE | re.DOTALL)
+_SCRIPT_TYPE_PATTERN = re.compile(r"\btype\s*=\s*[\"']?([^\"'\s>]+)", re.IGNORECASE)
+_JS_TYPES = {"text/javascript", "application/javascript", "module"}
+
+# 保留的注释：页面插槽标记与IE条件注释
+_KEEP_COMMENT_PREFIXES = ("<!--slot:", "<!--[if", "<!--<![endif]")
+
+_WHITESPACE = " \t\r\n\f\v"
+# 其后换行可以安全删除的字符（不会触发JS自动分号插入的歧义）
+_NO_BREAK_AFTER = set("{[(,;:")
+# 其前换行可以安全删除的字符
+_NO_BREAK_BEFORE = set("}]),;:")
+# 其后出现的 "/" 视为正则表达式字面量
+_REGEX_AFTER = set("(,=:[!&|?{};+-*%<>~^")
+# 其后出现的 "/" 同样视为正则表达式字面量的关键字（而非除号）
+_REGEX_AFTER_KEYWORDS = {"return", "typeof", "case", "in", "of", "delete", "void", "throw", "new", "yield",
+                         "instanceof", "do", "else", "await"}
+
+
+def _is_word(ch):
+    return ch.isalnum() or ch in "_$\\" or ord(ch) > 127
+
+
+def minify_css(css):
+    """压缩CSS：去注释，去掉符号两侧空白与末尾分号"""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.DOTALL)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r"\s*:\s*(?=[^{}]*[;}])", ":", css)
+    css = css.replace(";}", "}")
+    return css.strip()
+
+
+def minify_js(js):
+    """保守地压缩JS
+
+    按词法跳过字符串、模板字符串和正则字面量，只删除注释与多余空白；
+    可能影响自动分号插入的换行一律保留，JsCode片段因此可以安全处理。
+    """
+    out = []
+    i, n = 0, len(js)
+    last = ""
+    word = ""
+    pending = None
+    while i < n:
+        ch = js[i]
+
+        if ch in _WHITESPACE:
+            j = i
+            while j < n and js[j] in _WHITESPACE:
+                j += 1
+            pending = "\n" if pending == "\n" or "\n" in js[i:j] else " "
+            i = j
+            continue
+        if js.startswith("//", i):
+            j = js.find("\n", i)
+            i = n if j == -1 else j
+            continue
+        if js.startswith("/*", i):
+            j = js.find("*/", i + 2)
+            # 跨行的块注释等同于换行，否则 "a /* \n */ b" 会失去自动分号插入
+            pending = "\n" if pending == "\n" or "\n" in js[i:j] else " "
+            i = n if j == -1 else j + 2
+            continue
+
+        if pending and last:
+            if pending == "\n" and last not in _NO_BREAK_AFTER and ch not in _NO_BREAK_BEFORE:
+                out.append("\n")
+            elif _is_word(last) and _is_word(ch):
+                out.append(" ")
+            elif last in "+-" and ch == last:
+                out.append(" ")
+            elif last.isdigit() and ch == ".":
+                out.append(" ")
+        pending = None
+
+        if ch in "'\"`":
+            j = i + 1
+            while j < n and js[j] != ch:
+                j += 2 if js[j] == "\\" else 1
+            out.append(js[i:j + 1])
+            i = j + 1
+            last, word = ch, ""
+            continue
+        if ch == "/" and (last == "" or last in _REGEX_AFTER or word in _REGEX_AFTER_KEYWORDS):
+            j = i + 1
+            in_class = False
+            while j < n and js[j] != "\n":
+                if js[j] == "\\":
+                    j += 2
+                    continue
+                if js[j] == "[":
+                    in_class = True
+                elif js[j] == "]":
+                    in_class = False
+                elif js[j] == "/" and not in_class:
+                    break
+                j += 1
+            j += 1
+            while j < n and _is_word(js[j]):
+                j += 1
+            out.append(js[i:j])
+            i = j
+            last, word = "/", ""
+            continue
+
+        out.append(ch)
+        last = ch
+        word = word + ch if _is_word(ch) else ""
+        i += 1
+    return "".join(out)
+
+
+def _minify_block(block):
+    if block.startswith("<!--"):
+        return block if block.startswith(_KEEP_COMMENT_PREFIXES) else ""
+    match = _OPEN_TAG_PATTERN.match(block)
+    if match is None:
+        return block
+    open_tag, tag, body, close_tag = match.groups()
+    open_tag = re.sub(r"\s+", " ", open_tag)
+    if tag.lower() == "style":
+        return open_tag + minify_css(body) + close_tag
+    type_match = _SCRIPT_TYPE_PATTERN.search(open_tag)
+    if type_match and type_match.group(1).lower() not in _JS_TYPES:
+        return open_tag + body + close_tag
+    return open_tag + minify_js(body).strip() + close_tag
+
+
+def minify_html(html):
+    """压缩HTML及其中的内联CSS/JS
+
+    标签之间的空白折叠为一个空格（不完全删除，避免改变行内元素间距），
+    <pre>/<textarea>原样保留。
+    """
+    parts = _BLOCK_PATTERN.split(html)
+    result = []
+    for i, part in enumerate(parts):
+        if i % 2:
+            result.append(_minify_block(part))
+        else:
+            result.append(re.sub(r"\s+", " ", part))
+    return "".join(result).strip()
+
+
+if __name__ == "__main__":
+    # 自检：python minify.py
+    cases = [
+        ("var a = 1;\n// 注释\nvar b = a / 2;", "var a=1;var b=a/2;"),
+        ("x = 'a  b' + \"/* 不是注释 */\";", "x='a  b'+\"/* 不是注释 */\";"),
+        ("if (/a b/.test(s)) { f() }", "if(/a b/.test(s)){f()}"),
+        ("return / +/.test(x)", "return/ +/.test(x)"),
+        ("typeof /a b/", "typeof/a b/"),
+        ("a /* x\n */ b", "a\nb"),
+        ("a /* x */ b", "a b"),
+        ("i++ + +j", "i++ + +j"),
+    ]
+    failed = 0
+    for source, expected in cases:
+        result = minify_js(source)
+        if result != expected:
+            failed += 1
+            print(f"❌ {source!r} -> {result!r}，应为 {expected!r}")
+    assert minify_css("a { color : red ; }") == "a{color:red}"
+    print("✅ 压缩自检通过" if not failed else f"❌ {failed} 个用例失败")
+    raise SystemExit(1 if failed else 0)
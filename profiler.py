@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按需请求分析 - 对单个请求采集cProfile与调用栈采样，生成报告和火焰图折叠栈
+"""
+
+import cProfile
+import hashlib
+import hmac
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+# 报告中单独统计的耗时分类：分类名 -> 判断 (文件名, 函数名) 是否属于该分类
+TIME_CATEGORIES = {
+    "pyecharts render_embed": lambda filename, func: func == "render_embed" and "pyecharts" in filename,
+    "pandas DataFrame构建": lambda filename, func: func == "__init__" and filename.replace("\\", "/").endswith("pandas/core/frame.py"),
+    "get_local_media 总耗时": lambda filename, func: func == "get_local_media",
+    "文件系统调用": lambda filename, func: filename == "~" and any(
+        name in func for name in ("posix.listdir", "posix.stat", "posix.access", "posix.scandir", "nt.listdir", "nt.stat", "nt.access")
+    ),
+}
+
+
+# 分析令牌默认有效期（秒）
+DEFAULT_TOKEN_TTL = 3600
+# 默认保留的最近报告数
+DEFAULT_MAX_REPORTS = 50
+
+
+def sign(secret, value):
+    """对value生成签名"""
+    return hmac.new(secret.encode("utf-8"), value.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+
+def issue(secret, value, ttl=DEFAULT_TOKEN_TTL):
+    """生成带过期时间的令牌 "过期时间戳.签名"，签名覆盖 value|过期时间戳"""
+    expires_at = int(time.time()) + int(ttl)
+    return f"{expires_at}.{sign(secret, f'{value}|{expires_at}')}"
+
+
+def verify(secret, value, token):
+    """校验令牌签名，已过期或格式不对时返回False"""
+    expires_at, _, signature = (token or "").partition(".")
+    if not expires_at.isdigit() or not signature or int(expires_at) < time.time():
+        return False
+    return hmac.compare_digest(sign(secret, f"{value}|{expires_at}"), signature)
+
+
+def prune_reports(report_dir, keep):
+    """只保留最近keep份报告（.txt与.collapsed成对删除）"""
+    try:
+        reports = [name[:-4] for name in os.listdir(report_dir) if name.endswith(".txt")]
+    except OSError:
+        return
+    reports.sort(key=lambda report_id: os.path.getmtime(os.path.join(report_dir, f"{report_id}.txt")), reverse=True)
+    for report_id in reports[keep:]:
+        for ext in (".txt", ".collapsed"):
+            try:
+                os.remove(os.path.join(report_dir, report_id + ext))
+            except OSError:
+                pass
+
+
+class StackSampler:
+    """定时采样指定线程的调用栈，输出火焰图可用的折叠栈"""
+
+    def __init__(self, thread_id, interval=0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+
+    def collapsed(self):
+        """折叠栈格式：每行 "帧1;帧2;... 采样次数"，可直接交给flamegraph.pl或speedscope"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+
+def category_breakdown(stats):
+    """按TIME_CATEGORIES汇总耗时（秒）
+
+    Python函数取累计耗时，内置函数（文件系统调用）取自身耗时。
+    """
+    totals = {name: 0.0 for name in TIME_CATEGORIES}
+    for (filename, _, func), (_, _, tottime, cumtime, _) in stats.stats.items():
+        for name, match in TIME_CATEGORIES.items():
+            if match(filename, func):
+                totals[name] += tottime if filename == "~" else cumtime
+    return totals
+
+
+class RequestProfile:
+    """单个请求的分析会话"""
+
+    def __init__(self, label, report_dir, sample_interval=0.001, max_reports=DEFAULT_MAX_REPORTS):
+        self.label = label
+        self.report_dir = report_dir
+        self.max_reports = max_reports
+        self.report_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self._profile = cProfile.Profile()
+        self._sampler = StackSampler(threading.get_ident(), sample_interval)
+        self._started = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._sampler.start()
+        self._profile.enable()
+
+    def stop(self):
+        """停止采集并写入报告，返回报告ID"""
+        self._profile.disable()
+        self._sampler.stop()
+        elapsed = time.perf_counter() - self._started
+
+        stats = pstats.Stats(self._profile)
+        out = io.StringIO()
+        out.write(f"请求: {self.label}\n")
+        out.write(f"总耗时: {elapsed * 1000:.1f}ms\n\n")
+        out.write("分类耗时:\n")
+        for name, seconds in category_breakdown(stats).items():
+            out.write(f"  {name:<24} {seconds * 1000:9.1f}ms\n")
+        out.write("\n")
+        stats.stream = out
+        stats.sort_stats("cumulative").print_stats(40)
+
+        os.makedirs(self.report_dir, exist_ok=True)
+        with open(self.report_path(self.report_dir, self.report_id), "w", encoding="utf-8") as f:
+            f.write(out.getvalue())
+        with open(self.collapsed_path(self.report_dir, self.report_id), "w", encoding="utf-8") as f:
+            f.write(self._sampler.collapsed())
+        prune_reports(self.report_dir, self.max_reports)
+        return self.report_id
+
+    @staticmethod
+    def report_path(report_dir, report_id):
+        return os.path.join(report_dir, f"{report_id}.txt")
+
+    @staticmethod
+    def collapsed_path(report_dir, report_id):
+        return os.path.join(report_dir, f"{report_id}.collapsed")
+
+
+if __name__ == "__main__":
+    # 生成某个路径的分析令牌：PROFILER_SECRET=... python profiler.py /chart/sales [有效秒数]
+    secret = os.environ.get("PROFILER_SECRET")
+    if not secret or len(sys.argv) not in (2, 3):
+        print("用法: PROFILER_SECRET=<密钥> python profiler.py <路径> [有效秒数]")
+        sys.exit(1)
+    path = sys.argv[1]
+    ttl = int(sys.argv[2]) if len(sys.argv) == 3 else int(os.environ.get("PROFILER_TOKEN_TTL", DEFAULT_TOKEN_TTL))
+    token = issue(secret, path, ttl)
+    print(f"{path}?__profile={token}")
+    print(f"{path}?__profile={token}&__profile_cold=1  (忽略缓存，分析完整渲染)")
+    print(f"⏳ 令牌 {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(int(token.split('.')[0])))} 过期")
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+渲染缓存 - 图表片段、页面压缩变体与媒体清单的版本化缓存
+"""
+
+import os
+import pickle
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+import sqlite3
+import threading
+import time
+
+# 快照格式版本，修改快照结构时递增
+SNAPSHOT_FORMAT = 1
+
+
+class SQLiteBackend:
+    """基于本地SQLite(WAL模式)的跨进程共享缓存后端
+
+    gunicorn的多个worker共用同一个数据库文件，图表只需渲染一次；
+    locks表提供按key的互斥锁，保证同一版本只由一个worker渲染。
+    每个进程在前面保留最近使用的memo_size个已反序列化条目：命中时只查询版本号，
+    版本一致即直接返回进程内的对象（页面字节片段），不再读取和反序列化整页。
+    """
+
+    def __init__(self, path, lock_ttl=30, memo_size=256):
+        self.path = path
+        self.lock_ttl = lock_ttl
+        self.memo_size = memo_size
+        self._memo = OrderedDict()
+        self._memo_lock = threading.Lock()
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, version TEXT NOT NULL, value BLOB NOT NULL, updated_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS locks ("
+            "key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.commit()
+
+    def _connect(self):
+        # 每个线程、每个进程（fork之后）各自持有连接
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _remember(self, key, version, value):
+        with self._memo_lock:
+            self._memo[key] = (version, value)
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute("SELECT version FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with self._memo_lock:
+            entry = self._memo.get(key)
+            if entry is not None and entry[0] == row[0]:
+                self._memo.move_to_end(key)
+                return entry
+        row = conn.execute("SELECT version, value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        entry = (row[0], pickle.loads(row[1]))
+        self._remember(key, *entry)
+        return entry
+
+    def set(self, key, version, value):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO entries (key, version, value, updated_at) VALUES (?, ?, ?, ?)",
+            (key, version, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), time.time()),
+        )
+        self._remember(key, version, value)
+
+    def delete_prefix(self, prefix):
+        self._connect().execute("DELETE FROM entries WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+    def items(self):
+        rows = self._connect().execute("SELECT key, version, value FROM entries").fetchall()
+        return {key: (version, pickle.loads(value)) for key, version, value in rows}
+
+    def count(self):
+        return self._connect().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def acquire_lock(self, key, ttl=None):
+        """尝试获取key的锁（默认有效期lock_ttl秒），过期的锁会被回收"""
+        now = time.time()
+        owner = f"{os.getpid()}:{threading.get_ident()}"
+        conn = self._connect()
+        conn.execute("DELETE FROM locks WHERE key = ? AND expires_at < ?", (key, now))
+        cursor = conn.execute(
+            "INSERT OR IGNORE INTO locks (key, owner, expires_at) VALUES (?, ?, ?)",
+            (key, owner, now + (self.lock_ttl if ttl is None else ttl)),
+        )
+        return cursor.rowcount == 1
+
+    def release_lock(self, key):
+        owner = f"{os.getpid()}:{threading.get_ident()}"
+        self._connect().execute("DELETE FROM locks WHERE key = ? AND owner = ?", (key, owner))
+
+
+class SingleFlight:
+    """进程内请求合并：同一key同一时刻只执行一次
+
+    第一个请求（leader）执行函数，并发到达的请求等待其结果；
+    等待超过timeout或leader执行失败时，由调用方自行执行作为兜底。
+    """
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.value = None
+            self.error = None
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key, fn, timeout=10.0):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+            else:
+                self.coalesced += 1
+
+        if leader:
+            try:
+                call.value = fn()
+                return call.value
+            except Exception as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+
+        if call.done.wait(timeout) and call.error is None:
+            return call.value
+        return fn()
+
+
+class RenderCache:
+    """带版本校验的渲染缓存
+
+    每个条目保存为 (version, value)。读取时版本不一致即视为过期，
+    因此数据或代码变化后旧条目会被自动拒绝，无需手动清理。
+    配置共享后端时条目存放在后端，worker进程内只保留少量经版本校验的热点条目。
+    """
+
+    def __init__(self, backend=None, lock_wait=10.0, poll_interval=0.05, flight_wait=10.0, background_workers=2):
+        self.backend = backend
+        self.lock_wait = lock_wait
+        self.poll_interval = poll_interval
+        self.flight_wait = flight_wait
+        self.flights = SingleFlight()
+        self.background_workers = background_workers
+        self._executor = None
+        self._local = threading.local()
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.dirty = False
+
+    def get(self, key, version):
+        """读取条目，版本不匹配时返回None"""
+        if getattr(self._local, "bypass", False):
+            return None
+        if self.backend is not None:
+            entry = self.backend.get(key)
+            version = str(version)
+        else:
+            entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            return None
+        return entry[1]
+
+    def get_stale(self, key):
+        """读取条目的最后一个值，不校验版本（用于过载时降级）"""
+        entry = self.backend.get(key) if self.backend is not None else self._entries.get(key)
+        return None if entry is None else entry[1]
+
+    def set(self, key, version, value):
+        """写入条目"""
+        if self.backend is not None:
+            self.backend.set(key, str(version), value)
+            self.dirty = True
+            return value
+        with self._lock:
+            self._entries[key] = (version, value)
+            self.dirty = True
+        return value
+
+    def get_or_render(self, key, version, render, should_cache=None):
+        """读取条目，未命中时渲染并写入
+
+        同一进程内的并发未命中通过SingleFlight合并为一次渲染；
+        使用共享后端时再获取key的渲染锁：同一时刻只有一个worker执行render，
+        其余worker轮询等待结果，超过lock_wait仍未等到则自行渲染。
+        """
+        value = self.get(key, version)
+        if value is not None:
+            return value
+        return self.flights.do(
+            (key, str(version)),
+            lambda: self._fill(key, version, render, should_cache),
+            timeout=self.flight_wait,
+        )
+
+    def submit(self, key, version, render, should_cache=None):
+        """在后台线程执行get_or_render，返回Future
+
+        调用方等待超时后可以先返回备用内容，后台渲染完成后照常写入缓存。
+        """
+        if getattr(self._local, "inline", False):
+            future = Future()
+            try:
+                future.set_result(self.get_or_render(key, version, render, should_cache))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.background_workers,
+                                                    thread_name_prefix="render")
+        return self._executor.submit(self.get_or_render, key, version, render, should_cache)
+
+    @contextmanager
+    def inline_mode(self, bypass=False):
+        """当前线程内同步渲染、不使用后台线程；bypass=True时忽略已有缓存（用于请求分析）"""
+        self._local.inline = True
+        self._local.bypass = bypass
+        try:
+            yield
+        finally:
+            self._local.inline = False
+            self._local.bypass = False
+
+    def _fill(self, key, version, render, should_cache):
+        value = self.get(key, version)
+        if value is not None:
+            return value
+        if self.backend is None:
+            return self._render_and_store(key, version, render, should_cache)
+
+        deadline = time.monotonic() + self.lock_wait
+        while time.monotonic() < deadline:
+            if self.backend.acquire_lock(key):
+                try:
+                    value = self.get(key, version)
+                    if value is None:
+                        value = self._render_and_store(key, version, render, should_cache)
+                    return value
+                finally:
+                    self.backend.release_lock(key)
+            time.sleep(self.poll_interval)
+            value = self.get(key, version)
+            if value is not None:
+                return value
+        print(f"⚠️ 等待渲染锁超时，本进程直接渲染: {key}")
+        return self._render_and_store(key, version, render, should_cache)
+
+    def _render_and_store(self, key, version, render, should_cache):
+        value = render()
+        if should_cache is None or should_cache(value):
+            self.set(key, version, value)
+        return value
+
+    def invalidate(self, prefix=""):
+        """删除指定前缀的条目"""
+        if self.backend is not None:
+            self.backend.delete_prefix(prefix)
+            self.dirty = True
+            return
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                del self._entries[key]
+            self.dirty = True
+
+    def snapshot_entries(self):
+        """返回当前条目的浅拷贝，供快照序列化"""
+        if self.backend is not None:
+            return self.backend.items()
+        with self._lock:
+            return dict(self._entries)
+
+    def load_entries(self, entries):
+        """批量载入条目（不覆盖已存在的条目）"""
+        if self.backend is not None:
+            for key, (version, value) in entries.items():
+                if self.backend.get(key) is None:
+                    self.backend.set(key, str(version), value)
+            return
+        with self._lock:
+            for key, entry in entries.items():
+                self._entries.setdefault(key, entry)
+
+    def __len__(self):
+        if self.backend is not None:
+            return self.backend.count()
+        return len(self._entries)
+
+
+def save_snapshot(cache, path, code_version, data_version):
+    """将缓存原子写入磁盘快照"""
+    payload = {
+        "format": SNAPSHOT_FORMAT,
+        "code_version": code_version,
+        "data_version": data_version,
+        "created_at": time.time(),
+        "entries": cache.snapshot_entries(),
+    }
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        cache.dirty = False
+        return True
+    except OSError as e:
+        print(f"⚠️ 缓存快照写入失败: {e}")
+        return False
+
+
+def load_snapshot(cache, path, code_version, data_version):
+    """从磁盘快照预热缓存，代码或数据版本不一致时整体拒绝
+
+    返回载入的条目数量。
+    """
+    if not os.path.exists(path):
+        return 0
+    start = time.perf_counter()
+    try:
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+    except Exception as e:
+        print(f"⚠️ 缓存快照读取失败，已忽略: {e}")
+        return 0
+
+    if (payload.get("format") != SNAPSHOT_FORMAT
+            or payload.get("code_version") != code_version
+            or payload.get("data_version") != data_version):
+        print("♻️ 缓存快照版本已过期，已拒绝")
+        return 0
+
+    cache.load_entries(payload.get("entries", {}))
+    cache.dirty = False
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"🔥 已从快照预热 {len(payload.get('entries', {}))} 个缓存条目 ({elapsed:.1f}ms)")
+    return len(payload.get("entries", {}))
@@ -0,0 +1,662 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+销售明细存储 - 订单级数据按列存储（地区/SKU类别编码），导入时维护按月、季度、地区的汇总表
+"""
+
+import json
+import os
+import pickle
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from hyperloglog import HyperLogLog, group_registers
+from quantile_sketch import KLLSketch, merge_sketches
+
+# 存储格式版本，修改分区或汇总结构时递增
+STORE_FORMAT = 2
+ORDER_COLUMNS = ["date", "sku", "region", "price", "quantity"]
+# 可选列：产品档次（缺省为DEFAULT_TIER）、买家ID（存储为64位哈希，缺省为0即未知买家）
+OPTIONAL_COLUMNS = ["tier", "customer_id"]
+DEFAULT_TIER = "常规款"
+# 列名 -> 分区内的存储类型（日期为1970-01-01起的天数，地区/SKU/档次为类别编码）
+COLUMN_DTYPES = {
+    "date": np.int32,
+    "sku": np.int32,
+    "region": np.int16,
+    "price": np.float32,
+    "quantity": np.int32,
+    "tier": np.int16,
+    "customer_id": np.uint64,
+}
+CSV_CHUNK_ROWS = 1_000_000
+# 季度价格中"限量版"取均价最高的前10% SKU
+PREMIUM_SKU_SHARE = 0.1
+# 汇总表的分组键
+ROLLUP_KEYS = {"month_region": ["month", "region"], "quarter_sku": ["quarter", "sku"]}
+# 每个分区按 季度×档次 保存的成交价分位数草图
+SKETCH_FILE = "price_sketches.pkl"
+# 每个分区按 日×地区 保存的买家HyperLogLog草图（键与寄存器矩阵）
+BUYER_SKETCH_FILE = "buyer_hll.npz"
+# 留存矩阵用的买家首购月份（按买家哈希排序的两列数组）
+FIRST_PURCHASE_FILE = "first_purchase.npz"
+
+
+def _atomic_write(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _quarter_label(quarter):
+    """季度序号（年×4+季度-1）转换为 "2024Q1" 形式"""
+    return f"{quarter // 4}Q{quarter % 4 + 1}"
+
+
+def _month_label(month):
+    """1970-01起的月序号转换为 "2024-01" 形式"""
+    return str(np.datetime64(int(month), "M"))
+
+
+class SalesStore:
+    """订单明细列存储 + 预计算汇总
+
+    目录结构：
+      meta.json               类别字典、分区列表、汇总水位线（提交点，最后写入）
+      rollups.pkl             汇总表（月×地区、季度×SKU）
+      partitions/<序号>/*.npy 每次导入一个分区，每列一个文件，读取时内存映射
+      partitions/<序号>/price_sketches.pkl  该分区 季度×档次 的成交价KLL草图，查询时合并
+      partitions/<序号>/buyer_hll.npz       该分区 日×地区 的买家HyperLogLog草图，查询时合并
+      first_purchase.npz      买家首购月份，留存矩阵按月增量更新时使用
+    图表只读取汇总表，耗时与输出行数成正比，与明细行数无关。
+    汇总表只合并水位线之后的新分区，更新耗时与新增数据量成正比；
+    每张汇总表带版本号，变化时通知订阅者（用于只失效受影响的图表缓存）。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.meta_path = os.path.join(path, "meta.json")
+        self.rollup_path = os.path.join(path, "rollups.pkl")
+        self.partitions_dir = os.path.join(path, "partitions")
+        self._lock = threading.Lock()
+        self._meta_mtime = None
+        self.meta = self._empty_meta()
+        self.rollups = self._empty_rollups()
+        self._listeners = []
+        # (水位线, {(季度, 档次): 合并后的草图})
+        self._merged_sketches = (None, {})
+        # (水位线, (日×地区键数组, 寄存器矩阵))
+        self._merged_buyers = (None, None)
+        self.refresh()
+
+    @staticmethod
+    def _empty_meta():
+        return {
+            "format": STORE_FORMAT, "regions": [], "skus": [], "tiers": [DEFAULT_TIER], "partitions": [], "rows": 0,
+            # 已合并进汇总表的最后一个分区序号
+            "watermark": 0,
+            "rollup_versions": {name: 0 for name in [*ROLLUP_KEYS, "price_sketch", "retention", "buyer_hll"]},
+        }
+
+    @staticmethod
+    def _empty_rollups():
+        return {
+            "month_region": pd.DataFrame({"month": pd.Series(dtype=np.int32), "region": pd.Series(dtype=np.int16),
+                                          "quantity": pd.Series(dtype=np.int64), "revenue": pd.Series(dtype=np.float64),
+                                          "orders": pd.Series(dtype=np.int64)}),
+            "quarter_sku": pd.DataFrame({"quarter": pd.Series(dtype=np.int32), "sku": pd.Series(dtype=np.int32),
+                                         "quantity": pd.Series(dtype=np.int64), "revenue": pd.Series(dtype=np.float64)}),
+            # 留存：首购月份(cohort) × 购买月份(month) 的去重买家数
+            "retention": pd.DataFrame({"cohort": pd.Series(dtype=np.int32), "month": pd.Series(dtype=np.int32),
+                                       "customers": pd.Series(dtype=np.int64)}),
+        }
+
+    # ---- 读取 ----
+
+    def subscribe(self, callback):
+        """注册汇总表变化回调，参数为发生变化的汇总表名集合"""
+        self._listeners.append(callback)
+
+    def _notify(self, changed):
+        for callback in self._listeners:
+            try:
+                callback(changed)
+            except Exception as e:
+                print(f"⚠️ 汇总表变化回调失败: {e}")
+
+    def _changed_rollups(self, old_meta):
+        old, new = old_meta["rollup_versions"], self.meta["rollup_versions"]
+        return {name for name in new if new[name] != old.get(name)}
+
+    def refresh(self):
+        """其他进程导入新数据后（meta.json变化）重新载入元数据与汇总表"""
+        try:
+            mtime = os.stat(self.meta_path).st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._meta_mtime:
+            return
+        with self._lock:
+            if mtime == self._meta_mtime:
+                return
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("format") != STORE_FORMAT:
+                print(f"⚠️ 销售明细存储格式不兼容，已忽略: {self.path}")
+                self._meta_mtime = mtime
+                return
+            with open(self.rollup_path, "rb") as f:
+                self.rollups = pickle.load(f)
+            meta.setdefault("tiers", [DEFAULT_TIER])
+            meta["rollup_versions"].setdefault("price_sketch", 0)
+            meta["rollup_versions"].setdefault("retention", 0)
+            meta["rollup_versions"].setdefault("buyer_hll", 0)
+            self.rollups.setdefault("retention", self._empty_rollups()["retention"])
+            old_meta, self.meta = self.meta, meta
+            self._meta_mtime = mtime
+            changed = self._changed_rollups(old_meta)
+        if changed:
+            self._notify(changed)
+
+    def has_data(self):
+        self.refresh()
+        return self.meta["rows"] > 0
+
+    def read_partition(self, name, columns=ORDER_COLUMNS):
+        """读取单个分区的明细列（内存映射，不整体载入内存），返回 {列名: ndarray}
+
+        早期分区没有可选列时以编码0（缺省值）补齐。
+        """
+        directory = os.path.join(self.partitions_dir, name)
+        result = {}
+        for column in columns:
+            path = os.path.join(directory, f"{column}.npy")
+            if column in OPTIONAL_COLUMNS and not os.path.exists(path):
+                rows = next(p["rows"] for p in self.meta["partitions"] if p["name"] == name)
+                result[column] = np.zeros(rows, dtype=COLUMN_DTYPES[column])
+            else:
+                result[column] = np.load(path, mmap_mode="r")
+        return result
+
+    def scan(self, columns=ORDER_COLUMNS, after=0):
+        """逐分区读取明细列，after为分区序号（只读取其后的分区），产出 {列名: ndarray}"""
+        for partition in self.meta["partitions"]:
+            if int(partition["name"]) > after:
+                yield self.read_partition(partition["name"], columns)
+
+    # ---- 导入 ----
+
+    def _encode(self, values, dictionary_name):
+        """类别编码：新出现的取值追加到字典末尾，已有编码保持不变"""
+        dictionary = self.meta[dictionary_name]
+        index = pd.Index(dictionary)
+        uniques = pd.unique(values)
+        new_values = [value for value in uniques if value not in index]
+        if new_values:
+            dictionary.extend(new_values)
+            index = pd.Index(dictionary)
+        return index.get_indexer(values)
+
+    def ingest_frame(self, orders, update=True):
+        """导入一批订单明细（DataFrame，列为ORDER_COLUMNS，可带tier、customer_id），写入新分区，返回分区名
+
+        update为False时只追加分区，之后调用update_rollups()一次性合并。
+        """
+        missing = [column for column in ORDER_COLUMNS if column not in orders.columns]
+        if missing:
+            raise ValueError(f"订单数据缺少列: {missing}")
+        if len(orders) == 0:
+            return None
+
+        with self._lock:
+            columns = {
+                "date": pd.to_datetime(orders["date"]).to_numpy().astype("datetime64[D]").astype(np.int64),
+                "sku": self._encode(orders["sku"].astype(str).to_numpy(), "skus"),
+                "region": self._encode(orders["region"].astype(str).to_numpy(), "regions"),
+                "price": orders["price"].to_numpy(),
+                "quantity": orders["quantity"].to_numpy(),
+                "tier": (self._encode(orders["tier"].astype(object).fillna(DEFAULT_TIER).astype(str).to_numpy(), "tiers")
+                         if "tier" in orders.columns else np.zeros(len(orders))),
+            }
+            if "customer_id" in orders.columns:
+                customers = orders["customer_id"].astype(str).to_numpy(dtype=object)
+                columns["customer_id"] = np.where(orders["customer_id"].isna().to_numpy(), 0,
+                                                  pd.util.hash_array(customers))
+            columns = {name: values.astype(COLUMN_DTYPES[name]) for name, values in columns.items()}
+
+            name = f"{len(self.meta['partitions']) + 1:06d}"
+            directory = os.path.join(self.partitions_dir, name)
+            os.makedirs(directory, exist_ok=True)
+            for column, values in columns.items():
+                np.save(os.path.join(directory, f"{column}.npy"), values)
+
+            self.meta["partitions"].append({
+                "name": name,
+                "rows": int(len(orders)),
+                "min_date": str(np.datetime64(int(columns["date"].min()), "D")),
+                "max_date": str(np.datetime64(int(columns["date"].max()), "D")),
+                "ingested_at": time.time(),
+            })
+            self.meta["rows"] += int(len(orders))
+            self._commit()
+        if update:
+            self.update_rollups()
+        return name
+
+    def ingest_csv(self, path, chunk_rows=CSV_CHUNK_ROWS):
+        """分块读取CSV订单明细并导入，每块一个分区，全部写入后统一合并汇总"""
+        names = []
+        reader = pd.read_csv(path, usecols=lambda column: column in ORDER_COLUMNS + OPTIONAL_COLUMNS,
+                             chunksize=chunk_rows,
+                             dtype={"sku": "string", "region": "category", "tier": "category",
+                                    "customer_id": "string", "price": np.float32, "quantity": np.int32})
+        for chunk in reader:
+            name = self.ingest_frame(chunk, update=False)
+            if name:
+                names.append(name)
+        self.update_rollups()
+        return names
+
+    def pending_partitions(self):
+        """水位线之后尚未合并进汇总表的分区"""
+        return [p["name"] for p in self.meta["partitions"] if int(p["name"]) > self.meta["watermark"]]
+
+    def update_rollups(self):
+        """把水位线之后的新分区合并进汇总表并推进水位线，返回发生变化的汇总表名集合
+
+        只读取新分区，先合并新分区之间的汇总，再与已有汇总表合并一次，
+        耗时与新增数据量（及汇总表行数）成正比，与历史明细行数无关。
+        新分区同时生成成交价分位数草图与买家基数草图，保存在分区目录中；带买家ID的新分区增量更新留存矩阵。
+        """
+        with self._lock:
+            pending = self.pending_partitions()
+            if not pending:
+                return set()
+            new, buyers = None, False
+            for name in pending:
+                columns = self.read_partition(name, ORDER_COLUMNS + OPTIONAL_COLUMNS)
+                rollups = partition_rollups(columns)
+                new = rollups if new is None else merge_rollups(new, rollups)
+                _atomic_write(os.path.join(self.partitions_dir, name, SKETCH_FILE),
+                              pickle.dumps(partition_price_sketches(columns), protocol=pickle.HIGHEST_PROTOCOL))
+                keys, registers = partition_buyer_sketches(columns)
+                self._save_buyer_sketches(name, keys, registers)
+                buyers = buyers or len(keys) > 0
+            old_meta = json.loads(json.dumps(self.meta))
+            self.rollups = merge_rollups(self.rollups, new)
+            for rollup_name, frame in new.items():
+                if not frame.empty:
+                    self.meta["rollup_versions"][rollup_name] += 1
+            self.meta["rollup_versions"]["price_sketch"] += 1
+            if self._update_retention(pending):
+                self.meta["rollup_versions"]["retention"] += 1
+            if buyers:
+                self.meta["rollup_versions"]["buyer_hll"] += 1
+            self.meta["watermark"] = int(pending[-1])
+            self._commit()
+            changed = self._changed_rollups(old_meta)
+        if changed:
+            self._notify(changed)
+        return changed
+
+    # ---- 留存矩阵 ----
+
+    def _first_purchase_path(self):
+        return os.path.join(self.path, FIRST_PURCHASE_FILE)
+
+    def _load_first_purchase(self):
+        """买家首购月份：(按哈希排序的买家数组, 首购月序号数组)"""
+        if not os.path.exists(self._first_purchase_path()):
+            return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int32)
+        with np.load(self._first_purchase_path()) as arrays:
+            return arrays["customers"], arrays["first_month"]
+
+    def _save_first_purchase(self, customers, first_month):
+        tmp_path = f"{self._first_purchase_path()}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, customers=customers, first_month=first_month)
+        os.replace(tmp_path, self._first_purchase_path())
+
+    def _partition_pairs(self, names, months=None):
+        """若干分区中去重的 (买家, 购买月份)，months不为空时只取这些月份"""
+        frames = [customer_month_pairs(self.read_partition(name, ["date", "customer_id"]), months) for name in names]
+        return pd.concat(frames, ignore_index=True).drop_duplicates() if frames else customer_month_pairs(None)
+
+    def _update_retention(self, pending):
+        """用新分区增量更新留存矩阵，返回是否有变化
+
+        只重算新分区涉及的购买月份那几列：同月份的旧分区只读取这些月份的买家去重；
+        新买家追加首购月份。若新数据中出现早于已记录首购月份的购买（乱序补录），整体重建。
+        """
+        pairs = self._partition_pairs(pending)
+        if pairs.empty:
+            return False
+        months = np.unique(pairs["month"].to_numpy())
+        watermark = self.meta["watermark"]
+        overlapping = [p["name"] for p in self.meta["partitions"] if int(p["name"]) <= watermark
+                       and _month_of(p["min_date"]) <= months[-1] and _month_of(p["max_date"]) >= months[0]]
+        if overlapping:
+            pairs = pd.concat([pairs, self._partition_pairs(overlapping, months)], ignore_index=True).drop_duplicates()
+
+        customers, first_month = self._load_first_purchase()
+        new_first = pairs.groupby("customer_id", sort=True)["month"].min()
+        keys, values = new_first.index.to_numpy(dtype=np.uint64), new_first.to_numpy(dtype=np.int32)
+        positions = np.searchsorted(customers, keys)
+        if len(customers):
+            known = (positions < len(customers)) & (customers[np.minimum(positions, len(customers) - 1)] == keys)
+        else:
+            known = np.zeros(len(keys), dtype=bool)
+        if (values[known] < first_month[positions[known]]).any():
+            self._rebuild_retention([p["name"] for p in self.meta["partitions"] if int(p["name"]) <= int(pending[-1])])
+            return True
+        customers = np.concatenate([customers, keys[~known]])
+        first_month = np.concatenate([first_month, values[~known]])
+        order = np.argsort(customers, kind="stable")
+        customers, first_month = customers[order], first_month[order]
+
+        retention = self.rollups["retention"]
+        retention = retention[~retention["month"].isin(months)]
+        cells = retention_cells(pairs, customers, first_month)
+        self.rollups["retention"] = pd.concat([retention, cells], ignore_index=True).sort_values(
+            ["cohort", "month"], ignore_index=True)
+        self._save_first_purchase(customers, first_month)
+        return True
+
+    def _rebuild_retention(self, names):
+        """扫描全部分区重建首购月份与留存矩阵"""
+        pairs = self._partition_pairs(names)
+        first = pairs.groupby("customer_id", sort=True)["month"].min()
+        customers, first_month = first.index.to_numpy(dtype=np.uint64), first.to_numpy(dtype=np.int32)
+        self.rollups["retention"] = retention_cells(pairs, customers, first_month).sort_values(
+            ["cohort", "month"], ignore_index=True)
+        self._save_first_purchase(customers, first_month)
+
+    def _commit(self):
+        os.makedirs(self.path, exist_ok=True)
+        _atomic_write(self.rollup_path, pickle.dumps(self.rollups, protocol=pickle.HIGHEST_PROTOCOL))
+        _atomic_write(self.meta_path, json.dumps(self.meta, ensure_ascii=False).encode("utf-8"))
+        self._meta_mtime = os.stat(self.meta_path).st_mtime_ns
+
+    # ---- 汇总查询（图表使用） ----
+
+    def monthly_sales(self):
+        """按月汇总：month, quantity, revenue, orders"""
+        rollup = self.rollups["month_region"].groupby("month", sort=True)[["quantity", "revenue", "orders"]].sum()
+        return pd.DataFrame({
+            "month": [_month_label(month) for month in rollup.index],
+            "quantity": rollup["quantity"].to_numpy(),
+            "revenue": rollup["revenue"].to_numpy(),
+            "orders": rollup["orders"].to_numpy(),
+        })
+
+    def region_sales(self, months=None):
+        """按地区汇总（可只取最近months个月）：region, quantity, revenue, previous_quantity
+
+        previous_quantity 为紧邻的前一个同长度区间的销量，用于计算同比增长。
+        """
+        rollup = self.rollups["month_region"]
+        regions = self.meta["regions"]
+        if rollup.empty:
+            return pd.DataFrame({"region": [], "quantity": [], "revenue": [], "previous_quantity": []})
+        last = int(rollup["month"].max())
+        if months is None:
+            current, previous = rollup, rollup.iloc[0:0]
+        else:
+            current = rollup[rollup["month"] > last - months]
+            previous = rollup[(rollup["month"] <= last - months) & (rollup["month"] > last - 2 * months)]
+        totals = current.groupby("region")[["quantity", "revenue"]].sum()
+        before = previous.groupby("region")["quantity"].sum().reindex(totals.index, fill_value=0)
+        return pd.DataFrame({
+            "region": [regions[code] for code in totals.index],
+            "quantity": totals["quantity"].to_numpy(),
+            "revenue": totals["revenue"].to_numpy(),
+            "previous_quantity": before.to_numpy(),
+        })
+
+    def quarterly_prices(self, premium_share=PREMIUM_SKU_SHARE):
+        """按季度的成交均价与"限量版"（均价最高的前premium_share SKU）均价"""
+        rollup = self.rollups["quarter_sku"]
+        rows = []
+        for quarter, group in rollup.groupby("quarter", sort=True):
+            quantity = group["quantity"].sum()
+            sku_price = group["revenue"] / group["quantity"].where(group["quantity"] > 0)
+            top = group.loc[sku_price.nlargest(max(1, int(len(group) * premium_share))).index]
+            rows.append({
+                "quarter": _quarter_label(int(quarter)),
+                "avg_price": group["revenue"].sum() / quantity if quantity else 0.0,
+                "premium_price": top["revenue"].sum() / top["quantity"].sum() if top["quantity"].sum() else 0.0,
+            })
+        return pd.DataFrame(rows, columns=["quarter", "avg_price", "premium_price"])
+
+    def retention_matrix(self):
+        """留存矩阵：cohort（首购月份）, period（首购后第N个月）, customers, retention（占该月首购买家的百分比）"""
+        cells = self.rollups["retention"]
+        sizes = cells[cells["month"] == cells["cohort"]].set_index("cohort")["customers"]
+        return pd.DataFrame({
+            "cohort": [_month_label(month) for month in cells["cohort"]],
+            "period": (cells["month"] - cells["cohort"]).to_numpy(),
+            "customers": cells["customers"].to_numpy(),
+            "retention": (cells["customers"] / cells["cohort"].map(sizes) * 100).round(1).to_numpy(),
+        })
+
+    def price_sketches(self):
+        """合并全部已汇总分区的草图，返回 {(季度序号, 档次编码): KLLSketch}（按水位线缓存）"""
+        watermark, merged = self._merged_sketches
+        if watermark == self.meta["watermark"]:
+            return merged
+        groups = {}
+        for partition in self.meta["partitions"]:
+            if int(partition["name"]) > self.meta["watermark"]:
+                continue
+            path = os.path.join(self.partitions_dir, partition["name"], SKETCH_FILE)
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    sketches = pickle.load(f)
+            else:
+                # 草图功能之前汇总的分区，现场构建并保存，其他worker与下次启动直接读取
+                sketches = partition_price_sketches(self.read_partition(partition["name"], ["date", "price", "quantity", "tier"]))
+                _atomic_write(path, pickle.dumps(sketches, protocol=pickle.HIGHEST_PROTOCOL))
+            for key, sketch in sketches.items():
+                groups.setdefault(key, []).append(sketch)
+        merged = {key: merge_sketches(sketches) for key, sketches in groups.items()}
+        self._merged_sketches = (self.meta["watermark"], merged)
+        return merged
+
+    def _save_buyer_sketches(self, name, keys, registers):
+        path = os.path.join(self.partitions_dir, name, BUYER_SKETCH_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp_path, keys=keys, registers=registers)
+        os.replace(tmp_path, path)
+
+    def buyer_sketches(self):
+        """合并全部已汇总分区的买家草图，返回 (日×地区键数组, 寄存器矩阵)（按水位线缓存）
+
+        键为 天数×65536+地区编码，按地区、日期排列（每个地区的任意日期范围都是连续的行）；
+        同一天同一地区分布在多个分区时逐寄存器取最大值。
+        """
+        watermark, merged = self._merged_buyers
+        if watermark == self.meta["watermark"]:
+            return merged
+        all_keys, all_registers = [], []
+        for partition in self.meta["partitions"]:
+            if int(partition["name"]) > self.meta["watermark"]:
+                continue
+            path = os.path.join(self.partitions_dir, partition["name"], BUYER_SKETCH_FILE)
+            if os.path.exists(path):
+                with np.load(path) as arrays:
+                    keys, registers = arrays["keys"], arrays["registers"]
+            else:
+                # 买家草图功能之前汇总的分区，现场构建并保存，其他worker与下次启动直接读取
+                keys, registers = partition_buyer_sketches(self.read_partition(partition["name"], ["date", "region", "customer_id"]))
+                self._save_buyer_sketches(partition["name"], keys, registers)
+            all_keys.append(keys)
+            all_registers.append(registers)
+        keys = np.concatenate(all_keys) if all_keys else np.zeros(0, dtype=np.int64)
+        registers = np.concatenate(all_registers) if all_registers else group_registers([], [], 0)
+        del all_registers
+        if len(keys):
+            order = np.lexsort((keys // 65536, keys % 65536))
+            keys, registers = keys[order], registers[order]
+            starts = np.r_[0, np.flatnonzero(keys[1:] != keys[:-1]) + 1]
+            keys, registers = keys[starts], np.maximum.reduceat(registers, starts, axis=0)
+        merged = (keys, registers)
+        self._merged_buyers = (self.meta["watermark"], merged)
+        return merged
+
+    def unique_buyers(self, start=None, end=None, regions=None):
+        """估计日期范围 [start, end]（"2025-03-01"形式，含两端）内所选地区（名称列表，None为全部）的独立买家数
+
+        返回 (合计, 各地区表 region, buyers)；合计为跨地区去重后的买家数，不等于各地区之和。
+        只合并范围内 日×地区 的草图寄存器，内存与耗时与订单数无关。
+        """
+        keys, registers = self.buyer_sketches()
+        days, region_codes = keys // 65536, keys % 65536
+        start_day = None if start is None else np.datetime64(start, "D").astype(np.int64)
+        end_day = None if end is None else np.datetime64(end, "D").astype(np.int64)
+        if regions is None:
+            codes = np.unique(region_codes)
+        else:
+            index = {region: code for code, region in enumerate(self.meta["regions"])}
+            unknown = [region for region in regions if region not in index]
+            if unknown:
+                raise ValueError(f"未知的地区: {unknown}")
+            codes = sorted({index[region] for region in regions})
+        # 每个地区在日期范围内的草图是连续的行：按切片（视图）逐寄存器取最大值，只分配每个地区一行寄存器
+        total = np.zeros(registers.shape[1], dtype=np.uint8)
+        rows = []
+        for code in codes:
+            first, last = np.searchsorted(region_codes, [code, code + 1])
+            region_days = days[first:last]
+            low = first + (0 if start_day is None else int(np.searchsorted(region_days, start_day, "left")))
+            high = first + (len(region_days) if end_day is None else int(np.searchsorted(region_days, end_day, "right")))
+            if high > low:
+                merged = registers[low:high].max(axis=0)
+                np.maximum(total, merged, out=total)
+                rows.append((self.meta["regions"][code], len(HyperLogLog(registers=merged))))
+        total = HyperLogLog(registers=total)
+        by_region = pd.DataFrame(rows, columns=["region", "buyers"]).sort_values("buyers", ascending=False, ignore_index=True)
+        return len(total), by_region
+
+    def price_quantiles(self, quantiles=(0.1, 0.5, 0.9)):
+        """按季度×档次估计成交价分位数：quarter, tier, 以及每个分位数一列（p10/p50/p90...）"""
+        tiers = self.meta["tiers"]
+        rows = []
+        for (quarter, tier), sketch in sorted(self.price_sketches().items()):
+            row = {"quarter": _quarter_label(quarter), "tier": tiers[tier]}
+            row.update({f"p{round(q * 100)}": value for q, value in zip(quantiles, sketch.quantiles(quantiles))})
+            rows.append(row)
+        return pd.DataFrame(rows, columns=["quarter", "tier"] + [f"p{round(q * 100)}" for q in quantiles])
+
+
+def _month_of(date):
+    """ "2024-01-15" -> 1970-01起的月序号"""
+    return int(np.datetime64(date, "M").astype(np.int32))
+
+
+def _months_and_quarters(days):
+    """1970-01-01起的天数 -> (月序号, 季度序号)"""
+    dates = np.asarray(days).astype("datetime64[D]")
+    months = dates.astype("datetime64[M]").astype(np.int32)
+    years = dates.astype("datetime64[Y]").astype(np.int32) + 1970
+    quarters = (years * 4 + (months - (years - 1970) * 12) // 3).astype(np.int32)
+    return months, quarters
+
+
+def partition_rollups(columns):
+    """计算单个分区的汇总表"""
+    months, quarters = _months_and_quarters(columns["date"])
+    quantity = columns["quantity"].astype(np.int64)
+    frame = pd.DataFrame({
+        "month": months,
+        "quarter": quarters,
+        "region": columns["region"],
+        "sku": columns["sku"],
+        "quantity": quantity,
+        "revenue": columns["price"].astype(np.float64) * quantity,
+        "orders": np.ones(len(quantity), dtype=np.int64),
+    })
+    return {
+        "month_region": frame.groupby(["month", "region"], sort=False, as_index=False)[
+            ["quantity", "revenue", "orders"]].sum(),
+        "quarter_sku": frame.groupby(["quarter", "sku"], sort=False, as_index=False)[["quantity", "revenue"]].sum(),
+    }
+
+
+def merge_rollups(current, new):
+    """合并两组汇总表（按分组键求和），不可求和的汇总表（留存）保持current中的值"""
+    merged = dict(current)
+    for name, keys in ROLLUP_KEYS.items():
+        combined = pd.concat([current[name], new[name]], ignore_index=True)
+        merged[name] = combined.groupby(keys, sort=True, as_index=False).sum()
+    return merged
+
+
+def customer_month_pairs(columns, months=None):
+    """分区中去重的 (customer_id, month)，忽略未知买家；columns为None时返回空表"""
+    if columns is None:
+        return pd.DataFrame({"customer_id": pd.Series(dtype=np.uint64), "month": pd.Series(dtype=np.int32)})
+    month, _ = _months_and_quarters(columns["date"])
+    customers = np.asarray(columns["customer_id"])
+    mask = customers != 0
+    if months is not None:
+        mask &= np.isin(month, months)
+    return pd.DataFrame({"customer_id": customers[mask], "month": month[mask]}).drop_duplicates()
+
+
+def retention_cells(pairs, customers, first_month):
+    """(买家, 购买月份) 按首购月份分组计数：cohort, month, customers"""
+    cohort = first_month[np.searchsorted(customers, pairs["customer_id"].to_numpy(dtype=np.uint64))]
+    cells = pd.DataFrame({"cohort": cohort, "month": pairs["month"].to_numpy(dtype=np.int32)})
+    return cells.groupby(["cohort", "month"], sort=True).size().rename("customers").reset_index()
+
+
+def partition_buyer_sketches(columns):
+    """按 日×地区 构建单个分区的买家草图：(键数组, 寄存器矩阵)，忽略未知买家"""
+    customers = np.asarray(columns["customer_id"])
+    mask = customers != 0
+    keys = np.asarray(columns["date"]).astype(np.int64)[mask] * 65536 + np.asarray(columns["region"]).astype(np.int64)[mask]
+    unique_keys, groups = np.unique(keys, return_inverse=True)
+    return unique_keys, group_registers(customers[mask], groups, len(unique_keys))
+
+
+def partition_price_sketches(columns):
+    """按 季度×档次 构建单个分区的成交价草图（按成交数量加权，每件商品计一次，不展开明细）"""
+    _, quarters = _months_and_quarters(columns["date"])
+    keys = quarters.astype(np.int64) * 65536 + np.asarray(columns["tier"]).astype(np.int64)
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
+    prices = np.asarray(columns["price"], dtype=float)[order]
+    quantity = np.asarray(columns["quantity"]).clip(min=0)[order]
+    uniques, starts = np.unique(keys, return_index=True)
+    return {(int(key // 65536), int(key % 65536)): KLLSketch().update(chunk, weights)
+            for key, chunk, weights in zip(uniques, np.split(prices, starts[1:]), np.split(quantity, starts[1:]))}
+
+
+if __name__ == "__main__":
+    # 导入订单明细：python sales_store.py ingest orders.csv [更多CSV...]
+    # 合并未汇总的分区：python sales_store.py rollup
+    # 查看存储概况：python sales_store.py info
+    from datasets import SALES_STORE_DIR
+
+    store = SalesStore(SALES_STORE_DIR)
+    if len(sys.argv) >= 3 and sys.argv[1] == "ingest":
+        for csv_path in sys.argv[2:]:
+            start = time.perf_counter()
+            partitions = store.ingest_csv(csv_path)
+            print(f"📥 {csv_path}: {len(partitions)} 个分区，用时 {time.perf_counter() - start:.1f}s")
+    elif len(sys.argv) == 2 and sys.argv[1] == "rollup":
+        start = time.perf_counter()
+        pending = store.pending_partitions()
+        changed = store.update_rollups()
+        print(f"🔁 合并 {len(pending)} 个分区，更新汇总表 {sorted(changed)}，用时 {time.perf_counter() - start:.1f}s")
+    elif len(sys.argv) == 2 and sys.argv[1] == "info":
+        print(f"📦 {SALES_STORE_DIR}: {store.meta['rows']} 行，{len(store.meta['partitions'])} 个分区，"
+              f"{len(store.meta['regions'])} 个地区，{len(store.meta['skus'])} 个SKU，"
+              f"汇总水位线 {store.meta['watermark']}（待合并 {len(store.pending_partitions())} 个分区）")
+    else:
+        print("用法: python sales_store.py ingest <orders.csv> [...] | rollup | info")
+        sys.exit(1)
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+服务端SVG图表 - 根据真实数据计算布局，输出无需JavaScript的静态SVG
+"""
+
+import math
+import os
+from html import escape
+
+WIDTH = 800
+HEIGHT = 500
+PALETTE = ["#FF6B9D", "#4A90E2", "#F5A623", "#9B59B6", "#50E3C2", "#E8684A", "#FFB6C1"]
+FONT_FAMILY = "-apple-system,'PingFang SC','Microsoft YaHei',sans-serif"
+
+# 折线图超过该点数时不绘制数据点标记
+MAX_LINE_MARKERS = 60
+
+# 绘图区边距：上（留给标题）、右、下、左
+MARGIN_TOP, MARGIN_RIGHT, MARGIN_BOTTOM, MARGIN_LEFT = 90, 40, 60, 80
+
+
+def _fmt(value):
+    """坐标保留一位小数"""
+    return f"{value:.1f}".rstrip("0").rstrip(".")
+
+
+def _text(x, y, content, size=12, color="#666", anchor="middle", weight=None, extra="", tooltip=None):
+    weight_attr = f' font-weight="{weight}"' if weight else ""
+    tooltip = f"<title>{escape(tooltip)}</title>" if tooltip else ""
+    return (f'<text x="{_fmt(x)}" y="{_fmt(y)}" font-size="{size}" fill="{color}" '
+            f'text-anchor="{anchor}"{weight_attr}{extra}>{tooltip}{escape(str(content))}</text>')
+
+
+def _svg(title, subtitle, body, width=WIDTH, height=HEIGHT):
+    """包装为响应式SVG文档（宽度随容器伸缩）"""
+    header = [_text(width / 2, 32, title, size=18, color="#2D3748", weight="bold")]
+    if subtitle:
+        header.append(_text(width / 2, 54, subtitle, size=13, color="#888"))
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" width="100%" '
+        f'role="img" aria-label="{escape(title)}" font-family="{escape(FONT_FAMILY)}" class="svg-chart">'
+        f'<title>{escape(title)}</title>{"".join(header)}{"".join(body)}</svg>'
+    )
+
+
+def _nice_max(value):
+    """向上取整到 1/2/5 × 10^n，作为坐标轴最大值"""
+    if value <= 0:
+        return 1
+    exponent = 10 ** math.floor(math.log10(value))
+    for step in (1, 2, 5, 10):
+        if value <= step * exponent:
+            return step * exponent
+    return 10 * exponent
+
+
+def _value_axis(top, bottom, left, right, max_value, ticks=5, name=None):
+    """绘制纵向数值轴与水平网格线"""
+    parts = []
+    for i in range(ticks + 1):
+        value = max_value * i / ticks
+        y = bottom - (bottom - top) * i / ticks
+        parts.append(f'<line x1="{left}" y1="{_fmt(y)}" x2="{right}" y2="{_fmt(y)}" stroke="#EEE"/>')
+        parts.append(_text(left - 8, y + 4, _fmt(value), size=11, anchor="end"))
+    if name:
+        parts.append(_text(left, top - 14, name, size=12, anchor="middle"))
+    return parts
+
+
+def _category_positions(count, left, right):
+    """类目轴上每个类目的中心位置"""
+    band = (right - left) / max(count, 1)
+    return [left + band * (i + 0.5) for i in range(count)], band
+
+
+def _legend(names, y=72, width=WIDTH, colors=None):
+    """水平居中的图例（colors缺省时按PALETTE顺序取色）"""
+    item_width = 120
+    start = width / 2 - item_width * len(names) / 2
+    parts = []
+    for i, name in enumerate(names):
+        x = start + i * item_width
+        color = colors[i] if colors else PALETTE[i % len(PALETTE)]
+        parts.append(f'<rect x="{_fmt(x)}" y="{y - 9}" width="14" height="10" rx="2" fill="{color}"/>')
+        parts.append(_text(x + 20, y, name, size=12, anchor="start"))
+    return parts
+
+
+def line_chart(title, subtitle, labels, values, y_name=None, color=PALETTE[0], area=True):
+    """折线图（可带面积填充）"""
+    top, bottom = MARGIN_TOP, HEIGHT - MARGIN_BOTTOM
+    left, right = MARGIN_LEFT, WIDTH - MARGIN_RIGHT
+    max_value = _nice_max(max(values) if values else 0)
+    xs, _ = _category_positions(len(labels), left, right)
+    ys = [bottom - (bottom - top) * value / max_value for value in values]
+
+    body = _value_axis(top, bottom, left, right, max_value, name=y_name)
+    body.append(f'<line x1="{left}" y1="{bottom}" x2="{right}" y2="{bottom}" stroke="#999"/>')
+    label_step = max(1, math.ceil(len(labels) / 12))
+    for i, (x, label) in enumerate(zip(xs, labels)):
+        if i % label_step == 0:
+            body.append(_text(x, bottom + 20, label, size=11))
+
+    points = " ".join(f"{_fmt(x)},{_fmt(y)}" for x, y in zip(xs, ys))
+    if area and xs:
+        body.append(f'<polygon points="{_fmt(xs[0])},{bottom} {points} {_fmt(xs[-1])},{bottom}" '
+                    f'fill="{color}" fill-opacity="0.2"/>')
+    body.append(f'<polyline points="{points}" fill="none" stroke="{color}" stroke-width="3" stroke-linejoin="round"/>')
+    # 点数较多时不绘制数据点标记，只保留折线
+    for x, y, value in zip(xs, ys, values) if len(values) <= MAX_LINE_MARKERS else ():
+        body.append(f'<circle cx="{_fmt(x)}" cy="{_fmt(y)}" r="4" fill="#FFF" stroke="{color}" stroke-width="2">'
+                    f'<title>{escape(_fmt(value))}</title></circle>')
+    return _svg(title, subtitle, body)
+
+
+def bar_chart(title, subtitle, labels, series, y_name=None, lines=()):
+    """分组柱状图，series为 [(系列名, 数值列表), ...]
+
+    lines为叠加的折线 [(系列名, 数值列表, 颜色, 是否虚线), ...]，数值为NaN处断开；
+    只有实线进入图例（如分位数带只列出中位数）。
+    """
+    top, bottom = MARGIN_TOP + 10, HEIGHT - MARGIN_BOTTOM
+    left, right = MARGIN_LEFT, WIDTH - MARGIN_RIGHT
+    line_values = [v for _, values, _, _ in lines for v in values if v == v]
+    max_value = _nice_max(max([v for _, values in series for v in values] + line_values, default=0))
+    xs, band = _category_positions(len(labels), left, right)
+    bar_width = band * 0.7 / max(len(series), 1)
+
+    legend = [(name, PALETTE[j % len(PALETTE)]) for j, (name, _) in enumerate(series)]
+    legend += [(name, color) for name, _, color, dashed in lines if not dashed]
+    body = _legend([name for name, _ in legend], colors=[color for _, color in legend])
+    body += _value_axis(top, bottom, left, right, max_value, name=y_name)
+    body.append(f'<line x1="{left}" y1="{bottom}" x2="{right}" y2="{bottom}" stroke="#999"/>')
+    for i, (x, label) in enumerate(zip(xs, labels)):
+        body.append(_text(x, bottom + 20, label, size=11))
+        for j, (name, values) in enumerate(series):
+            height = (bottom - top) * values[i] / max_value
+            bx = x - bar_width * len(series) / 2 + bar_width * j
+            body.append(f'<rect x="{_fmt(bx)}" y="{_fmt(bottom - height)}" width="{_fmt(bar_width - 2)}" '
+                        f'height="{_fmt(height)}" fill="{PALETTE[j % len(PALETTE)]}">'
+                        f'<title>{escape(f"{label} {name}: {_fmt(values[i])}")}</title></rect>')
+    for name, values, color, dashed in lines:
+        segments, segment = [], []
+        for x, value in zip(xs, values):
+            if value == value:
+                segment.append(f"{_fmt(x)},{_fmt(bottom - (bottom - top) * value / max_value)}")
+            elif segment:
+                segments.append(segment)
+                segment = []
+        segments.append(segment)
+        dash = ' stroke-dasharray="6,4"' if dashed else ""
+        for points in segments:
+            if len(points) > 1:
+                body.append(f'<polyline points="{" ".join(points)}" fill="none" stroke="{color}" '
+                            f'stroke-width="{1 if dashed else 2}"{dash}><title>{escape(name)}</title></polyline>')
+    return _svg(title, subtitle, body)
+
+
+def pie_chart(title, subtitle, items, inner_ratio=0.43):
+    """环形饼图，items为 [(名称, 数值), ...]"""
+    cx, cy = WIDTH / 2 + 60, (HEIGHT + MARGIN_TOP) / 2
+    outer = min(WIDTH, HEIGHT - MARGIN_TOP) * 0.42
+    inner = outer * inner_ratio
+    total = sum(value for _, value in items) or 1
+
+    body = []
+    angle = -math.pi / 2
+    for i, (name, value) in enumerate(items):
+        sweep = 2 * math.pi * value / total
+        end = angle + sweep
+        large = 1 if sweep > math.pi else 0
+        # 单一扇区占满整圆时SVG弧线首尾重合，稍微缩短避免不绘制
+        end_draw = end - 1e-4 if sweep >= 2 * math.pi else end
+        x1, y1 = cx + outer * math.cos(angle), cy + outer * math.sin(angle)
+        x2, y2 = cx + outer * math.cos(end_draw), cy + outer * math.sin(end_draw)
+        x3, y3 = cx + inner * math.cos(end_draw), cy + inner * math.sin(end_draw)
+        x4, y4 = cx + inner * math.cos(angle), cy + inner * math.sin(angle)
+        color = PALETTE[i % len(PALETTE)]
+        path = (f"M{_fmt(x1)},{_fmt(y1)} A{_fmt(outer)},{_fmt(outer)} 0 {large} 1 {_fmt(x2)},{_fmt(y2)} "
+                f"L{_fmt(x3)},{_fmt(y3)} A{_fmt(inner)},{_fmt(inner)} 0 {large} 0 {_fmt(x4)},{_fmt(y4)}Z")
+        body.append(f'<path d="{path}" fill="{color}" stroke="#FFF" stroke-width="2">'
+                    f'<title>{escape(f"{name}: {_fmt(value)} ({value / total:.1%})")}</title></path>')
+        mid = angle + sweep / 2
+        if sweep > 0.25:
+            lx, ly = cx + (inner + outer) / 2 * math.cos(mid), cy + (inner + outer) / 2 * math.sin(mid)
+            body.append(_text(lx, ly + 4, f"{value / total:.0%}", size=12, color="#FFF", weight="bold"))
+        angle = end
+
+    # 左侧纵向图例
+    for i, (name, value) in enumerate(items):
+        y = MARGIN_TOP + 10 + i * 24
+        body.append(f'<rect x="20" y="{y - 10}" width="14" height="10" rx="2" fill="{PALETTE[i % len(PALETTE)]}"/>')
+        body.append(_text(40, y, f"{name} {_fmt(value)}", size=12, anchor="start"))
+    return _svg(title, subtitle, body)
+
+
+def radar_chart(title, subtitle, indicators, values, max_value=100, color=PALETTE[0]):
+    """雷达图，indicators为指标名列表"""
+    cx, cy = WIDTH / 2, (HEIGHT + MARGIN_TOP) / 2 + 5
+    radius = (HEIGHT - MARGIN_TOP) * 0.36
+    count = len(indicators)
+    angles = [-math.pi / 2 + 2 * math.pi * i / count for i in range(count)]
+
+    body = []
+    for level in range(1, 6):
+        r = radius * level / 5
+        ring = " ".join(f"{_fmt(cx + r * math.cos(a))},{_fmt(cy + r * math.sin(a))}" for a in angles)
+        body.append(f'<polygon points="{ring}" fill="none" stroke="#DDD"/>')
+    for a, name in zip(angles, indicators):
+        body.append(f'<line x1="{_fmt(cx)}" y1="{_fmt(cy)}" x2="{_fmt(cx + radius * math.cos(a))}" '
+                    f'y2="{_fmt(cy + radius * math.sin(a))}" stroke="#DDD"/>')
+        lx, ly = cx + (radius + 24) * math.cos(a), cy + (radius + 24) * math.sin(a)
+        anchor = "middle" if abs(math.cos(a)) < 0.3 else ("start" if math.cos(a) > 0 else "end")
+        body.append(_text(lx, ly + 4, name, size=12, color="#333", anchor=anchor))
+
+    shape = [(cx + radius * v / max_value * math.cos(a), cy + radius * v / max_value * math.sin(a))
+             for a, v in zip(angles, values)]
+    body.append(f'<polygon points="{" ".join(f"{_fmt(x)},{_fmt(y)}" for x, y in shape)}" '
+                f'fill="{color}" fill-opacity="0.3" stroke="{color}" stroke-width="2"/>')
+    for (x, y), name, value in zip(shape, indicators, values):
+        body.append(f'<circle cx="{_fmt(x)}" cy="{_fmt(y)}" r="3.5" fill="{color}">'
+                    f'<title>{escape(f"{name}: {_fmt(value)}")}</title></circle>')
+    return _svg(title, subtitle, body)
+
+
+def funnel_chart(title, subtitle, stages):
+    """漏斗图，stages为 [(阶段名, 数值), ...]，按数值从大到小绘制"""
+    stages = sorted(stages, key=lambda item: item[1], reverse=True)
+    top, bottom = MARGIN_TOP, HEIGHT - 30
+    max_width = WIDTH * 0.6
+    cx = WIDTH / 2
+    step = (bottom - top) / max(len(stages), 1)
+    peak = stages[0][1] if stages else 1
+
+    body = []
+    for i, (name, value) in enumerate(stages):
+        next_value = stages[i + 1][1] if i + 1 < len(stages) else value * 0.6
+        w1, w2 = max_width * value / peak, max_width * next_value / peak
+        y1, y2 = top + step * i, top + step * (i + 1) - 4
+        points = (f"{_fmt(cx - w1 / 2)},{_fmt(y1)} {_fmt(cx + w1 / 2)},{_fmt(y1)} "
+                  f"{_fmt(cx + w2 / 2)},{_fmt(y2)} {_fmt(cx - w2 / 2)},{_fmt(y2)}")
+        body.append(f'<polygon points="{points}" fill="{PALETTE[i % len(PALETTE)]}">'
+                    f'<title>{escape(f"{name}: {_fmt(value)}")}</title></polygon>')
+        body.append(_text(cx, (y1 + y2) / 2 + 5, name, size=13, color="#FFF", weight="bold"))
+        body.append(_text(cx + max_width / 2 + 16, (y1 + y2) / 2 + 5,
+                          f"{_fmt(value)} ({value / peak:.0%})", size=12, anchor="start"))
+    return _svg(title, subtitle, body)
+
+
+def scatter_chart(title, subtitle, points, x_range, y_range, x_name=None, y_name=None,
+                  log_x=False, color=PALETTE[0], symbol_size=20):
+    """散点图（横轴可为对数轴），points为 [(名称, x, y), ...]"""
+    top, bottom = MARGIN_TOP, HEIGHT - MARGIN_BOTTOM
+    left, right = MARGIN_LEFT, WIDTH - MARGIN_RIGHT
+    x_min, x_max = x_range
+    y_min, y_max = y_range
+
+    def scale_x(value):
+        if log_x:
+            ratio = (math.log10(value) - math.log10(x_min)) / (math.log10(x_max) - math.log10(x_min))
+        else:
+            ratio = (value - x_min) / (x_max - x_min)
+        return left + (right - left) * min(max(ratio, 0), 1)
+
+    def scale_y(value):
+        return bottom - (bottom - top) * min(max((value - y_min) / (y_max - y_min), 0), 1)
+
+    body = []
+    if log_x:
+        x_ticks = [10 ** e for e in range(math.ceil(math.log10(x_min)), math.floor(math.log10(x_max)) + 1)]
+        if x_max not in x_ticks:
+            x_ticks.append(x_max)
+    else:
+        x_ticks = [x_min + (x_max - x_min) * i / 5 for i in range(6)]
+    for value in x_ticks:
+        x = scale_x(value)
+        body.append(f'<line x1="{_fmt(x)}" y1="{top}" x2="{_fmt(x)}" y2="{bottom}" stroke="#EEE"/>')
+        body.append(_text(x, bottom + 20, _fmt(value), size=11))
+    for i in range(6):
+        value = y_min + (y_max - y_min) * i / 5
+        y = scale_y(value)
+        body.append(f'<line x1="{left}" y1="{_fmt(y)}" x2="{right}" y2="{_fmt(y)}" stroke="#EEE"/>')
+        body.append(_text(left - 8, y + 4, _fmt(value), size=11, anchor="end"))
+    body.append(f'<rect x="{left}" y="{top}" width="{right - left}" height="{bottom - top}" fill="none" stroke="#999"/>')
+    if x_name:
+        body.append(_text((left + right) / 2, bottom + 44, x_name, size=13, color="#333"))
+    if y_name:
+        body.append(_text(24, (top + bottom) / 2, y_name, size=13, color="#333",
+                          extra=f' transform="rotate(-90 24 {_fmt((top + bottom) / 2)})"'))
+
+    for name, x_value, y_value in points:
+        x, y = scale_x(x_value), scale_y(y_value)
+        body.append(f'<circle cx="{_fmt(x)}" cy="{_fmt(y)}" r="{_fmt(symbol_size / 2)}" fill="{color}" fill-opacity="0.8">'
+                    f'<title>{escape(f"{name}: {_fmt(x_value)}, {_fmt(y_value)}")}</title></circle>')
+        body.append(_text(x, y - symbol_size / 2 - 6, name, size=12, color="#333"))
+    return _svg(title, subtitle, body)
+
+
+def _blend(color, ratio, base="#FFFFFF"):
+    """在base与color之间按比例插值（0为base，1为color）"""
+    ratio = max(0.0, min(1.0, ratio))
+    channels = [round(int(base[i:i + 2], 16) + (int(color[i:i + 2], 16) - int(base[i:i + 2], 16)) * ratio)
+                for i in (1, 3, 5)]
+    return "#" + "".join(f"{c:02X}" for c in channels)
+
+
+def heatmap(title, subtitle, x_labels, y_labels, cells, max_value=100, color=PALETTE[0], x_name=None, y_name=None):
+    """热力图，cells为 [(x序号, y序号, 数值), ...]，颜色深浅按数值/max_value，格内标注数值"""
+    top, bottom = MARGIN_TOP + 10, HEIGHT - MARGIN_BOTTOM
+    left, right = MARGIN_LEFT, WIDTH - MARGIN_RIGHT
+    cell_width = (right - left) / max(len(x_labels), 1)
+    cell_height = (bottom - top) / max(len(y_labels), 1)
+    body = []
+    for i, label in enumerate(x_labels):
+        body.append(_text(left + cell_width * (i + 0.5), bottom + 20, label, size=11))
+    for j, label in enumerate(y_labels):
+        body.append(_text(left - 8, top + cell_height * (j + 0.5) + 4, label, size=11, anchor="end"))
+    for x, y, value in cells:
+        ratio = value / max_value if max_value else 0
+        cx, cy = left + cell_width * x, top + cell_height * y
+        body.append(f'<rect x="{_fmt(cx)}" y="{_fmt(cy)}" width="{_fmt(cell_width - 2)}" height="{_fmt(cell_height - 2)}" '
+                    f'fill="{_blend(color, ratio)}"><title>{escape(f"{y_labels[y]} {x_labels[x]}: {_fmt(value)}")}</title></rect>')
+        body.append(_text(cx + cell_width / 2, cy + cell_height / 2 + 4, _fmt(value), size=11,
+                          color="#FFF" if ratio > 0.6 else "#333"))
+    if x_name:
+        body.append(_text((left + right) / 2, bottom + 42, x_name, size=12))
+    if y_name:
+        body.append(_text(left, top - 14, y_name, size=12, anchor="end"))
+    return _svg(title, subtitle, body)
+
+
+def _text_width(word, size):
+    """估算文字宽度：全角字符按字号计，其余按0.6倍字号计"""
+    return sum(size if ord(ch) > 0x2E80 else size * 0.6 for ch in word)
+
+
+def word_cloud(title, subtitle, words, size_range=(20, 80)):
+    """词云：按权重确定字号，从中心沿阿基米德螺线放置，避开已放置的词"""
+    words = sorted(words, key=lambda item: item[1], reverse=True)
+    if not words:
+        return _svg(title, subtitle, [])
+    low, high = min(w for _, w in words), max(w for _, w in words)
+    min_size, max_size = size_range
+    cx, cy = WIDTH / 2, (HEIGHT + MARGIN_TOP) / 2
+    placed = []
+    body = []
+    for i, (word, weight) in enumerate(words):
+        ratio = 0 if high == low else (weight - low) / (high - low)
+        size = min_size + (max_size - min_size) * ratio
+        w, h = _text_width(word, size), size * 0.9
+        t = 0.0
+        while t < 400:
+            x = cx + 4 * t * math.cos(t) * 1.6
+            y = cy + 4 * t * math.sin(t)
+            box = (x - w / 2, y - h / 2, x + w / 2, y + h / 2)
+            inside = box[0] >= 0 and box[2] <= WIDTH and box[1] >= MARGIN_TOP - 20 and box[3] <= HEIGHT
+            if inside and all(box[2] < b[0] or box[0] > b[2] or box[3] < b[1] or box[1] > b[3] for b in placed):
+                placed.append(box)
+                body.append(_text(x, y + size * 0.35, word, size=round(size), color=PALETTE[i % len(PALETTE)],
+                                  weight="bold" if ratio > 0.5 else None, tooltip=f"{word}: {_fmt(weight)}"))
+                break
+            t += 0.1
+    return _svg(title, subtitle, body)
+
+
+def slide_document(svg, width, height, background="#FFFFFF"):
+    """把图表SVG居中放入固定尺寸（如1920x1080）的白底画布，得到可直接插入幻灯片的独立SVG文档"""
+    inner = svg.replace(' width="100%"', f' x="0" y="0" width="{width}" height="{height}"', 1)
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>'
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">'
+        f'<rect width="{width}" height="{height}" fill="{background}"/>{inner}</svg>'
+    )
+
+
+def rasterize_png(svg_bytes, path):
+    """把SVG栅格化为PNG并原子写入path，返回path
+
+    在导出进程池中执行；cairosvg只在这里导入，网页渲染不依赖它。
+    """
+    import cairosvg
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    cairosvg.svg2png(bytestring=svg_bytes, write_to=tmp_path)
+    os.replace(tmp_path, path)
+    return path
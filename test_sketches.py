@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+降采样与草图测试 - 用固定随机种子检查LTTB、KLL、HyperLogLog与增量留存的误差界和一致性
+
+python -m pytest -q test_sketches.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from downsample import downsample
+from hyperloglog import HyperLogLog
+from quantile_sketch import KLLSketch
+from sales_store import SalesStore
+
+
+def test_lttb_keeps_endpoints_and_budget():
+    """LTTB保留首尾点，点数恰好等于预算，下标严格递增"""
+    rng = np.random.default_rng(42)
+    x = np.arange(10_000)
+    y = np.cumsum(rng.normal(size=len(x)))
+    for threshold in (3, 10, 600, 9_999):
+        indices = downsample(x, y, threshold, "lttb")
+        assert len(indices) == threshold
+        assert indices[0] == 0 and indices[-1] == len(x) - 1
+        assert np.all(np.diff(indices) > 0)
+    # 点数不超过预算时原样返回
+    assert len(downsample(x[:50], y[:50], 600, "lttb")) == 50
+
+
+def test_minmax_keeps_endpoints_and_budget():
+    """最小最大值分桶保留首尾点与全局极值，点数不超过预算"""
+    rng = np.random.default_rng(7)
+    x = np.arange(10_000)
+    y = rng.normal(size=len(x))
+    for threshold in (4, 11, 600):
+        indices = downsample(x, y, threshold, "minmax")
+        assert len(indices) <= threshold
+        assert indices[0] == 0 and indices[-1] == len(x) - 1
+        assert {int(y.argmin()), int(y.argmax())} <= set(indices.tolist())
+
+
+def _weighted_rank(values, weights, x):
+    """x在加权样本中的真实排名（0~1）"""
+    return weights[values <= x].sum() / weights.sum()
+
+
+def test_kll_weighted_rank_error():
+    """按成交数量加权的KLL草图（含分片合并）排名误差不超过k=200时的约1.5%"""
+    rng = np.random.default_rng(2025)
+    values = rng.lognormal(5, 0.6, size=200_000)
+    weights = rng.integers(1, 50, size=len(values))
+    parts = [KLLSketch(seed=i).update(chunk, w)
+             for i, (chunk, w) in enumerate(zip(np.array_split(values, 8), np.array_split(weights, 8)))]
+    # merge_sketches新建的草图不带种子，这里合并到带种子的草图上保证结果可复现
+    sketch = KLLSketch(seed=99)
+    for part in parts:
+        sketch.merge(part)
+    assert sketch.count == weights.sum()
+    qs = np.linspace(0.05, 0.95, 19)
+    errors = [abs(_weighted_rank(values, weights, x) - q) for q, x in zip(qs, sketch.quantiles(qs))]
+    assert max(errors) < 0.015
+
+
+def test_hll_relative_error():
+    """HyperLogLog（含分片合并）相对误差不超过3倍标准误差 1.04/√m"""
+    rng = np.random.default_rng(12)
+    precision = 12
+    bound = 3 * 1.04 / np.sqrt(1 << precision)
+    for n in (500, 20_000, 300_000):
+        hashes = rng.integers(0, np.iinfo(np.uint64).max, size=n, dtype=np.uint64, endpoint=True)
+        # 重复出现的买家不影响结果
+        duplicated = np.concatenate([hashes, hashes[: n // 2]])
+        merged = HyperLogLog(precision)
+        for chunk in np.array_split(duplicated, 5):
+            merged.merge(HyperLogLog(precision).update(chunk))
+        assert abs(merged.estimate() - n) / n < bound
+
+
+def _orders(rng, n, months):
+    """随机订单明细：months为可选的 年-月 列表，买家ID可重复"""
+    month = rng.choice(months, size=n)
+    return pd.DataFrame({
+        "date": pd.to_datetime([f"{m}-{d:02d}" for m, d in zip(month, rng.integers(1, 29, size=n))]),
+        "sku": rng.choice(["LABUBU-01", "LABUBU-02", "SKULLPANDA"], size=n),
+        "region": rng.choice(["中国", "日本", "美国"], size=n),
+        "price": rng.uniform(50, 500, size=n).round(2),
+        "quantity": rng.integers(1, 4, size=n),
+        "customer_id": [f"c{i}" for i in rng.integers(0, n // 3, size=n)],
+    })
+
+
+def test_unique_buyers_within_bound(tmp_path):
+    """跨分区、跨地区合并后的独立买家数与真实值的相对误差在界内"""
+    rng = np.random.default_rng(3)
+    orders = _orders(rng, 60_000, ["2025-01", "2025-02", "2025-03"])
+    store = SalesStore(str(tmp_path))
+    for rows in np.array_split(np.arange(len(orders)), 3):
+        store.ingest_frame(orders.iloc[rows])
+    bound = 3 * 1.04 / np.sqrt(4096)
+
+    window = orders[(orders["date"] >= "2025-02-01") & (orders["date"] <= "2025-03-31")]
+    total, by_region = store.unique_buyers("2025-02-01", "2025-03-31")
+    assert abs(total - window["customer_id"].nunique()) / window["customer_id"].nunique() < bound
+    truth = window.groupby("region")["customer_id"].nunique()
+    for region, buyers in zip(by_region["region"], by_region["buyers"]):
+        assert abs(buyers - truth[region]) / truth[region] < bound
+
+    total, by_region = store.unique_buyers(regions=["日本"])
+    assert list(by_region["region"]) == ["日本"]
+    truth = orders.loc[orders["region"] == "日本", "customer_id"].nunique()
+    assert abs(total - truth) / truth < bound
+
+
+def test_retention_incremental_matches_single_ingest(tmp_path):
+    """分两次导入（含新月份与补录的更早订单）的留存矩阵与一次导入全部订单相同"""
+    rng = np.random.default_rng(11)
+    first = _orders(rng, 20_000, ["2025-01", "2025-02", "2025-03"])
+    later = _orders(rng, 20_000, ["2025-03", "2025-04", "2025-05"])
+    backfill = _orders(rng, 5_000, ["2024-12", "2025-01"])
+
+    single = SalesStore(str(tmp_path / "single"))
+    single.ingest_frame(pd.concat([first, later], ignore_index=True))
+    incremental = SalesStore(str(tmp_path / "incremental"))
+    incremental.ingest_frame(first)
+    incremental.ingest_frame(later)
+    pd.testing.assert_frame_equal(incremental.retention_matrix(), single.retention_matrix())
+
+    incremental.ingest_frame(backfill)
+    single = SalesStore(str(tmp_path / "single_backfill"))
+    single.ingest_frame(pd.concat([first, later, backfill], ignore_index=True))
+    pd.testing.assert_frame_equal(incremental.retention_matrix(), single.retention_matrix())
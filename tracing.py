@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+请求追踪 - 按采样率记录请求内的span，以OTLP JSON行格式写入本地滚动文件
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+
+
+def _attributes(attrs):
+    """转换为OTLP属性列表"""
+    result = []
+    for key, value in attrs.items():
+        if isinstance(value, bool):
+            typed = {"boolValue": value}
+        elif isinstance(value, int):
+            typed = {"intValue": str(value)}
+        elif isinstance(value, float):
+            typed = {"doubleValue": value}
+        else:
+            typed = {"stringValue": str(value)}
+        result.append({"key": key, "value": typed})
+    return result
+
+
+class Trace:
+    """一次请求的追踪上下文"""
+
+    def __init__(self, tracer, trace_id):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.spans = []
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def record(self, span):
+        with self._lock:
+            if not self.finished:
+                self.spans.append(span)
+                return
+        # 请求结束后才完成的span（如后台渲染）单独写出，traceId不变
+        self.tracer.export([span])
+
+    def finish(self):
+        with self._lock:
+            self.finished = True
+            spans, self.spans = self.spans, []
+        self.tracer.export(spans)
+
+
+class Tracer:
+    """轻量追踪器
+
+    未被采样的请求不创建Trace，span()/wrap()只做一次线程局部变量检查。
+    """
+
+    def __init__(self, path, sample_rate=0.0, max_bytes=10 * 1024 * 1024, backup_count=5,
+                 service_name="labubu-dollmod"):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.service_name = service_name
+        self._local = threading.local()
+        self._logger = None
+        if sample_rate > 0:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            self._logger = logging.getLogger(f"tracing.{id(self)}")
+            self._logger.propagate = False
+            self._logger.setLevel(logging.INFO)
+            self._logger.addHandler(handler)
+
+    @property
+    def enabled(self):
+        return self._logger is not None
+
+    def should_sample(self):
+        return self.enabled and random.random() < self.sample_rate
+
+    # ---- 上下文 ----
+
+    def _context(self):
+        return getattr(self._local, "trace", None), getattr(self._local, "parent", None)
+
+    def _set_context(self, trace, parent):
+        self._local.trace = trace
+        self._local.parent = parent
+
+    def start_trace(self, trace_id):
+        """在当前线程开始一次追踪"""
+        trace = Trace(self, trace_id)
+        self._set_context(trace, None)
+        return trace
+
+    def end_trace(self):
+        """结束当前线程的追踪并写出所有span"""
+        trace, _ = self._context()
+        self._set_context(None, None)
+        if trace is not None:
+            trace.finish()
+
+    def bind(self, fn):
+        """把当前追踪上下文绑定到fn，供后台线程执行时继续记录span"""
+        trace, parent = self._context()
+        if trace is None:
+            return fn
+
+        @wraps(fn)
+        def bound(*args, **kwargs):
+            previous = self._context()
+            self._set_context(trace, parent)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._set_context(*previous)
+        return bound
+
+    # ---- span ----
+
+    @contextmanager
+    def span(self, name, kind=SPAN_KIND_INTERNAL, **attrs):
+        """记录一个span；当前请求未被采样时不做任何事"""
+        trace, parent = self._context()
+        if trace is None:
+            yield None
+            return
+
+        span = {
+            "traceId": trace.trace_id,
+            "spanId": "%016x" % random.getrandbits(64),
+            "name": name,
+            "kind": kind,
+            "startTimeUnixNano": str(time.time_ns()),
+            "attributes": dict(attrs),
+        }
+        if parent:
+            span["parentSpanId"] = parent
+        self._set_context(trace, span["spanId"])
+        try:
+            yield span
+        except Exception as e:
+            span["status"] = {"code": 2, "message": str(e)}
+            raise
+        finally:
+            self._set_context(trace, parent)
+            span["endTimeUnixNano"] = str(time.time_ns())
+            trace.record(span)
+
+    def wrap(self, name=None):
+        """装饰器：函数调用记录为span"""
+        def decorator(fn):
+            span_name = name or fn.__name__
+
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if getattr(self._local, "trace", None) is None:
+                    return fn(*args, **kwargs)
+                with self.span(span_name, **{"code.function": fn.__name__}):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    # ---- 导出 ----
+
+    def export(self, spans):
+        """以OTLP/JSON（ExportTraceServiceRequest）格式写出一行"""
+        if not spans or self._logger is None:
+            return
+        otlp_spans = [dict(span, attributes=_attributes(span["attributes"])) for span in spans]
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": _attributes({"service.name": self.service_name, "process.pid": os.getpid()})},
+                "scopeSpans": [{"scope": {"name": "app"}, "spans": otlp_spans}],
+            }]
+        }
+        self._logger.info(json.dumps(payload, ensure_ascii=False, separators=(",", ":")))
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+社媒热词统计 - 流式读取JSONL/CSV帖子导出文件，分词后用Space-Saving摘要在固定内存内统计Top-K热词
+"""
+
+import heapq
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+# 每块帖子数（分块并行处理，内存占用与块大小成正比）
+CHUNK_POSTS = int(os.environ.get('TRENDING_CHUNK_POSTS', '20000'))
+# Space-Saving 摘要容量：保留的候选词数，远大于输出的Top-K以保证准确
+SUMMARY_CAPACITY = int(os.environ.get('TRENDING_CAPACITY', '5000'))
+# 中文按字切分为n元组
+CJK_NGRAM_SIZES = (2, 3, 4)
+# 输出时，被更长热词包含且次数不少于其该比例的n元组视为同一个词的片段，不单独输出
+SUBSTRING_RATIO = 0.9
+# 帖子正文字段（JSONL键名或CSV列名），按顺序取第一个存在的
+TEXT_FIELDS = ("text", "content", "title", "desc")
+
+LATIN_PATTERN = re.compile(r"[A-Za-z][A-Za-z0-9']+")
+CJK_PATTERN = re.compile(r"[\u4e00-\u9fff]+")
+
+# 英文停用词（统一小写比较）
+LATIN_STOPWORDS = {
+    "the", "and", "for", "you", "are", "with", "this", "that", "was", "have", "has", "not", "but", "all",
+    "can", "from", "they", "will", "just", "its", "it's", "what", "out", "get", "got", "one", "our", "your",
+    "http", "https", "www", "com", "cn",
+}
+# 中文停用词，以及不能出现在n元组首尾的虚词
+CJK_STOPWORDS = {"我们", "你们", "他们", "这个", "那个", "什么", "没有", "就是", "还是", "真的", "可以", "一个", "自己", "因为", "所以"}
+CJK_STOP_CHARS = set("的了是在我你他她它们这那有和就也都很吗呢吧啊呀哦嗯着过给让被把与及或")
+
+
+def tokenize(text):
+    """分词：英文单词（小写）+ 中文连续片段的2~4元组，过滤停用词"""
+    tokens = [word.lower() for word in LATIN_PATTERN.findall(text) if word.lower() not in LATIN_STOPWORDS]
+    for run in CJK_PATTERN.findall(text):
+        for n in CJK_NGRAM_SIZES:
+            for i in range(len(run) - n + 1):
+                gram = run[i:i + n]
+                if gram[0] in CJK_STOP_CHARS or gram[-1] in CJK_STOP_CHARS or gram in CJK_STOPWORDS:
+                    continue
+                tokens.append(gram)
+    return tokens
+
+
+class SpaceSaving:
+    """Space-Saving 热点摘要：最多保留capacity个词及其计数上界
+
+    某词的真实次数在 [count-error, count] 之间；摘要可合并（未出现在一方中的词按该方的
+    最小计数补齐），因此各块可并行统计后再合并，内存只与capacity有关。
+    """
+
+    def __init__(self, capacity=SUMMARY_CAPACITY):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        self.total = 0
+
+    def floor(self):
+        """摘要已满时，未记录的词的次数上界"""
+        return min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+
+    def merge(self, other):
+        """合并另一个摘要（原地修改并返回自身）"""
+        floor, other_floor = self.floor(), other.floor()
+        counts, errors = {}, {}
+        for word in self.counts.keys() | other.counts.keys():
+            counts[word] = self.counts.get(word, floor) + other.counts.get(word, other_floor)
+            errors[word] = (self.errors.get(word, floor) if word in self.counts else floor) \
+                + (other.errors.get(word, other_floor) if word in other.counts else other_floor)
+        if len(counts) > self.capacity:
+            counts = dict(heapq.nlargest(self.capacity, counts.items(), key=lambda item: item[1]))
+        self.counts = counts
+        self.errors = {word: errors[word] for word in counts}
+        self.total += other.total
+        return self
+
+    def update(self, tokens):
+        """加入一批词（先精确计数，再按摘要规则合并）"""
+        batch = SpaceSaving(self.capacity)
+        batch.counts = dict(Counter(tokens))
+        batch.errors = dict.fromkeys(batch.counts, 0)
+        batch.total = sum(batch.counts.values())
+        if len(batch.counts) > self.capacity:
+            # 只保留前capacity个精确计数，被丢弃词的次数不超过其中最小值（即floor）
+            batch.counts = dict(heapq.nlargest(self.capacity, batch.counts.items(), key=lambda item: item[1]))
+            batch.errors = dict.fromkeys(batch.counts, 0)
+        return self.merge(batch)
+
+    def top(self, k):
+        """计数最高的k个词：[(词, 计数上界)]"""
+        return heapq.nlargest(k, self.counts.items(), key=lambda item: item[1])
+
+
+def drop_fragments(words, ratio=SUBSTRING_RATIO):
+    """去掉长词的片段（如"拉布布"中的"拉布""布布"），保持原有顺序"""
+    kept = []
+    for word, count in sorted(words, key=lambda item: len(item[0]), reverse=True):
+        if not any(word in longer and longer_count >= count * ratio for longer, longer_count in kept):
+            kept.append((word, count))
+    kept_words = {word for word, _ in kept}
+    return [(word, count) for word, count in words if word in kept_words]
+
+
+def post_text(post):
+    """取帖子的正文字段"""
+    for field in TEXT_FIELDS:
+        value = post.get(field)
+        if isinstance(value, str) and value:
+            return value
+    return ""
+
+
+def summarize_chunk(lines, capacity=SUMMARY_CAPACITY, jsonl=False):
+    """统计一块帖子（JSONL原始行或正文列表），返回该块的Space-Saving摘要"""
+    summary = SpaceSaving(capacity)
+    tokens = []
+    for line in lines:
+        if jsonl:
+            try:
+                line = post_text(json.loads(line))
+            except (ValueError, AttributeError):
+                continue
+        if isinstance(line, str):
+            tokens.extend(tokenize(line))
+    return summary.update(tokens)
+
+
+def iter_chunks(path, chunk_posts=CHUNK_POSTS):
+    """按块流式读取帖子导出文件，产出 (块内容, 是否JSONL原始行)"""
+    if path.endswith(".csv"):
+        columns = pd.read_csv(path, nrows=0).columns
+        field = next((name for name in TEXT_FIELDS if name in columns), None)
+        if field is None:
+            raise ValueError(f"{path} 中没有正文列: {TEXT_FIELDS}")
+        for chunk in pd.read_csv(path, usecols=[field], dtype={field: "string"}, chunksize=chunk_posts):
+            yield chunk[field].dropna().tolist(), False
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        lines = []
+        for line in f:
+            lines.append(line)
+            if len(lines) >= chunk_posts:
+                yield lines, True
+                lines = []
+        if lines:
+            yield lines, True
+
+
+def count_terms(paths, capacity=SUMMARY_CAPACITY, workers=None, chunk_posts=CHUNK_POSTS):
+    """并行统计多个导出文件的热词，返回合并后的摘要
+
+    同时在途的块数不超过 workers×2，整体内存与块大小和摘要容量有关，与文件大小无关。
+    """
+    workers = workers or os.cpu_count() or 1
+    summary = SpaceSaving(capacity)
+    chunks = (chunk for path in paths for chunk in iter_chunks(path, chunk_posts))
+    if workers == 1:
+        for lines, jsonl in chunks:
+            summary.merge(summarize_chunk(lines, capacity, jsonl))
+        return summary
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+        for lines, jsonl in chunks:
+            in_flight.append(pool.submit(summarize_chunk, lines, capacity, jsonl))
+            if len(in_flight) >= workers * 2:
+                summary.merge(in_flight.popleft().result())
+        while in_flight:
+            summary.merge(in_flight.popleft().result())
+    return summary
+
+
+def write_trending_words(summary, path, top_k):
+    """把Top-K热词写入JSON（[[词, 计数], ...]），供词云读取"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        words = drop_fragments(summary.top(top_k * 3))[:top_k]
+        json.dump([[word, count] for word, count in words], f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+if __name__ == "__main__":
+    # 用法：python trending_terms.py posts.jsonl [dump.csv ...] [--top 60] [--workers N]
+    from datasets import TRENDING_WORDS_PATH
+
+    args = sys.argv[1:]
+    top_k, workers = 60, None
+    if "--top" in args:
+        i = args.index("--top")
+        top_k = int(args[i + 1])
+        del args[i:i + 2]
+    if "--workers" in args:
+        i = args.index("--workers")
+        workers = int(args[i + 1])
+        del args[i:i + 2]
+    if not args:
+        print("用法: python trending_terms.py <posts.jsonl|posts.csv> [...] [--top 60] [--workers N]")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    summary = count_terms(args, workers=workers)
+    write_trending_words(summary, TRENDING_WORDS_PATH, top_k)
+    print(f"🔥 {summary.total} 个词，Top-{top_k} 已写入 {TRENDING_WORDS_PATH}，用时 {time.perf_counter() - start:.1f}s")
+    for word, count in drop_fragments(summary.top(30))[:10]:
+        print(f"  {word}: {count}")
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+用户画像 - 分块读取客户表（类别列 + 紧凑数值类型），按细分维度预聚合画像指标，任意细分查询无需再扫描全表
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from render_cache import SingleFlight
+
+CHUNK_ROWS = int(os.environ.get('USER_PROFILE_CHUNK_ROWS', '1000000'))
+# 内存中保留的细分查询结果数（LRU）
+SEGMENT_MEMO_SIZE = int(os.environ.get('USER_PROFILE_SEGMENT_MEMO', '256'))
+PROFILE_CACHE_DIR = os.environ.get('USER_PROFILE_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'user_profile'))
+
+# 客户表读取类型：类别列用category，数值列用最小够用的类型（缺失值为NaN，因此用浮点）
+CUSTOMER_DTYPES = {
+    "gender": "category",
+    "age": np.float32,
+    "monthly_income": np.float32,
+    "social_shares": np.float32,
+    "orders": np.float32,
+    "impulse_orders": np.float32,
+}
+# 细分维度（客户表中存在的列才参与预聚合）
+SEGMENT_COLUMNS = ["city_tier", "channel", "region"]
+
+# 画像指标阈值
+FEMALE_VALUES = ("女", "F", "female")
+AGE_RANGE = (15, 25)
+MID_INCOME = 8000  # 月收入（元）
+ACTIVE_SHARES = 4  # 每月分享次数
+LOYAL_ORDERS = 3  # 累计订单数
+IMPULSE_SHARE = 0.5  # 冲动下单占比
+
+# 画像指标：(指标名, 由数据块计算布尔掩码的函数)，顺序与雷达图一致
+PROFILE_INDICATORS = [
+    ("女性用户", lambda c: c["gender"].isin(FEMALE_VALUES)),
+    ("15-25岁", lambda c: c["age"].between(*AGE_RANGE)),
+    ("收入中高", lambda c: c["monthly_income"] >= MID_INCOME),
+    ("社交活跃", lambda c: c["social_shares"] >= ACTIVE_SHARES),
+    ("品牌忠诚", lambda c: c["orders"] >= LOYAL_ORDERS),
+    ("冲动消费", lambda c: (c["orders"] > 0) & (c["impulse_orders"] >= c["orders"] * IMPULSE_SHARE)),
+]
+# 阈值变化时预聚合结果需要重新计算
+INDICATOR_VERSION = json.dumps([FEMALE_VALUES, AGE_RANGE, MID_INCOME, ACTIVE_SHARES, LOYAL_ORDERS, IMPULSE_SHARE,
+                                [name for name, _ in PROFILE_INDICATORS]], ensure_ascii=False)
+
+
+def build_profile_cube(path, chunk_rows=CHUNK_ROWS):
+    """分块扫描客户表，按全部细分维度的组合汇总客户数与各指标命中数
+
+    返回的汇总表行数只与细分维度取值组合数有关，与客户数无关。
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    segments = [column for column in SEGMENT_COLUMNS if column in header]
+    missing = [column for column in CUSTOMER_DTYPES if column not in header]
+    if missing:
+        raise ValueError(f"客户表缺少列: {missing}")
+    dtypes = {**CUSTOMER_DTYPES, **{column: "category" for column in segments}}
+    cube = None
+    for chunk in pd.read_csv(path, usecols=list(dtypes), dtype=dtypes, chunksize=chunk_rows):
+        flags = pd.DataFrame({name: indicator(chunk).to_numpy(dtype=np.int64) for name, indicator in PROFILE_INDICATORS})
+        flags["customers"] = 1
+        for column in segments:
+            flags[column] = chunk[column].astype(str).to_numpy()
+        if segments:
+            partial = flags.groupby(segments, sort=False).sum()
+            cube = partial if cube is None else pd.concat([cube, partial]).groupby(level=segments, sort=False).sum()
+        else:
+            partial = flags.sum()
+            cube = partial if cube is None else cube + partial
+    if cube is None:
+        raise ValueError(f"客户表为空: {path}")
+    return cube.reset_index() if segments else cube.to_frame().T
+
+
+class ProfileAggregator:
+    """客户表画像聚合器
+
+    预聚合结果按客户表文件（路径、大小、修改时间）缓存到磁盘，各细分的画像结果缓存在内存；
+    客户表更新后自动重新聚合。同一文件的并发聚合合并为一次（SingleFlight），
+    网站请求可以不等待，由后台线程聚合。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._signature = None
+        self._cube = None
+        self._segments = OrderedDict()
+        # (预聚合结果, 各维度取值)，随预聚合结果更新
+        self._values = None
+        self._flights = SingleFlight()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="user-profile")
+        # 已提交后台聚合的磁盘缓存路径（失败后同一客户表文件不再重试，文件变化后路径随之变化）
+        self._submitted = None
+
+    def _file_signature(self):
+        stat = os.stat(self.path)
+        return [os.path.abspath(self.path), stat.st_size, stat.st_mtime_ns, INDICATOR_VERSION]
+
+    @staticmethod
+    def _cache_path(signature):
+        digest = hashlib.sha1(json.dumps(signature, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(PROFILE_CACHE_DIR, f"{digest}.pkl")
+
+    def _load(self, signature, cache_path):
+        """读取磁盘缓存，不存在时扫描客户表并写入缓存，随后替换内存中的预聚合结果"""
+        if os.path.exists(cache_path):
+            with open(cache_path, "rb") as f:
+                cube = pickle.load(f)
+        else:
+            cube = build_profile_cube(self.path)
+            os.makedirs(PROFILE_CACHE_DIR, exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(cube, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        with self._lock:
+            self._cube, self._segments, self._signature = cube, OrderedDict(), signature
+        return cube
+
+    def cube(self, wait=True):
+        """当前客户表的预聚合结果（内存 -> 磁盘缓存 -> 重新扫描）
+
+        wait=False 时不在调用线程扫描客户表：磁盘缓存不存在则交给后台线程聚合并返回None，
+        调用方先使用备用数据。
+        """
+        signature = self._file_signature()
+        if signature == self._signature:
+            return self._cube
+        cache_path = self._cache_path(signature)
+        if wait or os.path.exists(cache_path):
+            return self._flights.do(cache_path, lambda: self._load(signature, cache_path), timeout=3600)
+        with self._lock:
+            if self._submitted == cache_path:
+                return None
+            self._submitted = cache_path
+
+        def run():
+            try:
+                self._flights.do(cache_path, lambda: self._load(signature, cache_path), timeout=3600)
+            except Exception as e:
+                print(f"❌ 用户画像聚合失败: {e}")
+
+        self._executor.submit(run)
+        return None
+
+    def ready(self):
+        """预聚合结果是否可用（不可用时在后台开始聚合，不阻塞）"""
+        return self.cube(wait=False) is not None
+
+    def normalize_filters(self, filters):
+        """校验并规整细分条件：去掉首尾空白与空值，维度与取值必须存在于客户表中，否则抛出ValueError"""
+        cube = self.cube()
+        filters = {column: str(value).strip() for column, value in filters.items() if str(value).strip()}
+        unknown = [column for column in filters if column not in cube.columns or column not in SEGMENT_COLUMNS]
+        if unknown:
+            raise ValueError(f"未知的细分维度: {unknown}")
+        values = self.segment_values()
+        invalid = {column: value for column, value in filters.items() if value not in values[column]}
+        if invalid:
+            raise ValueError(f"未知的细分取值: {invalid}")
+        return filters
+
+    def segment(self, **filters):
+        """某个细分（如 city_tier="一线"）的画像：[(指标名, 占比%)]，不传参数时为全部客户
+
+        结果按规整后的条件缓存在有界LRU中（最多SEGMENT_MEMO_SIZE个）。
+        """
+        cube = self.cube()
+        filters = self.normalize_filters(filters)
+        key = tuple(sorted(filters.items()))
+        with self._lock:
+            if key in self._segments:
+                self._segments.move_to_end(key)
+                return self._segments[key]
+        mask = np.ones(len(cube), dtype=bool)
+        for column, value in filters.items():
+            mask &= (cube[column] == str(value)).to_numpy()
+        totals = cube.loc[mask, [name for name, _ in PROFILE_INDICATORS] + ["customers"]].sum()
+        customers = int(totals["customers"])
+        result = [(name, round(float(totals[name]) / customers * 100, 1) if customers else 0.0)
+                  for name, _ in PROFILE_INDICATORS]
+        with self._lock:
+            self._segments[key] = result
+            while len(self._segments) > SEGMENT_MEMO_SIZE:
+                self._segments.popitem(last=False)
+        return result
+
+    def segment_values(self):
+        """各细分维度的可选取值"""
+        cube = self.cube()
+        if self._values is None or self._values[0] is not cube:
+            values = {column: sorted(cube[column].unique().tolist()) for column in SEGMENT_COLUMNS if column in cube.columns}
+            self._values = (cube, values)
+        return self._values[1]
+
+
+if __name__ == "__main__":
+    # 用法：python user_profile.py customers.csv [city_tier=一线 ...]
+    if len(sys.argv) < 2:
+        print("用法: python user_profile.py <customers.csv> [维度=取值 ...]")
+        sys.exit(1)
+    aggregator = ProfileAggregator(sys.argv[1])
+    begin = time.perf_counter()
+    filters = dict(arg.split("=", 1) for arg in sys.argv[2:])
+    for name, value in aggregator.segment(**filters):
+        print(f"  {name}: {value}%")
+    print(f"👥 用时 {time.perf_counter() - begin:.1f}s，细分维度: {aggregator.segment_values()}")
@@ -11,10 +11,32 @@ from pptx.util import Inches, Pt
 from pptx.dml.color import RGBColor
 from pptx.enum.text import PP_ALIGN, MSO_ANCHOR
 from pptx.enum.shapes import MSO_SHAPE
+from pptx.chart.data import CategoryChartData, XyChartData
+from pptx.enum.chart import XL_CHART_TYPE, XL_LEGEND_POSITION, XL_LABEL_POSITION
+from pptx.oxml.ns import qn
 import os
+import sys
+import glob
+import json
+import time
+import hashlib
 import requests
-from PIL import Image
+from PIL import Image, ImageOps
 import io
+import qrcode
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datasets import (generate_real_sales_data, generate_global_market_data, generate_price_trend_data,
+                      generate_trending_words_data, generate_funnel_data, generate_user_profile_data,
+                      COMPETITOR_DATA)
+import svg_charts
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# 预处理素材（缩放后的图片、图表图片、二维码）按内容哈希缓存，多个版本与多次构建共用
+ASSET_CACHE_DIR = os.environ.get('PPT_ASSET_CACHE', os.path.join(BASE_DIR, '.cache', 'ppt_assets'))
+# 素材缩放的目标分辨率（每英寸像素）
+ASSET_DPI = 150
+SITE_URL = "https://labubu-dollmod.onrender.com"
 
 # 设计规范配置
 DESIGN_CONFIG = {
@@ -46,7 +68,112 @@ def create_presentation():
     prs.slide_height = Inches(9)
     return prs
 
-def add_cover_slide(prs):
+# ----------------- 构建计时与素材缓存 -----------------
+
+class BuildReport:
+    """单个PPT版本的构建耗时统计"""
+
+    def __init__(self, variant):
+        self.variant = variant
+        self.phases = {}
+        self.asset_hits = 0
+        self.asset_misses = 0
+        self.asset_seconds = 0.0
+        self.started = time.perf_counter()
+
+    def to_dict(self):
+        return {
+            "variant": self.variant,
+            "seconds": round(time.perf_counter() - self.started, 3),
+            "phases": {name: round(seconds, 3) for name, seconds in self.phases.items()},
+            "asset_hits": self.asset_hits,
+            "asset_misses": self.asset_misses,
+            "asset_seconds": round(self.asset_seconds, 3),
+        }
+
+# 当前进程正在构建的版本（每个进程同一时刻只构建一个版本）
+current_report = BuildReport("default")
+
+@contextmanager
+def build_phase(name):
+    """记录一个构建阶段的耗时"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        current_report.phases[name] = current_report.phases.get(name, 0.0) + time.perf_counter() - start
+
+def cached_asset(kind, key, ext, build):
+    """内容寻址的素材缓存：按 kind + key（含源文件内容哈希）定位文件，不存在时调用build(path)生成
+
+    写入先落到临时文件再原子替换，多个进程同时生成同一素材也不会读到半个文件。
+    """
+    digest = hashlib.sha1(f"{kind}|{key}".encode("utf-8")).hexdigest()[:20]
+    path = os.path.join(ASSET_CACHE_DIR, f"{kind}-{digest}.{ext}")
+    if os.path.exists(path):
+        current_report.asset_hits += 1
+        return path
+    start = time.perf_counter()
+    os.makedirs(ASSET_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    build(tmp_path)
+    os.replace(tmp_path, path)
+    current_report.asset_misses += 1
+    current_report.asset_seconds += time.perf_counter() - start
+    return path
+
+def file_digest(path):
+    """源文件内容哈希"""
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def prepare_slide_image(path, width, height):
+    """把图片裁剪缩放到幻灯片区域大小（英寸），避免把原图整张嵌入PPT"""
+    size = (int(width / Inches(1) * ASSET_DPI), int(height / Inches(1) * ASSET_DPI))
+
+    def build(out_path):
+        with Image.open(path) as img:
+            ImageOps.fit(img.convert("RGB"), size, Image.LANCZOS).save(out_path, "JPEG", quality=85, optimize=True)
+
+    return cached_asset("image", f"{file_digest(path)}|{size[0]}x{size[1]}", "jpg", build)
+
+def prepare_qr_code(url):
+    """网站二维码图片"""
+    def build(out_path):
+        qr = qrcode.QRCode(version=1, error_correction=qrcode.constants.ERROR_CORRECT_H, box_size=10, border=4)
+        qr.add_data(url)
+        qr.make(fit=True)
+        qr.make_image(fill_color="#2D3748", back_color="#FFFFFF").save(out_path, "PNG")
+
+    return cached_asset("qr", url, "png", build)
+
+# 以图片形式插入的图表（PowerPoint没有对应的原生图表类型）：图表名 -> 生成SVG的函数
+CHART_IMAGES = {
+    "wordcloud": lambda: svg_charts.word_cloud("🔥 社媒热度词云分析", "基于微博、小红书、抖音等平台数据",
+                                               generate_trending_words_data().itertuples(index=False)),
+    "funnel": lambda: svg_charts.funnel_chart("📊 用户转化漏斗", "从潜在到忠实粉丝的转化路径",
+                                              generate_funnel_data(wait=True).itertuples(index=False)),
+}
+
+def prepare_chart_image(name, width, height):
+    """图表图片（SVG栅格化为PNG），未安装cairosvg时返回None"""
+    size = (int(width / Inches(1) * ASSET_DPI), int(height / Inches(1) * ASSET_DPI))
+    svg = svg_charts.slide_document(CHART_IMAGES[name](), *size).encode("utf-8")
+    try:
+        return cached_asset("chart", hashlib.sha1(svg).hexdigest(), "png",
+                            lambda out_path: svg_charts.rasterize_png(svg, out_path))
+    except (ImportError, OSError) as e:
+        print(f"⚠️ 图表图片生成失败（需要cairosvg）: {name} {e}")
+        return None
+
+def gallery_images(limit=6):
+    """画廊使用的拉布布图片"""
+    paths = sorted(glob.glob(os.path.join(BASE_DIR, "static", "images", "*.jpg")))
+    return paths[:limit]
+
+# ----------------- 页面 -----------------
+
+def add_cover_slide(prs, config):
     """添加封面页"""
     slide_layout = prs.slide_layouts[6]  # 空白布局
     slide = prs.slides.add_slide(slide_layout)
@@ -113,18 +240,23 @@ def add_cover_slide(prs):
         label_frame.paragraphs[0].font.color.rgb = DESIGN_CONFIG['colors']['text_gray']
         label_frame.paragraphs[0].alignment = PP_ALIGN.CENTER
     
-    # Hero图片区域 (占位符)
-    hero_box = slide.shapes.add_textbox(Inches(9), Inches(2), Inches(6), Inches(5))
-    hero_frame = hero_box.text_frame
-    hero_frame.text = "🎨 LABUBU主题展示区\n\n在此插入:\n• 拉布布高清图片\n• 产品效果图\n• 品牌视觉元素"
-    hero_frame.paragraphs[0].font.size = Pt(18)
-    hero_frame.paragraphs[0].font.color.rgb = DESIGN_CONFIG['colors']['text_gray']
-    hero_frame.paragraphs[0].alignment = PP_ALIGN.CENTER
+    # Hero图片区域（没有图片素材时保留占位符）
+    hero_images = gallery_images(limit=1)
+    if hero_images:
+        hero_path = prepare_slide_image(hero_images[0], Inches(6), Inches(5))
+        slide.shapes.add_picture(hero_path, Inches(9), Inches(2), Inches(6), Inches(5))
+    else:
+        hero_box = slide.shapes.add_textbox(Inches(9), Inches(2), Inches(6), Inches(5))
+        hero_frame = hero_box.text_frame
+        hero_frame.text = "🎨 LABUBU主题展示区\n\n在此插入:\n• 拉布布高清图片\n• 产品效果图\n• 品牌视觉元素"
+        hero_frame.paragraphs[0].font.size = Pt(18)
+        hero_frame.paragraphs[0].font.color.rgb = DESIGN_CONFIG['colors']['text_gray']
+        hero_frame.paragraphs[0].alignment = PP_ALIGN.CENTER
     
-    # 融资信息
+    # 融资/演示信息
     funding_box = slide.shapes.add_textbox(Inches(2), Inches(8), Inches(12), Inches(0.8))
     funding_frame = funding_box.text_frame
-    funding_frame.text = "💰 天使轮融资：70万元 (30%股权) | 🎯 演示者：孙天一 (23107310229) | 📅 2025年6月"
+    funding_frame.text = config['footer']
     funding_frame.paragraphs[0].font.size = Inches(16)
     funding_frame.paragraphs[0].font.color.rgb = DESIGN_CONFIG['colors']['text_dark']
     funding_frame.paragraphs[0].alignment = PP_ALIGN.CENTER
@@ -178,12 +310,8 @@ def add_problem_slide(prs):
         desc_frame.paragraphs[0].font.size = DESIGN_CONFIG['sizes']['caption']
         desc_frame.paragraphs[0].font.color.rgb = DESIGN_CONFIG['colors']['text_gray']
     
-    # 数据图表区域占位符
-    chart_box = slide.shapes.add_textbox(Inches(8), Inches(2), Inches(6), Inches(5))
-    chart_frame = chart_box.text_frame
-    chart_frame.text = "📊 用户调研数据\n\n🔗 嵌入网站图表:\n• 用户画像雷达图\n• 需求分析数据\n• 市场机会评估\n\n女性用户占比: 75%\n改装意愿: 78%\n付费意愿: 65%"
-    chart_frame.paragraphs[0].font.size = Pt(16)
-    chart_frame.paragraphs[0].font.color.rgb = DESIGN_CONFIG['colors']['text_gray']
+    # 用户画像雷达图
+    add_user_profile_chart(slide, Inches(8), Inches(1.8), Inches(7), Inches(6.5))
     
     return slide
 
@@ -253,41 +381,303 @@ def add_solution_slide(prs):
     
     return slide
 
-def generate_complete_ppt():
-    """生成完整的12页PPT"""
+# ----------------- 原生图表 -----------------
+
+# 图表数据直接取自网站使用的数据集，生成可编辑的PowerPoint原生图表
+CHART_PALETTE = [
+    RGBColor(255, 107, 157), RGBColor(74, 144, 226), RGBColor(245, 166, 35), RGBColor(155, 89, 182),
+    RGBColor(80, 227, 194), RGBColor(232, 104, 74), RGBColor(255, 182, 193), RGBColor(160, 174, 192),
+]
+
+def style_chart(chart, title, legend=True):
+    """统一图表标题、字体与图例样式"""
+    chart.has_title = True
+    chart.chart_title.text_frame.text = title
+    title_font = chart.chart_title.text_frame.paragraphs[0].font
+    title_font.size = Pt(18)
+    title_font.bold = True
+    title_font.color.rgb = DESIGN_CONFIG['colors']['text_dark']
+    chart.font.size = DESIGN_CONFIG['sizes']['caption']
+    chart.font.name = DESIGN_CONFIG['fonts']['body']
+    chart.has_legend = legend
+    if legend:
+        chart.legend.position = XL_LEGEND_POSITION.BOTTOM
+        chart.legend.include_in_layout = False
+    return chart
+
+def add_sales_trend_chart(slide, x, y, cx, cy):
+    """全球销售趋势折线图"""
+    data = generate_real_sales_data()
+    chart_data = CategoryChartData()
+    chart_data.categories = data["month"].tolist()
+    chart_data.add_series("销售量 (万个)", data["sales"].tolist())
+    chart = slide.shapes.add_chart(XL_CHART_TYPE.LINE_MARKERS, x, y, cx, cy, chart_data).chart
+    style_chart(chart, "📈 全球销售趋势", legend=False)
+    series = chart.plots[0].series[0]
+    series.smooth = True
+    series.format.line.color.rgb = CHART_PALETTE[0]
+    series.format.line.width = Pt(3)
+    series.marker.format.fill.solid()
+    series.marker.format.fill.fore_color.rgb = CHART_PALETTE[0]
+    return chart
+
+def add_global_distribution_chart(slide, x, y, cx, cy):
+    """全球市场销售分布环形图"""
+    data = generate_global_market_data()
+    chart_data = CategoryChartData()
+    chart_data.categories = data["region"].tolist()
+    chart_data.add_series("销售分布 (万个)", data["sales"].tolist())
+    chart = slide.shapes.add_chart(XL_CHART_TYPE.DOUGHNUT, x, y, cx, cy, chart_data).chart
+    style_chart(chart, "🌐 全球市场销售分布")
+    chart.legend.position = XL_LEGEND_POSITION.RIGHT
+    plot = chart.plots[0]
+    for i, point in enumerate(plot.series[0].points):
+        point.format.fill.solid()
+        point.format.fill.fore_color.rgb = CHART_PALETTE[i % len(CHART_PALETTE)]
+    plot.has_data_labels = True
+    plot.data_labels.show_percentage = True
+    plot.data_labels.show_value = False
+    plot.data_labels.number_format = '0%'
+    plot.data_labels.number_format_is_linked = False
+    return chart
+
+def add_price_analysis_chart(slide, x, y, cx, cy):
+    """产品定价簇状柱形图"""
+    data = generate_price_trend_data()
+    chart_data = CategoryChartData()
+    chart_data.categories = data["quarter"].tolist()
+    chart_data.add_series("平均售价", data["avg_price"].tolist())
+    chart_data.add_series("限量版售价", data["premium_price"].tolist())
+    chart = slide.shapes.add_chart(XL_CHART_TYPE.COLUMN_CLUSTERED, x, y, cx, cy, chart_data).chart
+    style_chart(chart, "💰 产品定价策略分析")
+    for i, series in enumerate(chart.plots[0].series):
+        series.format.fill.solid()
+        series.format.fill.fore_color.rgb = CHART_PALETTE[i]
+    chart.value_axis.has_title = True
+    chart.value_axis.axis_title.text_frame.text = "价格 (元)"
+    chart.plots[0].has_data_labels = True
+    chart.plots[0].data_labels.position = XL_LABEL_POSITION.OUTSIDE_END
+    return chart
+
+def add_user_profile_chart(slide, x, y, cx, cy):
+    """用户画像雷达图"""
+    data = generate_user_profile_data(wait=True)
+    chart_data = CategoryChartData()
+    chart_data.categories = data["category"].tolist()
+    chart_data.add_series("用户特征 (%)", data["value"].tolist())
+    chart = slide.shapes.add_chart(XL_CHART_TYPE.RADAR_FILLED, x, y, cx, cy, chart_data).chart
+    style_chart(chart, "👥 用户画像分析", legend=False)
+    series = chart.plots[0].series[0]
+    series.format.fill.solid()
+    series.format.fill.fore_color.rgb = CHART_PALETTE[0]
+    chart.value_axis.maximum_scale = 100
+    chart.value_axis.minimum_scale = 0
+    return chart
+
+def add_competitor_chart(slide, x, y, cx, cy):
+    """竞品市值vs品牌力散点图（市值为对数轴）"""
+    chart_data = XyChartData()
+    for name, market_cap, brand_score in COMPETITOR_DATA:
+        series = chart_data.add_series(name)
+        series.add_data_point(market_cap, brand_score)
+    chart = slide.shapes.add_chart(XL_CHART_TYPE.XY_SCATTER, x, y, cx, cy, chart_data).chart
+    style_chart(chart, "🏆 潮玩行业竞品分析：市值vs品牌力")
+    chart.legend.position = XL_LEGEND_POSITION.RIGHT
+    for i, series in enumerate(chart.plots[0].series):
+        series.marker.size = 14
+        series.marker.format.fill.solid()
+        series.marker.format.fill.fore_color.rgb = CHART_PALETTE[i % len(CHART_PALETTE)]
+    # python-pptx未提供对数轴属性，直接写入<c:logBase>（须为scaling的第一个子元素）
+    scaling = chart.category_axis._element.scaling
+    scaling.insert(0, scaling.makeelement(qn("c:logBase"), {"val": "10"}))
+    chart.category_axis.minimum_scale = 10
+    chart.category_axis.maximum_scale = 5000
+    chart.category_axis.has_title = True
+    chart.category_axis.axis_title.text_frame.text = "市值 (亿港元)"
+    chart.value_axis.minimum_scale = 55
+    chart.value_axis.maximum_scale = 90
+    chart.value_axis.has_title = True
+    chart.value_axis.axis_title.text_frame.text = "品牌力指数"
+    return chart
+
+def add_titled_slide(prs, title):
+    """添加空白页并写入居中标题"""
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    
+    title_box = slide.shapes.add_textbox(Inches(1), Inches(0.5), Inches(14), Inches(1))
+    title_frame = title_box.text_frame
+    title_frame.text = title
+    title_frame.paragraphs[0].font.size = DESIGN_CONFIG['sizes']['title']
+    title_frame.paragraphs[0].font.bold = True
+    title_frame.paragraphs[0].font.color.rgb = DESIGN_CONFIG['colors']['text_dark']
+    title_frame.paragraphs[0].alignment = PP_ALIGN.CENTER
+    return slide
+
+def add_chart_slide(prs, title, chart_builders):
+    """添加数据图表页：标题 + 横向平均排列的原生图表"""
+    slide = add_titled_slide(prs, title)
+    width = Inches(14) / len(chart_builders)
+    for i, builder in enumerate(chart_builders):
+        builder(slide, Inches(1) + width * i, Inches(1.8), width, Inches(6.7))
+    return slide
+
+def add_gallery_slide(prs, title):
+    """拉布布画廊：2行3列图片"""
+    slide = add_titled_slide(prs, title)
+    width, height = Inches(4.4), Inches(3.2)
+    for i, path in enumerate(gallery_images()):
+        x = Inches(1) + (width + Inches(0.4)) * (i % 3)
+        y = Inches(1.8) + (height + Inches(0.3)) * (i // 3)
+        slide.shapes.add_picture(prepare_slide_image(path, width, height), x, y, width, height)
+    return slide
+
+def add_chart_image_slide(prs, title, names=("wordcloud", "funnel")):
+    """以图片插入的图表页（词云、漏斗）"""
+    slide = add_titled_slide(prs, title)
+    width, height = Inches(7), Inches(4.4)
+    for i, name in enumerate(names):
+        path = prepare_chart_image(name, width, height)
+        if path:
+            slide.shapes.add_picture(path, Inches(1) + width * i, Inches(2.2), width, height)
+    return slide
+
+def add_qr_code(slide, url):
+    """在页面右下角放置网站二维码"""
+    slide.shapes.add_picture(prepare_qr_code(url), Inches(13.6), Inches(6.6), Inches(2), Inches(2))
+
+# 使用数据图表的页面：页面标题 -> 图表构建函数列表
+CHART_SLIDES = {
+    "市场分析 - TAM/SAM/SOM模型": [add_sales_trend_chart, add_global_distribution_chart],
+    "竞争分析 - 波特五力": [add_competitor_chart],
+    "财务预测与盈利模型": [add_price_analysis_chart],
+}
+
+# 使用图片素材的页面：页面标题 -> 页面构建函数
+IMAGE_SLIDES = {
+    "产品展示 - 拉布布画廊": add_gallery_slide,
+    "社媒热度与用户转化": add_chart_image_slide,
+}
+
+# PPT版本配置：封面底部信息、正文页面（封面、问题、方案页之后）、尾页二维码
+DECK_VARIANTS = {
+    "investor": {
+        "filename": "娃改坊商业计划书_专业版.pptx",
+        "footer": "💰 天使轮融资：70万元 (30%股权) | 🎯 演示者：孙天一 (23107310229) | 📅 2025年6月",
+        "slides": [
+            "市场分析 - TAM/SAM/SOM模型",
+            "产品展示 - 拉布布画廊",
+            "技术实力展示",
+            "商业模式画布",
+            "竞争分析 - 波特五力",
+            "财务预测与盈利模型",
+            "团队介绍",
+            "实施计划与里程碑",
+            "投资亮点与愿景",
+        ],
+        "qr_url": f"{SITE_URL}/",
+    },
+    "classroom": {
+        "filename": "娃改坊商业计划书_课堂版.pptx",
+        "footer": "🎓 课堂展示 | 🎯 演示者：孙天一 (23107310229) | 📅 2025年6月",
+        "slides": [
+            "市场分析 - TAM/SAM/SOM模型",
+            "社媒热度与用户转化",
+            "产品展示 - 拉布布画廊",
+            "技术实力展示",
+            "竞争分析 - 波特五力",
+            "团队介绍",
+        ],
+        "qr_url": f"{SITE_URL}/",
+    },
+    "partner": {
+        "filename": "娃改坊商业计划书_合作伙伴版.pptx",
+        "footer": "🤝 渠道合作洽谈 | 🎯 联系人：孙天一 | 📅 2025年6月",
+        "slides": [
+            "市场分析 - TAM/SAM/SOM模型",
+            "社媒热度与用户转化",
+            "产品展示 - 拉布布画廊",
+            "商业模式画布",
+            "财务预测与盈利模型",
+            "实施计划与里程碑",
+        ],
+        "qr_url": f"{SITE_URL}/business",
+    },
+}
+DEFAULT_DECK_VARIANT = "investor"
+
+def generate_complete_ppt(config=None):
+    """按版本配置生成PPT（默认为完整的12页投资人版）"""
+    config = config or DECK_VARIANTS[DEFAULT_DECK_VARIANT]
     prs = create_presentation()
     
     # 添加所有页面
-    add_cover_slide(prs)
-    add_problem_slide(prs) 
-    add_solution_slide(prs)
+    with build_phase("封面"):
+        add_cover_slide(prs, config)
+    with build_phase("问题定义"):
+        add_problem_slide(prs)
+    with build_phase("解决方案"):
+        add_solution_slide(prs)
     
-    # 添加其他页面的占位符
-    for i, title in enumerate([
-        "市场分析 - TAM/SAM/SOM模型",
-        "产品展示 - 拉布布画廊", 
-        "技术实力展示",
-        "商业模式画布",
-        "竞争分析 - 波特五力",
-        "财务预测与盈利模型", 
-        "团队介绍",
-        "实施计划与里程碑",
-        "投资亮点与愿景"
-    ], 4):
-        slide_layout = prs.slide_layouts[1]  # 标题和内容布局
-        slide = prs.slides.add_slide(slide_layout)
-        
-        # 设置标题
-        slide.shapes.title.text = title
-        slide.shapes.title.text_frame.paragraphs[0].font.size = DESIGN_CONFIG['sizes']['title']
-        slide.shapes.title.text_frame.paragraphs[0].font.color.rgb = DESIGN_CONFIG['colors']['text_dark']
-        
-        # 添加内容占位符
-        content_placeholder = slide.placeholders[1]
-        content_placeholder.text = f"第{i+4}页内容:\n\n• 请在此添加具体内容\n• 可嵌入网站图表数据\n• 包含拉布布素材展示\n• 体现专业技术能力\n\n🔗 相关网站链接: http://127.0.0.1:5000/"
+    # 数据图表页、图片页，其余页面添加占位符
+    for i, title in enumerate(config["slides"], 4):
+        with build_phase(title):
+            if title in CHART_SLIDES:
+                add_chart_slide(prs, title, CHART_SLIDES[title])
+                continue
+            if title in IMAGE_SLIDES:
+                IMAGE_SLIDES[title](prs, title)
+                continue
+            
+            slide_layout = prs.slide_layouts[1]  # 标题和内容布局
+            slide = prs.slides.add_slide(slide_layout)
+            
+            # 设置标题
+            slide.shapes.title.text = title
+            slide.shapes.title.text_frame.paragraphs[0].font.size = DESIGN_CONFIG['sizes']['title']
+            slide.shapes.title.text_frame.paragraphs[0].font.color.rgb = DESIGN_CONFIG['colors']['text_dark']
+            
+            # 添加内容占位符
+            content_placeholder = slide.placeholders[1]
+            content_placeholder.text = f"第{i}页内容:\n\n• 请在此添加具体内容\n• 包含拉布布素材展示\n• 体现专业技术能力"
     
+    with build_phase("二维码"):
+        add_qr_code(prs.slides[-1], config["qr_url"])
     return prs
 
+# ----------------- 多版本并行构建 -----------------
+
+def build_deck_variant(variant, output_dir):
+    """在当前（工作）进程中构建一个版本并保存，返回构建报告"""
+    global current_report
+    current_report = BuildReport(variant)
+    prs = generate_complete_ppt(DECK_VARIANTS[variant])
+    path = os.path.join(output_dir, DECK_VARIANTS[variant]["filename"])
+    with build_phase("保存"):
+        prs.save(path)
+    report = current_report.to_dict()
+    report.update(filename=path, slides=len(prs.slides))
+    return report
+
+def build_decks(variants, output_dir=".", workers=None):
+    """在进程池中并行构建多个版本，打印并写出构建耗时报告"""
+    start = time.perf_counter()
+    os.makedirs(output_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers or min(len(variants), os.cpu_count() or 1)) as pool:
+        reports = list(pool.map(build_deck_variant, variants, [output_dir] * len(variants)))
+    wall = time.perf_counter() - start
+
+    print("\n⏱️ 构建耗时报告")
+    for report in reports:
+        print(f"  📄 {report['variant']}: {report['seconds']:.2f}s, {report['slides']}页 -> {report['filename']}")
+        print(f"     素材缓存: 命中{report['asset_hits']} / 生成{report['asset_misses']} ({report['asset_seconds']:.2f}s)")
+        for name, seconds in sorted(report["phases"].items(), key=lambda item: -item[1])[:5]:
+            print(f"     {name:<24} {seconds:7.3f}s")
+    print(f"  总用时: {wall:.2f}s（各版本累计 {sum(r['seconds'] for r in reports):.2f}s）")
+
+    with open(os.path.join(output_dir, "build_report.json"), "w", encoding="utf-8") as f:
+        json.dump({"wall_seconds": round(wall, 3), "decks": reports}, f, ensure_ascii=False, indent=2)
+    return reports
+
 def main():
     """主函数"""
     print("🎯 开始生成娃改坊商业计划书PPT...")
@@ -307,8 +697,8 @@ def main():
     print(f"   - 色彩主题: 拉布布粉 + 专业蓝")
     
     print("\n🎨 下一步操作建议:")
-    print("1. 打开PPT文件，替换占位符内容")
-    print("2. 从网站截图插入数据图表")
+    print("1. 打开PPT文件，替换占位符内容（数据图表已自动生成，可直接编辑）")
+    print("2. 其他图表可运行 python app.py --export-charts 导出图片(1920x1080)后插入")
     print("3. 添加拉布布高清图片素材")
     print("4. 调整字体和颜色细节")
     print("5. 添加动画和转场效果")
@@ -316,12 +706,22 @@ def main():
     print("\n🔗 相关资源:")
     print("- 网站地址: http://127.0.0.1:5000/")
     print("- 图片素材: /static/images/")
-    print("- 数据图表: /chart/<chart_name>")
+    print("- 数据图表: /chart/<chart_name>，图片: /chart/<chart_name>.png、/chart/<chart_name>.svg")
     
     return filename
 
 if __name__ == "__main__":
     try:
+        # 多版本并行构建：python 娃改坊PPT制作脚本.py --variants investor classroom partner [--workers N]
+        if "--variants" in sys.argv:
+            args = sys.argv[sys.argv.index("--variants") + 1:]
+            workers = None
+            if "--workers" in args:
+                workers = int(args[args.index("--workers") + 1])
+                args = args[:args.index("--workers")]
+            variants = [name for name in args if name in DECK_VARIANTS] or list(DECK_VARIANTS)
+            build_decks(variants, workers=workers)
+            sys.exit(0)
         filename = main()
         print(f"\n🎉 {filename} 制作完成！")
     except ImportError: